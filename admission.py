@@ -0,0 +1,158 @@
+import os
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Generations running at once in this worker
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "4"))
+# Requests allowed to wait for a slot, in total and per client. serve.py sizes
+# each worker's thread pool from in-flight + queue, since a request can only be
+# queued or shed here once a thread has picked it up
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_MAX_QUEUE_PER_CLIENT = int(os.getenv("ADMISSION_MAX_QUEUE_PER_CLIENT", "4"))
+# Seconds a request may wait for a slot before it is shed
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "15"))
+MAX_RETRY_AFTER = 120
+
+
+class Overloaded(Exception):
+    """A request was shed; `retry_after` is the suggested wait in whole seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ("client", "admitted")
+
+    def __init__(self, client: str):
+        self.client = client
+        self.admitted = threading.Event()
+
+
+class AdmissionController:
+    """
+    Bounded admission for expensive requests.
+
+    At most `max_in_flight` requests run at once. Others wait in per-client
+    queues that are served round-robin, so one client flooding the endpoint
+    only delays itself. When the wait queue (or the client's share of it) is
+    full, or a request has waited `queue_timeout` seconds, it is shed at once
+    with a Retry-After estimated from the observed drain rate.
+
+    Limits are per process; with several workers the totals scale with them.
+    """
+
+    def __init__(self, max_in_flight: int = ADMISSION_MAX_IN_FLIGHT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 max_queue_per_client: int = ADMISSION_MAX_QUEUE_PER_CLIENT,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_queue_per_client = max_queue_per_client
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._queues: "OrderedDict[str, deque]" = OrderedDict()
+        self._queued = 0
+        self._in_flight = 0
+        self._completions = deque(maxlen=50)
+        self.admitted = 0
+        self.shed = 0
+
+    def drain_rate(self) -> float:
+        """Completed requests per second over the recent window, 0 if unknown."""
+        with self._lock:
+            return self._drain_rate(time.monotonic())
+
+    def _drain_rate(self, now: float) -> float:
+        if len(self._completions) < 2:
+            return 0.0
+        elapsed = now - self._completions[0]
+        return (len(self._completions) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def _retry_after(self, now: float) -> int:
+        rate = self._drain_rate(now)
+        if rate <= 0:
+            return int(math.ceil(self.queue_timeout))
+        # Time for everything ahead of a new arrival to drain
+        return max(1, min(MAX_RETRY_AFTER, int(math.ceil((self._queued + 1) / rate))))
+
+    def _shed(self, reason: str, now: float) -> Overloaded:
+        self.shed += 1
+        retry_after = self._retry_after(now)
+        logger.warning("Shedding request (%s), retry after %ds", reason, retry_after)
+        return Overloaded(reason, retry_after)
+
+    @contextmanager
+    def admit(self, client: str):
+        """
+        Hold a slot for the duration of the block.
+
+        Raises:
+            Overloaded: If the request was shed instead of admitted
+        """
+        ticket = None
+        with self._lock:
+            now = time.monotonic()
+            if self._in_flight < self.max_in_flight and not self._queued:
+                self._in_flight += 1
+            elif self._queued >= self.max_queue:
+                raise self._shed("queue full", now)
+            elif len(self._queues.get(client, ())) >= self.max_queue_per_client:
+                raise self._shed("client queue full", now)
+            else:
+                ticket = _Ticket(client)
+                self._queues.setdefault(client, deque()).append(ticket)
+                self._queued += 1
+
+        if ticket is not None and not ticket.admitted.wait(self.queue_timeout):
+            with self._lock:
+                # Admission may have raced the timeout
+                if not ticket.admitted.is_set():
+                    queue = self._queues[client]
+                    queue.remove(ticket)
+                    if not queue:
+                        del self._queues[client]
+                    self._queued -= 1
+                    raise self._shed("queue timeout", time.monotonic())
+
+        with self._lock:
+            self.admitted += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        with self._lock:
+            self._completions.append(time.monotonic())
+            self._in_flight -= 1
+            if not self._queues:
+                return
+            # Round-robin: serve the head of the oldest client queue, then move
+            # that client to the back
+            client, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            del self._queues[client]
+            if queue:
+                self._queues[client] = queue
+            self._queued -= 1
+            self._in_flight += 1
+            ticket.admitted.set()
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "queued_clients": len(self._queues),
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "drain_rate": round(self._drain_rate(time.monotonic()), 3),
+            }
@@ -1,27 +1,48 @@
-from flask import Flask, request, jsonify, render_template_string
+from flask import Flask, request, jsonify, make_response
 import os
-import openai
 import json
 import logging
-from typing import Dict, List, Optional
+import functools
+import hashlib
+import hmac
+import math
+import time
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-import requests
+from tracing import start_trace, span, SamplingProfiler, profiling_requested, TRACE_EXPORT_DIR
+import question_model
+import storage_format
+import packs
+from question_model import Question, Category, Difficulty, validate_questions
+from rendering import render_page
+from log_config import setup_logging
+from response_parser import parse_unstructured_response
+from dedup import DuplicateIndex, question_text
+from question_bank import QuestionBank, subject_score, target_difficulty
+from student_state import StudentStateStore
+from storage_backend import StorageBackend, create_backend, pin_timestamp
+from shared_cache import SharedCache
+from llm_router import ModelRouter, CompletionRejected, CompletionTimeout
+from deadlines import DeadlineExceeded, current_deadline, deadline_scope, expired, remaining
+from admission import AdmissionController, Overloaded
+from prompts import PromptTemplate
 # Load environment variables
 load_dotenv()
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+PINATA_JWT = os.getenv("PINATA_JWT")
+
 # Initialize Flask app
 app = Flask(__name__)
 
-# Configure OpenAI client for SambaNova
-SAMBANOVA_API_KEY = os.getenv("SAMBANOVA_API_KEY", "cf134cde-f4d2-4e6d-90b4-500e269eb286")
-client = openai.OpenAI(
-    api_key=SAMBANOVA_API_KEY,
-    base_url="https://api.sambanova.ai/v1"
-)
+# Model registry; requests are routed across LLM_MODELS by subject, difficulty and live latency
+SAMBANOVA_API_KEY = os.getenv("SAMBANOVA_API_KEY")
+MODEL_ROUTER = ModelRouter.from_config(api_keys={"sambanova": SAMBANOVA_API_KEY})
 
 # Sample test data
 SAMPLE_USER_RESULTS = {
@@ -44,6 +65,118 @@ SAMPLE_USA_RESULTS = {
     "Reading": 21,
     "Science": 21
 }
+
+SYSTEM_PROMPT = "You are an educational assistant that generates targeted practice questions based on weaknesses and test performance analysis. Return responses in JSON format. Always include necessary context for questions."
+
+# Output instructions shared by the full generation prompt and repair prompts
+QUESTION_FORMAT = """For each question:
+    1. Include any necessary context (passages, equations, diagrams described in text, etc.) before the question
+    2. Provide the actual question
+    3. Include four multiple choice options (A, B, C, D)
+    4. Indicate the correct answer
+    5. Provide a detailed explanation
+    6. Specify the subject code: E (English), M (Math), R (Reading), S (Science)
+    7. Specify the difficulty code: E (Easy), M (Medium), H (Hard)
+    
+    Format each question as compact JSON with these short keys, options listed in A-D order:
+    {"c": "Any necessary passage, equation, or background information...", "q": "question text",
+     "o": ["option A", "option B", "option C", "option D"], "a": "A", "x": "explanation text",
+     "s": "subject code", "d": "difficulty code"}
+    
+    For Reading and English questions, ALWAYS include a relevant passage in the context.
+    For Math questions, include any necessary equations or diagrams described in text.
+    For Science questions, include any relevant data, graphs described in text, or experimental setup.
+    
+    Return all questions in a JSON array. Make sure distractors (incorrect options) are plausible 
+    but clearly incorrect to a knowledgeable test-taker. Include common misconceptions as distractors.
+    The correct answer should be randomly distributed among A, B, C, and D across questions."""
+
+# Passage subjects are generated as clusters of this many questions on one
+# shared passage, so the passage is written (and paid for) once; 1 disables it
+PASSAGE_CLUSTER_SIZE = int(os.getenv("PASSAGE_CLUSTER_SIZE", "3"))
+# Completion tokens for each cluster question after the first, which needs no passage
+CLUSTER_QUESTION_TOKENS = 180
+
+PASSAGE_CLUSTER_FORMAT = """When the request asks for passage clusters, write ONE passage per listed subject
+    and ask {size} questions about it. Instead of separate question objects, return each of these
+    subjects as a single passage cluster in the same JSON array:
+    {{"c": "the shared passage", "s": "subject code",
+     "qs": [{{"q": "...", "o": ["...", "...", "...", "..."], "a": "A", "x": "...", "d": "difficulty code"}}]}}
+    Do not repeat the passage inside the cluster's questions."""
+
+# Bump when the wording of the prompt prefix changes
+PROMPT_VERSION = "3"
+# Static prefix shared by generation and repair prompts. Per-request data goes
+# after it, so provider-side prompt caching can reuse the prefix's prefill.
+QUESTION_PROMPT = PromptTemplate(
+    "questions", PROMPT_VERSION, SYSTEM_PROMPT, QUESTION_FORMAT,
+    PASSAGE_CLUSTER_FORMAT.format(size=PASSAGE_CLUSTER_SIZE) if PASSAGE_CLUSTER_SIZE > 1 else "",
+    f"USA Median ACT Results, for comparison: {SAMPLE_USA_RESULTS}"
+)
+
+# Every generated set should cover these subjects
+REQUIRED_CATEGORIES = (Category.ENGLISH, Category.MATH, Category.READING, Category.SCIENCE)
+
+# Follow-up completions for subjects missing after validation
+REPAIR_MAX_ATTEMPTS = int(os.getenv("REPAIR_MAX_ATTEMPTS", "2"))
+REPAIR_BUDGET_SECONDS = float(os.getenv("REPAIR_BUDGET_SECONDS", "30"))
+# Completion token budgets per requested question, sized for the compact output schema
+REPAIR_TOKENS_PER_QUESTION = 550
+GENERATION_TOKENS_PER_QUESTION = 450
+
+# Time a generation request has to produce its set; near the end, calls race two models
+GENERATION_DEADLINE_SECONDS = float(os.getenv("GENERATION_DEADLINE_SECONDS", "45"))
+
+# Longest deadline a request may ask for with `deadline_seconds`
+MAX_DEADLINE_SECONDS = float(os.getenv("MAX_DEADLINE_SECONDS", "120"))
+# Seconds of the deadline history loading may use, and at most this fraction of
+# the time left; past them generation goes on with the history loaded so far
+HISTORY_BUDGET_SECONDS = float(os.getenv("HISTORY_BUDGET_SECONDS", "5"))
+HISTORY_BUDGET_FRACTION = float(os.getenv("HISTORY_BUDGET_FRACTION", "0.25"))
+
+# Pin kinds (the "kind" keyvalue) holding question history; packs are read
+# through their manifests
+HISTORY_KINDS = ("question", "responses", "question-manifest", "responses-manifest")
+
+# Pinata history only seeds the dedup index, so it is reloaded at most this often
+HISTORY_REFRESH_SECONDS = float(os.getenv("HISTORY_REFRESH_SECONDS", "300"))
+_history_loaded_at = None
+# CIDs already in the dedup index, so a load cut short by its budget picks up
+# where it stopped and a refresh only reads new pins
+_history_cids = set()
+_history_lock = threading.Lock()
+
+# Per-student ability estimates used in place of raw answer history
+STUDENT_STATE = StudentStateStore()
+
+# Cache shared by every worker process: CID content and pack manifests never
+# change, pin listings and generated results are kept for a short while
+PIN_LIST_TTL = float(os.getenv("PIN_LIST_TTL", "60"))
+# A retried request (same body, including its `request_id`) within this many
+# seconds gets the same set back instead of a new generation. Requests without
+# a request_id are never served from cache, so asking again gets a fresh set.
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "30"))
+CID_CACHE = SharedCache("cid")
+PIN_LIST_CACHE = SharedCache("pin_list", ttl=PIN_LIST_TTL)
+RESULT_CACHE = SharedCache("result", ttl=RESULT_CACHE_TTL)
+
+# Bounds concurrent generations; excess requests queue fairly per client or get a 429
+ADMISSION = AdmissionController()
+# Secret trusted front ends send as X-Client-Secret. Only their user_id and
+# X-Client-Id are used to queue fairly; anyone else is keyed on their address,
+# so a caller cannot dodge the per-client limit by making up identities
+CLIENT_ID_SECRET = os.getenv("CLIENT_ID_SECRET", "")
+
+# Where question history and response logs are read from and written to
+STORAGE = create_backend(jwt_token=PINATA_JWT)
+
+# Persistent bank of validated questions, consulted before calling the model
+QUESTION_BANK_ENABLED = os.getenv("QUESTION_BANK_ENABLED", "1") == "1"
+QUESTION_BANK = QuestionBank() if QUESTION_BANK_ENABLED else None
+
+# Near-duplicate index over every question seen in history or served so far
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+DEDUP_INDEX = DuplicateIndex(threshold=DEDUP_THRESHOLD)
 # Add this HTML_TEMPLATE constant right after the sample data constants and before the functions
 
 HTML_TEMPLATE = """
@@ -174,38 +307,57 @@ HTML_TEMPLATE = """
 </html>
 """
 
+# Compile the test UI template once instead of on every request
+INDEX_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
 
-def get_pinata_questions(jwt_token: str) -> List[Dict]:
+def get_stored_questions(backend: StorageBackend = None, seen: Optional[set] = None) -> List[Dict]:
     """
-    Retrieve all pinned questions from Pinata.
+    Retrieve all stored questions and responses from the storage backend.
+    
+    Only pins tagged as questions or response logs are listed, filtered by the
+    backend, and each user's response log is read from its newest snapshot
+    only, since every snapshot holds the whole log. Pins uploaded before
+    tagging are tagged once with backfill_pins.py.
     
     Args:
-        jwt_token (str): Pinata JWT token
+        backend (StorageBackend, optional): Backend to read, defaults to STORAGE
+        seen (set, optional): CIDs to skip; each file read is added to it
     
     Returns:
-        List[Dict]: List of question data from pinned files
+        List[Dict]: List of question data from stored files
     """
-    # API endpoint for getting pinned files
-    url = "https://api.pinata.cloud/data/pinList?status=pinned"
-    
-    headers = {
-        "Authorization": f"Bearer {jwt_token}"
-    }
-    
+    backend = backend or STORAGE
     try:
-        # Get list of pinned files
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        pinned_files = response.json()
+        # Get list of stored files, shared across workers for PIN_LIST_TTL
+        with span("pin_list"):
+            entries = []
+            for kind in HISTORY_KINDS:
+                cache_key = f"{type(backend).__name__}:{kind}"
+                listed = PIN_LIST_CACHE.get_object(cache_key)
+                if listed is None:
+                    listed = backend.list(keyvalues={"kind": kind})
+                    PIN_LIST_CACHE.set_object(cache_key, listed)
+                entries.extend(listed)
+            entries = newest_snapshots(entries)
+            if seen is not None:
+                entries = [e for e in entries if e["cid"] not in seen]
         
         all_questions = []
         
-        # Iterate through pinned files
-        for row in pinned_files.get('rows', []):
-            cid = row.get('ipfs_pin_hash')
-            
-            # Get content of each file
-            content = get_file_content(cid)
+        # Iterate through stored files, keeping what was read if the deadline passes
+        for i, entry in enumerate(entries):
+            if expired():
+                logger.warning("Stopped reading stored questions at the deadline after %d of %d files",
+                               i, len(entries))
+                break
+            # Get content of each file, or every record of a pack
+            if (entry.get("keyvalues") or {}).get("kind", "").endswith("-manifest"):
+                content = get_pack_content(entry["cid"], backend)
+            else:
+                content = get_file_content(entry["cid"], backend)
+            if content is not None and seen is not None:
+                seen.add(entry["cid"])
             if content:
                 # If content is a list, extend all_questions
                 if isinstance(content, list):
@@ -217,244 +369,542 @@ def get_pinata_questions(jwt_token: str) -> List[Dict]:
         return all_questions
         
     except Exception as e:
-        print(f"Error getting pinned questions: {e}")
+        logger.error("Error getting stored questions: %s", e)
         return []
 
-def get_file_content(cid: str) -> Optional[Dict]:
+def newest_snapshots(entries: List[Dict]) -> List[Dict]:
+    """Drop all but the newest response log snapshot of each user, returning the rest newest first."""
+    seen_users = set()
+    kept = []
+    for entry in sorted(entries, key=lambda e: pin_timestamp(e.get("created_at")), reverse=True):
+        tags = entry.get("keyvalues") or {}
+        if tags.get("kind") == "responses":
+            if tags.get("user") in seen_users:
+                continue
+            seen_users.add(tags.get("user"))
+        kept.append(entry)
+    return kept
+
+def get_file_content(cid: str, backend: StorageBackend = None) -> Optional[Dict]:
     """
     Get content of a specific file by CID.
     
     Args:
         cid (str): The IPFS CID of the file
+        backend (StorageBackend, optional): Backend to read, defaults to STORAGE
     
     Returns:
         Optional[Dict]: The file content as JSON if successful, None if failed
     """
-    url = f"https://gateway.pinata.cloud/ipfs/{cid}"
+    try:
+        with span("cid_fetch", cid=cid):
+            # Content under a CID never changes, so any worker's copy is good
+            cached = CID_CACHE.get(cid)
+            if cached is not None:
+                return storage_format.decode(cached)
+            # A payload that does not decode counts as a failed read
+            content, raw = (backend or STORAGE).get(cid, parse=lambda data: (storage_format.decode(data), data))
+        CID_CACHE.set(cid, raw)
+        return content
+    except Exception as e:
+        logger.error("Error getting file content for %s: %s", cid, e)
+        return None
+
+def get_pack_content(manifest_cid: str, backend: StorageBackend = None) -> Optional[List[Dict]]:
+    """
+    Get every record of a pack by its manifest CID.
     
+    Returns:
+        Optional[List[Dict]]: The records if successful, None if failed
+    """
+    backend = backend or STORAGE
     try:
-        response = requests.get(url)
-        print("clutch")
-        response.raise_for_status()
-        
-        # Try to parse as JSON
-        try:
-            return response.json()
-        except:
-            print(f"File {cid} is not valid JSON")
-            return None
-            
+        with span("pack_fetch", cid=manifest_cid):
+            manifest = packs.fetch_manifest(backend, manifest_cid)
+            if not manifest["count"]:
+                return []
+            return packs.read_records(backend, manifest, range(manifest["count"]))
     except Exception as e:
-        print(f"Error getting file content for {cid}: {e}")
+        logger.error("Error reading pack %s: %s", manifest_cid, e)
         return None
 
-def generate_questions(user_results: Dict, regional_results: Dict) -> List[Dict]:
+def generate_questions(user_results: Dict, regional_results: Dict, user_id: str = "anonymous") -> List[Dict]:
     """
     Generate questions based on user and regional results.
     
     Args:
         user_results (Dict): User's previous results
         regional_results (Dict): Regional performance data
+        user_id (str): Student the questions are for
     
     Returns:
         List[Dict]: Generated questions
     """
-    jwt_token = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJ1c2VySW5mb3JtYXRpb24iOnsiaWQiOiI4YmVmMTM1YS03NDY2LTQ1MjQtODhjMy00MGYzNzg2NmViZDciLCJlbWFpbCI6InNpbW9uZ2FnZTBAZ21haWwuY29tIiwiZW1haWxfdmVyaWZpZWQiOnRydWUsInBpbl9wb2xpY3kiOnsicmVnaW9ucyI6W3siZGVzaXJlZFJlcGxpY2F0aW9uQ291bnQiOjEsImlkIjoiRlJBMSJ9LHsiZGVzaXJlZFJlcGxpY2F0aW9uQ291bnQiOjEsImlkIjoiTllDMSJ9XSwidmVyc2lvbiI6MX0sIm1mYV9lbmFibGVkIjpmYWxzZSwic3RhdHVzIjoiQUNUSVZFIn0sImF1dGhlbnRpY2F0aW9uVHlwZSI6InNjb3BlZEtleSIsInNjb3BlZEtleUtleSI6ImZhNjUxNWZkOTRkMDMyZGQwN2QzIiwic2NvcGVkS2V5U2VjcmV0IjoiOWUyZTRiOTE4NDVjMDA4OWE3YzM0NDdhZDVhZDJkZTAyMTdkNGM5MjExOTI2ODEyZDZmMWRkMDlmYmU2ODA4NCIsImV4cCI6MTc2MzM1NzkxNH0.zpWQXD9YWbE6BKiBavUtGyZJJkrEiZ4x0j1zxzgpmJs"
-    
-    # Get all questions from Pinata
-    questions_answered = get_pinata_questions(jwt_token)
+    return generate_question_set(user_results, regional_results, user_id)[0]
+
+def generate_question_set(user_results: Dict, regional_results: Dict, user_id: str = "anonymous",
+                          deadline: Optional[float] = None) -> Tuple[List[Dict], bool]:
     """
-    Generate and parse ACT practice questions based on test results using LLaMA API
+    Generate questions based on user and regional results, within a deadline.
+    
+    Subjects are served from the question bank first; the model is only asked
+    for the subjects the bank cannot cover with a question the student has not seen.
+    
+    Every stage runs under the deadline. History loading gets at most
+    HISTORY_BUDGET_SECONDS of it, and no more than HISTORY_BUDGET_FRACTION of
+    the time left, and carries on with what it has loaded; a completion still
+    running at the deadline is cut off and the banked questions and those that
+    had fully arrived are served as a partial set.
+    
+    Args:
+        user_results (Dict): User's previous results
+        regional_results (Dict): Regional performance data
+        user_id (str): Student the questions are for
+        deadline (float, optional): time.monotonic() by which to answer,
+            GENERATION_DEADLINE_SECONDS from now by default
+    
+    Returns:
+        Tuple[List[Dict], bool]: The questions, and whether the deadline cut the set short
     """
-    prompt = f"""
+    started = time.monotonic()
+    with deadline_scope(deadline or started + GENERATION_DEADLINE_SECONDS):
+        with span("bank_lookup"):
+            banked_questions = draw_from_bank(user_results, user_id)
+        missing = missing_categories(banked_questions)
+        if not missing:
+            logger.info("Served all subjects from the question bank")
+            return serve_questions(banked_questions, user_results, user_id), False
+
+        with span("student_state"):
+            student_state = STUDENT_STATE.state_vector(user_id)
+            weakest = STUDENT_STATE.weakest_subjects(user_id)
+        # Weakest subjects are asked for first, so a completion cut off at the
+        # deadline still covers them
+        missing.sort(key=lambda c: weakest.index(c.value))
+        index_history()
+        """
+        Generate and parse ACT practice questions based on test results using LLaMA API
+        """
+        subjects = ", ".join(c.value for c in missing)
+        clustered = passage_clusters(missing)
+        prompt = f"""
     Given the following test results:
     User ACT Results: {user_results}
     Regional ACT Results: {regional_results}
-    USA Median ACT Results: {SAMPLE_USA_RESULTS}
 
-    Questions Previously Asnwered: {questions_answered}
-    
-    Generate 4 ACT-style multiple choice practice questions, one for each subject, focusing on areas needing improvement.
-    For each question:
-    1. Include any necessary context (passages, equations, diagrams described in text, etc.) before the question
-    2. Provide the actual question
-    3. Include four multiple choice options (A, B, C, D)
-    4. Indicate the correct answer
-    5. Provide a detailed explanation
-    6. Specify the category (Reading/Math/Science/English)
-    7. Specify the difficulty level (Easy/Medium/Hard)
-    
-    Format each question as JSON with the following structure:
-    {{
-        "context": "Any necessary passage, equation, or background information...",
-        "question": "question text",
-        "options": {{
-            "A": "first option",
-            "B": "second option",
-            "C": "third option",
-            "D": "fourth option"
-        }},
-        "correct_option": "A",
-        "explanation": "explanation text",
-        "category": "subject category",
-        "difficulty": "difficulty level"
-    }}
-    
-    For Reading and English questions, ALWAYS include a relevant passage in the context.
-    For Math questions, include any necessary equations or diagrams described in text.
-    For Science questions, include any relevant data, graphs described in text, or experimental setup.
+    Student Ability Estimates (logit scale, 0 is average): {student_state}
     
-    Return all questions in a JSON array. Make sure distractors (incorrect options) are plausible 
-    but clearly incorrect to a knowledgeable test-taker. Include common misconceptions as distractors.
-    The correct answer should be randomly distributed among A, B, C, and D across questions.
+    Generate {len(missing)} ACT-style multiple choice practice questions, one for each of these subjects, weakest first: {subjects}, focusing on areas needing improvement.
+    {cluster_instructions(clustered)}
     """
-    
-    try:
-        logger.debug(f"Sending request to API with user_results: {user_results}")
-        response = client.chat.completions.create(
-            model='Meta-Llama-3.1-8B-Instruct',
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an educational assistant that generates targeted practice questions based on weaknesses and test performance analysis. Return responses in JSON format. Always include necessary context for questions."
-                },
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
-        )
-        
-        # Extract and clean response content
-        response_content = response.choices[0].message.content
-        cleaned_content = response_content
-        if "```json" in cleaned_content:
-            cleaned_content = cleaned_content.split("```json")[1]
-        if "```" in cleaned_content:
-            cleaned_content = cleaned_content.split("```")[0]
         
-        cleaned_content = cleaned_content.strip()
-        
-        # Parse and validate questions
+        cut_off = False
         try:
-            questions = json.loads(cleaned_content)
-            validated_questions = []
-            required_fields = {"context", "question", "options", "correct_option", "explanation", "category", "difficulty"}
-            
-            for q in questions:
-                if all(field in q for field in required_fields):
-                    if isinstance(q["options"], dict) and all(opt in q["options"] for opt in ["A", "B", "C", "D"]):
-                        # Ensure context is not empty for Reading/English questions
-                        if q["category"] in ["Reading", "English"] and not q["context"].strip():
-                            logger.warning(f"Skipping question with empty context: {q}")
-                            continue
-                        validated_questions.append(q)
-                    else:
-                        logger.warning(f"Invalid options format in question: {q}")
-                else:
-                    logger.warning(f"Skipping invalid question format: {q}")
+            logger.debug("Sending request to API with user_results: %s", user_results)
+            try:
+                cleaned_content, validated_questions = request_completion(
+                    prompt, max_tokens=(GENERATION_TOKENS_PER_QUESTION * len(missing)
+                                        + CLUSTER_QUESTION_TOKENS * (PASSAGE_CLUSTER_SIZE - 1) * len(clustered)),
+                    subjects=missing, difficulty=request_difficulty(user_results, missing),
+                    deadline=current_deadline(),
+                    parse=lambda content: (content, extract_questions(content))
+                )
+            except CompletionRejected as e:
+                logger.warning("No model returned usable questions: %s", e)
+                cleaned_content, validated_questions = clean_completion(e.content), []
+            except (CompletionTimeout, DeadlineExceeded) as e:
+                logger.warning("Generation cut off at the deadline, keeping the questions received: %s", e)
+                cut_off = True
+                cleaned_content = clean_completion(getattr(e, "content", ""))
+                validated_questions = parse_partial_questions(cleaned_content)
+
+            duplicates = []
+            validated_questions = banked_questions + drop_duplicates(validated_questions, duplicates)
+            validated_questions = repair_questions(validated_questions, user_results, regional_results, started,
+                                                   duplicates)
+            validated_questions = fill_from_duplicates(validated_questions, duplicates)
             
             if not validated_questions:
+                if cut_off or expired():
+                    logger.warning("Deadline passed before any question was generated")
+                    return [], True
+                if is_json(cleaned_content):
+                    raise ValueError("The model returned no valid questions")
                 logger.info("No valid questions found, attempting unstructured parsing")
-                return parse_unstructured_response(cleaned_content)
+                with span("parse_unstructured"):
+                    return parse_unstructured_response(cleaned_content), False
             
-            return validated_questions
-            
-        except json.JSONDecodeError as e:
-            logger.warning(f"JSON parsing failed: {e}")
-            return parse_unstructured_response(cleaned_content)
-            
-    except Exception as e:
-        logger.error(f"Error generating questions: {e}")
-        return [{"error": str(e), 
-                "context": "Error occurred",
-                "question": "Error generating question", 
-                "options": {"A": "N/A", "B": "N/A", "C": "N/A", "D": "N/A"},
-                "correct_option": "A",
-                "explanation": str(e), 
-                "category": "Error", 
-                "difficulty": "N/A"}]
-def parse_unstructured_response(response_text: str) -> List[Dict]:
-    """
-    Enhanced fallback parser for unstructured text responses
-    """
-    logger.debug(f"Parsing unstructured response: {response_text}")
+            partial = cut_off or (expired() and bool(missing_categories(validated_questions)))
+            return serve_questions(validated_questions, user_results, user_id), partial
+                
+        except Exception as e:
+            logger.error("Error generating questions: %s", e)
+            return [{"error": str(e), 
+                    "context": "Error occurred",
+                    "question": "Error generating question", 
+                    "options": {"A": "N/A", "B": "N/A", "C": "N/A", "D": "N/A"},
+                    "correct_option": "A",
+                    "explanation": str(e), 
+                    "category": "Error", 
+                    "difficulty": "N/A"}], False
+
+def index_history() -> None:
+    """Load stored history into the dedup index when it is missing or stale."""
+    global _history_loaded_at
+    with _history_lock:
+        if _history_loaded_at is not None and time.monotonic() - _history_loaded_at < HISTORY_REFRESH_SECONDS:
+            return
+        budget = HISTORY_BUDGET_SECONDS
+        left = remaining()
+        if left is not None:
+            # Leave most of the caller's deadline for generation
+            budget = min(budget, max(left, 0.0) * HISTORY_BUDGET_FRACTION)
+        with deadline_scope(time.monotonic() + budget):
+            with span("history_load"):
+                questions_answered = get_stored_questions(seen=_history_cids)
+            complete = not expired()
+        with span("dedup_index", history=len(questions_answered)):
+            DEDUP_INDEX.add_questions(questions_answered)
+        # A load cut short by its budget is resumed by the next request, which
+        # skips the files already read
+        if complete:
+            _history_loaded_at = time.monotonic()
+
+def draw_from_bank(user_results: Dict, user_id: str) -> List[Question]:
+    """Pick one unseen banked question per required subject where the bank has one."""
+    if QUESTION_BANK is None:
+        return []
     questions = []
-    current_question = {}
-    current_options = {}
+    try:
+        for category in REQUIRED_CATEGORIES:
+            drawn = QUESTION_BANK.draw(category, subject_score(user_results, category), user_id)
+            if drawn is not None:
+                questions.append(drawn[1])
+    except sqlite3.Error as e:
+        logger.error("Question bank lookup failed: %s", e)
+    return questions
+
+def serve_questions(questions: List[Question], user_results: Dict, user_id: str) -> List[Dict]:
+    """Bank the questions, remember that the student has seen them and serialize them."""
+    if QUESTION_BANK is not None:
+        try:
+            QUESTION_BANK.mark_served(QUESTION_BANK.add(questions, user_results), user_id)
+        except sqlite3.Error as e:
+            logger.error("Failed to update question bank: %s", e)
+    DEDUP_INDEX.add_questions(questions)
+    return [q.to_dict() for q in questions]
+
+def clean_completion(content: str) -> str:
+    """Strip any markdown code fences from a model reply."""
+    if "```json" in content:
+        content = content.split("```json")[1]
+    if "```" in content:
+        content = content.split("```")[0]
+    return content.strip()
+
+def request_completion(prompt: str, max_tokens: int, subjects: List[Category] = (),
+                       difficulty: Optional[Difficulty] = None, deadline: Optional[float] = None,
+                       parse=None):
+    """
+    Send a prompt to the model routed for it and clean up the reply.
     
-    lines = response_text.split('\n')
-    for line in lines:
-        line = line.strip()
-        if not line:
+    The prompt is sent after QUESTION_PROMPT's static prefix.
+    
+    Args:
+        prompt (str): The per-request part of the prompt
+        max_tokens (int): Completion token limit
+        subjects (List[Category]): Subjects the questions are for, used for routing
+        difficulty (Difficulty, optional): Target difficulty, used for routing
+        deadline (float, optional): time.monotonic() by which the reply is needed
+        parse (callable, optional): Applied to the cleaned content; a reply it raises
+            on is rejected and the next model is tried
+    
+    Returns:
+        The cleaned response content, or what `parse` returned for it
+    """
+    messages = QUESTION_PROMPT.render(prompt)
+
+    def finish(content: str):
+        cleaned_content = clean_completion(content)
+        return parse(cleaned_content) if parse is not None else cleaned_content
+
+    return MODEL_ROUTER.complete(messages, max_tokens, subjects=subjects, difficulty=difficulty,
+                                 deadline=deadline, parse=finish, prompt_id=QUESTION_PROMPT.id)
+
+def request_difficulty(user_results: Dict, categories: List[Category]) -> Difficulty:
+    """Hardest target difficulty among the subjects of a request."""
+    targets = {target_difficulty(subject_score(user_results, c)) for c in categories}
+    for difficulty in (Difficulty.HARD, Difficulty.MEDIUM):
+        if difficulty in targets:
+            return difficulty
+    return Difficulty.EASY
+
+def extract_questions(content: str) -> List[Question]:
+    """
+    Valid questions in a completion, falling back to the unstructured parser
+    when the content is not JSON.
+    
+    Raises:
+        ValueError: If no valid question could be extracted
+    """
+    try:
+        questions = parse_questions(content)
+    except json.JSONDecodeError as e:
+        logger.warning("JSON parsing failed: %s", e)
+        with span("parse_unstructured"):
+            questions = validate_questions(parse_unstructured_response(content))
+    if not questions:
+        raise ValueError("No valid questions in completion")
+    return questions
+
+def parse_questions(content: str) -> List[Question]:
+    """
+    Decode a JSON array of questions, expand the compact schema and keep the valid ones.
+    
+    Raises:
+        json.JSONDecodeError: If the content is not valid JSON
+    """
+    with span("parse"):
+        questions = json.loads(content)
+    if isinstance(questions, dict):
+        questions = [questions]
+    questions = question_model.expand_compact(questions)
+    with span("validate", received=len(questions)):
+        return validate_questions(
+            questions,
+            on_invalid=lambda q, e: logger.warning("Skipping invalid question (%s): %s", e, q, extra={"payload": True})
+        )
+
+def passage_clusters(categories: List[Category]) -> List[Category]:
+    """The subjects among `categories` to generate as passage clusters."""
+    if PASSAGE_CLUSTER_SIZE < 2:
+        return []
+    return [c for c in categories if c in question_model.PASSAGE_CATEGORIES]
+
+def cluster_instructions(categories: List[Category]) -> str:
+    """Request line asking for passage clusters, empty when there are none."""
+    if not categories:
+        return ""
+    return f"Write {' and '.join(c.value for c in categories)} as passage clusters."
+
+def parse_partial_questions(content: str) -> List[Question]:
+    """
+    Keep the valid questions among the complete items of a JSON array whose
+    end was cut off, such as a completion stopped at the deadline.
+    """
+    decoder = json.JSONDecoder()
+    items = []
+    pos = content.find("[") + 1
+    if pos:
+        while True:
+            while pos < len(content) and content[pos] in " \t\r\n,":
+                pos += 1
+            try:
+                item, pos = decoder.raw_decode(content, pos)
+            except json.JSONDecodeError:
+                break
+            items.append(item)
+    with span("validate", received=len(items), partial=True):
+        return validate_questions(question_model.expand_compact(items))
+
+def drop_duplicates(questions: List[Question], dropped: Optional[List[Question]] = None) -> List[Question]:
+    """
+    Remove questions that near-duplicate history or each other.
+    
+    Questions sharing a passage stand or fall together: the first one decides
+    for the cluster, since its siblings would otherwise match it on the passage.
+    Subjects emptied this way are regenerated by repair_questions.
+    
+    Args:
+        questions (List[Question]): Candidate questions
+        dropped (List[Question], optional): Collects the questions removed
+    """
+    unique = []
+    batch = DuplicateIndex(threshold=DEDUP_THRESHOLD)
+    passages = {}
+    for q in questions:
+        if q.context_id in passages:
+            if passages[q.context_id]:
+                unique.append(q)
+            elif dropped is not None:
+                dropped.append(q)
             continue
-            
-        logger.debug(f"Processing line: {line}")
-        
-        if any(line.lower().startswith(start) for start in ['q:', 'question:', 'problem:']):
-            if current_question and current_question.get('question'):
-                current_question['options'] = current_options
-                questions.append(current_question)
-            current_question = {
-                "question": line.split(':', 1)[1].strip(),
-                "options": {},
-                "correct_option": "A",
-                "explanation": "",
-                "category": "Unknown",
-                "difficulty": "Medium"
-            }
-            current_options = {}
-        elif line.startswith('A)') or line.startswith('A.'):
-            current_options["A"] = line.split(')', 1)[1].strip() if ')' in line else line.split('.', 1)[1].strip()
-        elif line.startswith('B)') or line.startswith('B.'):
-            current_options["B"] = line.split(')', 1)[1].strip() if ')' in line else line.split('.', 1)[1].strip()
-        elif line.startswith('C)') or line.startswith('C.'):
-            current_options["C"] = line.split(')', 1)[1].strip() if ')' in line else line.split('.', 1)[1].strip()
-        elif line.startswith('D)') or line.startswith('D.'):
-            current_options["D"] = line.split(')', 1)[1].strip() if ')' in line else line.split('.', 1)[1].strip()
-        elif line.lower().startswith('correct:') or line.lower().startswith('answer:'):
-            answer_text = line.split(':', 1)[1].strip()
-            if answer_text.upper() in ['A', 'B', 'C', 'D']:
-                current_question["correct_option"] = answer_text.upper()
-        elif line.lower().startswith('explanation:'):
-            current_question["explanation"] = line.split(':', 1)[1].strip()
-        elif line.lower().startswith('category:'):
-            current_question["category"] = line.split(':', 1)[1].strip()
-        elif line.lower().startswith('difficulty:'):
-            current_question["difficulty"] = line.split(':', 1)[1].strip()
-    
-    # Add the last question if exists
-    if current_question and current_question.get('question'):
-        current_question['options'] = current_options
-        questions.append(current_question)
-    
-    logger.debug(f"Parsed questions: {questions}")
-    return questions if questions else [{"question": "Failed to generate questions", 
-                                      "options": {"A": "N/A", "B": "N/A", "C": "N/A", "D": "N/A"},
-                                      "correct_option": "A",
-                                      "explanation": "The API response format was unexpected", 
-                                      "category": "Error", "difficulty": "N/A"}]
+        duplicate = DEDUP_INDEX.is_duplicate(q) or batch.is_duplicate(q)
+        if q.context_id:
+            passages[q.context_id] = not duplicate
+        if duplicate:
+            logger.info("Dropping near-duplicate %s question", q.category.value)
+            if dropped is not None:
+                dropped.append(q)
+            continue
+        batch.add_questions([q])
+        unique.append(q)
+    return unique
+
+def fill_from_duplicates(questions: List[Question], duplicates: List[Question]) -> List[Question]:
+    """
+    Fill subjects still missing after repair with the near-duplicates dropped
+    for them, least similar to history first, so a student who has seen most of
+    what the model writes still gets a full set instead of an error. A passage
+    question brings its cluster siblings along.
+    """
+    questions = list(questions)
+    for category in missing_categories(questions):
+        candidates = [q for q in duplicates if q.category == category]
+        if not candidates:
+            continue
+        chosen = min(candidates, key=lambda q: DEDUP_INDEX.similarity(question_text(q)))
+        logger.info("Serving a near-duplicate %s question, nothing new was generated", category.value)
+        if chosen.context_id:
+            questions.extend(q for q in duplicates if q.context_id == chosen.context_id)
+        else:
+            questions.append(chosen)
+    return questions
+
+def is_json(content: str) -> bool:
+    """Whether a completion parses as JSON at all."""
+    try:
+        json.loads(content)
+    except ValueError:
+        return False
+    return True
+
+def missing_categories(questions: List[Question]) -> List[Category]:
+    """Return the required subjects that have no valid question yet."""
+    present = {q.category for q in questions}
+    return [c for c in REQUIRED_CATEGORIES if c not in present]
+
+def repair_questions(questions: List[Question], user_results: Dict, regional_results: Dict,
+                     started: float, dropped: Optional[List[Question]] = None) -> List[Question]:
+    """
+    Fill in subjects that are missing after validation.
+    
+    Instead of regenerating the whole set, a small follow-up completion is issued
+    for just the missing subjects, up to REPAIR_MAX_ATTEMPTS times and while the
+    request is within REPAIR_BUDGET_SECONDS.
+    
+    Args:
+        questions (List[Question]): Questions that already passed validation
+        user_results (Dict): User's previous results
+        regional_results (Dict): Regional performance data
+        started (float): time.monotonic() at the start of the request
+        dropped (List[Question], optional): Collects repaired questions dropped as near-duplicates
+    
+    Returns:
+        List[Question]: The input questions plus any repaired ones
+    """
+    questions = list(questions)
+    for attempt in range(REPAIR_MAX_ATTEMPTS):
+        missing = missing_categories(questions)
+        if not missing:
+            break
+        if time.monotonic() - started > REPAIR_BUDGET_SECONDS or expired():
+            logger.info("Repair budget exhausted with %d subjects missing", len(missing))
+            break
+
+        subjects = ", ".join(c.value for c in missing)
+        clustered = passage_clusters(missing)
+        prompt = f"""
+    Given the following test results:
+    User ACT Results: {user_results}
+    Regional ACT Results: {regional_results}
+    
+    Generate {len(missing)} ACT-style multiple choice practice questions, exactly one for each of these subjects: {subjects}.
+    {cluster_instructions(clustered)}
+    """
+        try:
+            with span("repair", attempt=attempt, subjects=subjects):
+                repaired = drop_duplicates(request_completion(
+                    prompt, max_tokens=(REPAIR_TOKENS_PER_QUESTION * len(missing)
+                                        + CLUSTER_QUESTION_TOKENS * (PASSAGE_CLUSTER_SIZE - 1) * len(clustered)),
+                    subjects=missing, difficulty=request_difficulty(user_results, missing),
+                    deadline=current_deadline(), parse=parse_questions
+                ), dropped)
+        except CompletionTimeout as e:
+            logger.warning("Repair attempt %d cut off at the deadline", attempt + 1)
+            repaired = drop_duplicates(parse_partial_questions(clean_completion(e.content)), dropped)
+        except CompletionRejected as e:
+            logger.warning("Repair attempt %d returned no usable questions: %s", attempt + 1, e)
+            continue
+        except Exception as e:
+            logger.error("Repair attempt %d failed: %s", attempt + 1, e)
+            break
+
+        # A repaired passage question brings the rest of its cluster along
+        clusters = set()
+        for q in repaired:
+            if q.category in missing:
+                questions.append(q)
+                missing.remove(q.category)
+                if q.context_id:
+                    clusters.add(q.context_id)
+            elif q.context_id in clusters:
+                questions.append(q)
+    return questions
+
+def traced_request(view):
+    """
+    Run a view inside a request-scoped trace.
+
+    Sending an `X-Profile: 1` header or `?profile=1`, together with
+    PROFILE_SECRET as `X-Profile-Secret`, also samples the request with a
+    profiler and stores its folded-stack flame graph under PROFILE_DIR. Stored
+    profiles and traces are named after the X-Trace-Id the response carries;
+    failing to write them never fails the request.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        profiler = None
+        if profiling_requested(request.headers, request.args):
+            profiler = SamplingProfiler().start()
+        with start_trace(view.__name__, method=request.method, path=request.path) as trace:
+            try:
+                response = make_response(view(*args, **kwargs))
+            finally:
+                if profiler:
+                    profiler.stop()
+                    try:
+                        trace.profile_path = profiler.save(trace.trace_id)
+                    except OSError as e:
+                        logger.error("Failed to save profile %s: %s", trace.trace_id, e)
+
+        response.headers['X-Trace-Id'] = trace.trace_id
+        if TRACE_EXPORT_DIR or profiler:
+            try:
+                trace.export()
+            except OSError as e:
+                logger.error("Failed to export trace %s: %s", trace.trace_id, e)
+        return response
+    return wrapper
+
+def render_result(result: str):
+    """Render the test UI with a JSON result embedded."""
+    return render_page(INDEX_TEMPLATE, payload_size=len(result), result=result)
+
 @app.route('/')
 def test_interface():
     """Test interface endpoint"""
-    return render_template_string(HTML_TEMPLATE)
+    return render_page(INDEX_TEMPLATE)
 
 @app.route('/test-sample', methods=['POST'])
+@traced_request
 def test_with_sample():
     """Test endpoint using sample data"""
     try:
         logger.info("Generating questions with sample data")
         questions = generate_questions(SAMPLE_USER_RESULTS, SAMPLE_REGIONAL_RESULTS)
-        logger.debug(f"Generated questions: {questions}")
+        logger.debug("Generated questions: %s", questions, extra={"payload": True})
         # Properly format the result as JSON string
-        result = json.dumps(questions, indent=2)
-        return render_template_string(HTML_TEMPLATE, result=result)
+        result = question_model.dumps(questions, pretty=True)
+        return render_result(result)
     except Exception as e:
-        logger.error(f"Error in test_with_sample: {e}")
+        logger.error("Error in test_with_sample: %s", e)
         error_response = [{"error": str(e), "question": "Error occurred", "answer": "N/A",
                           "explanation": str(e), "category": "Error", "difficulty": "N/A"}]
-        return render_template_string(HTML_TEMPLATE, result=json.dumps(error_response, indent=2))
+        return render_result(question_model.dumps(error_response, pretty=True))
 
 @app.route('/test-custom', methods=['POST'])
+@traced_request
 def test_with_custom():
     """Test endpoint using custom data"""
     try:
@@ -462,44 +912,163 @@ def test_with_custom():
         user_results = json.loads(request.form['user_results'])
         regional_results = json.loads(request.form['regional_results'])
         questions = generate_questions(user_results, regional_results)
-        return render_template_string(HTML_TEMPLATE, result=json.dumps(questions, indent=2))
+        return render_result(question_model.dumps(questions, pretty=True))
     except Exception as e:
-        logger.error(f"Error in test_with_custom: {e}")
+        logger.error("Error in test_with_custom: %s", e)
         error_response = [{"error": str(e), "question": "Error occurred", "answer": "N/A",
                           "explanation": str(e), "category": "Error", "difficulty": "N/A"}]
-        return render_template_string(HTML_TEMPLATE, result=json.dumps(error_response, indent=2))
+        return render_result(question_model.dumps(error_response, pretty=True))
 
-@app.route('/generate-questions', methods=['POST'])
-def create_questions():
-    """API endpoint to generate questions"""
+def close_stores() -> None:
+    """
+    Close the SQLite-backed stores so no connection is carried across a fork.
+    
+    A preforking server calls this in the parent after loading the app, and
+    open_stores in each worker after forking.
+    """
+    STUDENT_STATE.close()
+    STORAGE.close()
+    if QUESTION_BANK is not None:
+        QUESTION_BANK.close()
+
+def open_stores() -> None:
+    """Open this process's own connections to the SQLite-backed stores."""
+    global STUDENT_STATE, STORAGE, QUESTION_BANK
+    STUDENT_STATE = StudentStateStore()
+    STORAGE = create_backend(jwt_token=PINATA_JWT)
+    QUESTION_BANK = QuestionBank() if QUESTION_BANK_ENABLED else None
+
+def generate_response(data: Optional[Dict], received_at: Optional[float] = None) -> Tuple[Dict, int]:
+    """
+    Handle a generation request body and build the API response.
+    
+    Shared by the HTTP endpoint and the in-process transport so both give the
+    same results and error shapes. The request must be answered within its
+    `deadline_seconds` (capped at MAX_DEADLINE_SECONDS) or
+    GENERATION_DEADLINE_SECONDS, counted from `received_at`. A set the deadline
+    cut short is returned with `partial: true`.
+    
+    Args:
+        data (Dict, optional): The request body
+        received_at (float, optional): time.monotonic() when the request arrived, defaults to now
+    
+    Returns:
+        Tuple[Dict, int]: The response payload and HTTP status code
+    """
+    received_at = received_at or time.monotonic()
     try:
-        data = request.get_json()
-        
         if not data or 'user_results' not in data or 'regional_results' not in data:
-            return jsonify({
+            return {
                 'error': 'Missing required fields. Please provide user_results and regional_results.'
-            }), 400
+            }, 400
+        try:
+            seconds = float(data.get('deadline_seconds') or GENERATION_DEADLINE_SECONDS)
+        except (TypeError, ValueError):
+            return {'error': 'deadline_seconds must be a number.'}, 400
+        if not math.isfinite(seconds):
+            return {'error': 'deadline_seconds must be a finite number.'}, 400
+        deadline = received_at + min(max(seconds, 1.0), MAX_DEADLINE_SECONDS)
             
-        questions = generate_questions(
+        cache_key = None
+        if data.get('request_id'):
+            cache_key = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+            cached = RESULT_CACHE.get_object(cache_key)
+            if cached is not None:
+                return cached, 200
+
+        questions, partial = generate_question_set(
             data['user_results'],
-            data['regional_results']
+            data['regional_results'],
+            user_id=str(data.get('user_id', 'anonymous')),
+            deadline=deadline
         )
         
-        return jsonify({
+        payload = {
             'status': 'success',
             'questions': questions
-        })
+        }
+        if partial:
+            payload['partial'] = True
+        elif cache_key and not any(isinstance(q, dict) and 'error' in q for q in questions):
+            RESULT_CACHE.set_object(cache_key, payload)
+        return payload, 200
     except Exception as e:
-        logger.error(f"Error in create_questions: {e}")
-        return jsonify({
+        logger.error("Error in create_questions: %s", e)
+        return {
             'status': 'error',
             'message': str(e)
-        }), 500
+        }, 500
+
+def health_status() -> Dict:
+    """Payload of the health check."""
+    return {'status': 'healthy'}
+
+@app.route('/generate-questions', methods=['POST'])
+@traced_request
+def create_questions():
+    """API endpoint to generate questions"""
+    data = request.get_json(silent=True)
+    # Time spent queued for admission counts against the request's deadline
+    received_at = time.monotonic()
+    try:
+        with ADMISSION.admit(client_id(data)):
+            payload, status = generate_response(data, received_at)
+    except Overloaded as e:
+        response = jsonify({
+            'status': 'error',
+            'message': f'Server is busy ({e}). Please retry later.'
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    return jsonify(payload), status
+
+def client_id(data: Optional[Dict]) -> str:
+    """
+    Identity used for fair queuing: the student or client a trusted front end
+    names, else the caller's address.
+    """
+    secret = request.headers.get('X-Client-Secret', '')
+    if CLIENT_ID_SECRET and hmac.compare_digest(secret.encode("utf-8"), CLIENT_ID_SECRET.encode("utf-8")):
+        if isinstance(data, dict) and data.get('user_id'):
+            return f"user:{data['user_id']}"
+        if request.headers.get('X-Client-Id'):
+            return f"client:{request.headers['X-Client-Id']}"
+    return request.remote_addr or 'unknown'
+
+@app.route('/record-answer', methods=['POST'])
+def record_answer():
+    """API endpoint to fold a submitted answer into the student's ability state"""
+    data = request.get_json(silent=True)
+    if not data or not all(k in data for k in ('user_id', 'subject', 'difficulty', 'correct')):
+        return jsonify({
+            'error': 'Missing required fields. Please provide user_id, subject, difficulty and correct.'
+        }), 400
+    if not isinstance(data['correct'], bool):
+        return jsonify({'error': 'correct must be true or false.'}), 400
+    subject = question_model.normalize_category(data['subject'])
+    if subject not in REQUIRED_CATEGORIES:
+        return jsonify({'error': f"subject must be one of {', '.join(c.value for c in REQUIRED_CATEGORIES)}."}), 400
+    difficulty = question_model.normalize_difficulty(data['difficulty'])
+    if difficulty is Difficulty.UNKNOWN:
+        return jsonify({'error': 'difficulty must be Easy, Medium or Hard.'}), 400
+    state = STUDENT_STATE.record_answer(str(data['user_id']), subject, difficulty, data['correct'])
+    return jsonify({'status': 'success', 'state': state})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Admission, shared cache and model counters of this worker"""
+    return jsonify({
+        'admission': ADMISSION.metrics(),
+        'prompt': QUESTION_PROMPT.id,
+        'models': MODEL_ROUTER.metrics(),
+        'cache': {c.namespace: c.stats() for c in (CID_CACHE, PIN_LIST_CACHE, RESULT_CACHE)}
+    })
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy'})
+    return jsonify(health_status())
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
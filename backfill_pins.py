@@ -0,0 +1,78 @@
+"""
+Tag pins uploaded before pin metadata existed, so history reads find them.
+
+    python backfill_pins.py [--dry-run]
+
+History is read by listing pins filtered on their "kind" keyvalue (see
+app.get_stored_questions), which leaves out pins uploaded untagged. This lists
+every pin once, unfiltered, and tags each untagged one with pin_metadata: the
+old shared response log (question_responses.json) as the response log of user
+"legacy", anything else as a question. Tagged pins are left alone, so it can
+be run again safely.
+"""
+import os
+import sys
+import logging
+import argparse
+from typing import Dict
+
+from dotenv import load_dotenv
+
+from storage_backend import StorageBackend, create_backend, pin_metadata
+
+logger = logging.getLogger(__name__)
+
+# User the pre-metadata response log is filed under; it was shared by everyone
+LEGACY_RESPONSES_USER = "legacy"
+
+
+def legacy_metadata(entry: Dict) -> Dict[str, str]:
+    """Keyvalues for an untagged pin, guessed from its name."""
+    if entry["name"].startswith("question_responses"):
+        return pin_metadata("responses", user=LEGACY_RESPONSES_USER)
+    return pin_metadata("question")
+
+
+def backfill(backend: StorageBackend, dry_run: bool = False) -> int:
+    """
+    Tag every untagged pin of `backend`.
+
+    Returns:
+        int: Number of pins tagged, or that would be with `dry_run`
+    """
+    tagged = 0
+    for entry in backend.list():
+        if "kind" in entry["keyvalues"]:
+            continue
+        keyvalues = legacy_metadata(entry)
+        logger.info("Tagging %s (%s) as %s", entry["cid"], entry["name"] or "unnamed", keyvalues["kind"])
+        if not dry_run:
+            try:
+                backend.tag(entry["cid"], keyvalues)
+            except KeyError:
+                logger.warning("Pin %s disappeared before it could be tagged", entry["cid"])
+                continue
+        tagged += 1
+    return tagged
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be tagged")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    try:
+        backend = create_backend(jwt_token=os.getenv("PINATA_JWT"))
+    except ValueError as e:
+        sys.exit(str(e))
+    try:
+        count = backfill(backend, args.dry_run)
+    finally:
+        backend.close()
+    print(f"{'Would tag' if args.dry_run else 'Tagged'} {count} pins")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark for the unstructured-response fallback parser.
+
+Runs the current parser and the previous line-by-line implementation over a
+corpus of model outputs and reports throughput for each.
+
+    python bench_parser.py [corpus_dir] [--repeat N]
+
+Every *.txt file in corpus_dir is used as a sample; without one a synthetic
+corpus of mixed formats is generated with a fixed seed.
+
+On the synthetic corpus the current parser measures about 1.5-1.8x the
+legacy one, varying from run to run. Both are per-line loops over mostly C
+string methods; a single regex pass over the whole text was tried and
+measured slower.
+"""
+import os
+import sys
+import glob
+import random
+import timeit
+import logging
+import argparse
+from typing import Dict, List
+
+from response_parser import parse_unstructured_response
+
+SUBJECTS = ["Reading", "Math", "Science", "English"]
+PASSAGE = ("The settlers who arrived in the valley in the spring of 1847 found the river "
+           "higher than any of their guides had predicted, and the crossing took eleven days.")
+
+logger = logging.getLogger("bench_parser.legacy")
+
+
+def legacy_parse(response_text: str) -> List[Dict]:
+    """
+    The line-by-line parser this module replaced, kept as the baseline.
+
+    Its eager f-string log calls are kept too, since they were part of its cost.
+    """
+    logger.debug(f"Parsing unstructured response: {response_text}")
+    questions = []
+    current_question = {}
+    current_options = {}
+    for line in response_text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        logger.debug(f"Processing line: {line}")
+        if any(line.lower().startswith(start) for start in ['q:', 'question:', 'problem:']):
+            if current_question and current_question.get('question'):
+                current_question['options'] = current_options
+                questions.append(current_question)
+            current_question = {"question": line.split(':', 1)[1].strip(), "options": {},
+                                "correct_option": "A", "explanation": "",
+                                "category": "Unknown", "difficulty": "Medium"}
+            current_options = {}
+        elif line.startswith('A)') or line.startswith('A.'):
+            current_options["A"] = line.split(')', 1)[1].strip() if ')' in line else line.split('.', 1)[1].strip()
+        elif line.startswith('B)') or line.startswith('B.'):
+            current_options["B"] = line.split(')', 1)[1].strip() if ')' in line else line.split('.', 1)[1].strip()
+        elif line.startswith('C)') or line.startswith('C.'):
+            current_options["C"] = line.split(')', 1)[1].strip() if ')' in line else line.split('.', 1)[1].strip()
+        elif line.startswith('D)') or line.startswith('D.'):
+            current_options["D"] = line.split(')', 1)[1].strip() if ')' in line else line.split('.', 1)[1].strip()
+        elif line.lower().startswith('correct:') or line.lower().startswith('answer:'):
+            answer_text = line.split(':', 1)[1].strip()
+            if answer_text.upper() in ['A', 'B', 'C', 'D']:
+                current_question["correct_option"] = answer_text.upper()
+        elif line.lower().startswith('explanation:'):
+            current_question["explanation"] = line.split(':', 1)[1].strip()
+        elif line.lower().startswith('category:'):
+            current_question["category"] = line.split(':', 1)[1].strip()
+        elif line.lower().startswith('difficulty:'):
+            current_question["difficulty"] = line.split(':', 1)[1].strip()
+    if current_question and current_question.get('question'):
+        current_question['options'] = current_options
+        questions.append(current_question)
+    logger.debug(f"Parsed questions: {questions}")
+    return questions
+
+
+def synthetic_sample(rng: random.Random, num_questions: int) -> str:
+    option_styles = ["{}) ", "{}. ", "({}) "]
+    blocks = []
+    for i in range(num_questions):
+        style = rng.choice(option_styles)
+        lines = []
+        if rng.random() < 0.7:
+            lines.append("Context:")
+            lines.extend(" ".join([PASSAGE] * rng.randint(3, 8)) for _ in range(rng.randint(2, 5)))
+        lines.append(f"Question {i + 1}: Which statement is best supported by the passage?")
+        for letter in "ABCD":
+            lines.append(style.format(letter) + f"Option {letter} for question {i + 1}")
+        lines.append(f"Answer: {rng.choice('ABCD')}")
+        lines.append("Explanation: " + PASSAGE)
+        lines.extend(" ".join([PASSAGE] * rng.randint(1, 3)) for _ in range(rng.randint(0, 2)))
+        lines.append(f"Category: {rng.choice(SUBJECTS)}")
+        lines.append(f"Difficulty: {rng.choice(['Easy', 'Medium', 'Hard'])}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def load_corpus(corpus_dir: str = None) -> List[str]:
+    if corpus_dir:
+        corpus = []
+        for path in sorted(glob.glob(os.path.join(corpus_dir, "*.txt"))):
+            with open(path) as f:
+                corpus.append(f.read())
+        return corpus
+    rng = random.Random(1234)
+    return [synthetic_sample(rng, rng.randint(4, 40)) for _ in range(50)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus_dir", nargs="?")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus_dir)
+    if not corpus:
+        sys.exit(f"No *.txt samples found in {args.corpus_dir}")
+    total_bytes = sum(len(sample) for sample in corpus)
+    parsed = sum(len(parse_unstructured_response(sample)) for sample in corpus)
+    print(f"corpus: {len(corpus)} samples, {total_bytes / 1024:.0f} KiB, {parsed} questions")
+
+    results = {}
+    for name, fn in (("legacy", legacy_parse), ("current", parse_unstructured_response)):
+        seconds = min(timeit.repeat(lambda: [fn(s) for s in corpus], number=1, repeat=args.repeat))
+        results[name] = seconds
+        print(f"{name:>8}: {seconds * 1000:8.2f} ms/pass  {total_bytes / seconds / 2**20:8.1f} MiB/s")
+    print(f" speedup: {results['legacy'] / results['current']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+# time.monotonic() by which the current request must be answered, if any.
+# Worker threads see it when they run in a copied context, as the gateway pool
+# and model router do.
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before a stage could finish."""
+
+
+def current_deadline() -> Optional[float]:
+    return _deadline.get()
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline (possibly negative), or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def timeout_for(default: float) -> float:
+    """
+    Timeout for one blocking call: `default`, cut short to the time left.
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Deadline passed")
+    return min(default, left)
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]):
+    """
+    Run the block under a deadline, as a time.monotonic() value.
+
+    Scopes nest and can only tighten the deadline, so a stage can be given a
+    sub-budget without outliving the request. None keeps the current deadline.
+    """
+    current = _deadline.get()
+    if deadline is None or (current is not None and current <= deadline):
+        deadline = current
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
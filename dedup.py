@@ -0,0 +1,157 @@
+import re
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Union
+
+from question_model import Question
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_MASK64 = (1 << 64) - 1
+
+
+def question_text(question: Union[Question, Dict]) -> str:
+    """Return the text a question is compared on: its context and question stem."""
+    if isinstance(question, Question):
+        return f"{question.context} {question.question}"
+    if isinstance(question, dict):
+        return f"{question.get('context') or ''} {question.get('question') or ''}"
+    return ""
+
+
+def _hash64(data: str) -> int:
+    return int.from_bytes(hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shingles(text: str, size: int = 3) -> FrozenSet[int]:
+    """Hash the word n-grams of a normalized text."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return frozenset((_hash64(" ".join(words)),)) if words else frozenset()
+    return frozenset(_hash64(" ".join(words[i:i + size])) for i in range(len(words) - size + 1))
+
+
+class DuplicateIndex:
+    """
+    MinHash/LSH index of question text for near-duplicate detection.
+
+    Signatures use one-permutation hashing: each shingle hash is hashed once and
+    dropped into one of `num_perm` bins, so building a signature is linear in
+    the number of shingles. Signatures are split into `bands` LSH bands; any
+    question sharing a band bucket is a candidate and candidates are confirmed
+    with the exact Jaccard similarity of their shingle sets.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[tuple, set]] = [defaultdict(set) for _ in range(bands)]
+        self._shingles: Dict[str, FrozenSet[int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._shingles
+
+    def signature(self, shingle_set: FrozenSet[int]) -> List[int]:
+        sig = [_MASK64] * self.num_perm
+        for h in shingle_set:
+            # Mix the shingle hash so bin and value are independent
+            h = (h * 0x9E3779B97F4A7C15) & _MASK64
+            b = h % self.num_perm
+            v = h // self.num_perm
+            if v < sig[b]:
+                sig[b] = v
+        # Densify: borrow the value of the next non-empty bin for empty ones
+        filled = [i for i, v in enumerate(sig) if v != _MASK64]
+        if filled and len(filled) < self.num_perm:
+            for i in range(self.num_perm):
+                if sig[i] == _MASK64:
+                    j = next((f for f in filled if f > i), filled[0])
+                    sig[i] = sig[j] ^ (i + 1)
+        return sig
+
+    def _band_keys(self, sig: List[int]) -> List[tuple]:
+        r = self.rows
+        return [tuple(sig[i * r:(i + 1) * r]) for i in range(self.bands)]
+
+    @staticmethod
+    def _jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+        if not a or not b:
+            return 0.0
+        return len(a & b) / len(a | b)
+
+    @staticmethod
+    def key_for(text: str) -> str:
+        return hashlib.blake2b(" ".join(_WORD_RE.findall(text.lower())).encode("utf-8"), digest_size=12).hexdigest()
+
+    def add(self, text: str, key: Optional[str] = None) -> str:
+        """
+        Index a text. Adding the same text twice is a no-op.
+
+        Returns:
+            str: The key the text is stored under
+        """
+        key = key or self.key_for(text)
+        if key in self._shingles:
+            return key
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return key
+        band_keys = self._band_keys(self.signature(shingle_set))
+        with self._lock:
+            self._shingles[key] = shingle_set
+            for band, band_key in zip(self._buckets, band_keys):
+                band[band_key].add(key)
+        return key
+
+    def add_questions(self, questions: Iterable[Union[Question, Dict]]) -> int:
+        """Index every item that looks like a question; returns how many were new."""
+        before = len(self)
+        for q in questions:
+            text = question_text(q)
+            if text.strip():
+                self.add(text)
+        return len(self) - before
+
+    def find_duplicate(self, text: str) -> Optional[str]:
+        """Return the key of an indexed near-duplicate of `text`, if any."""
+        key = self.key_for(text)
+        if key in self._shingles:
+            return key
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return None
+        candidates = set()
+        for band, band_key in zip(self._buckets, self._band_keys(self.signature(shingle_set))):
+            found = band.get(band_key)
+            if found:
+                candidates |= found
+        for candidate in candidates:
+            if self._jaccard(shingle_set, self._shingles[candidate]) >= self.threshold:
+                return candidate
+        return None
+
+    def similarity(self, text: str) -> float:
+        """Highest Jaccard similarity of `text` to an indexed text, 0 if nothing is close."""
+        key = self.key_for(text)
+        if key in self._shingles:
+            return 1.0
+        shingle_set = shingles(text)
+        if not shingle_set:
+            return 0.0
+        candidates = set()
+        for band, band_key in zip(self._buckets, self._band_keys(self.signature(shingle_set))):
+            found = band.get(band_key)
+            if found:
+                candidates |= found
+        return max((self._jaccard(shingle_set, self._shingles[c]) for c in candidates), default=0.0)
+
+    def is_duplicate(self, question: Union[Question, Dict]) -> bool:
+        return self.find_duplicate(question_text(question)) is not None
@@ -1,35 +1,56 @@
 import os
-import requests
 from dotenv import load_dotenv
 
+import packs
+import storage_format
+from storage_backend import create_backend, pin_metadata
+
 # Load environment variables
 load_dotenv()
 
-# Constants
-URL = 'https://api.pinata.cloud/v3'
-GROUP_ID = ''
-
 
 JWT = os.getenv("PINATA_JWT")
 
 if not JWT:
     raise ValueError("Environment variable PINATA_JWT is not set. Please check your .env file.")
 
+STORAGE = create_backend(jwt_token=JWT)
+
 
 def upload_question(question_data):
-    HEADERS = {
-        "Authorization": f"Bearer {JWT}",
-        "Content-Type": "multipart/form-data"
-    }
+    """Store a single question (or any JSON record) as its own file in the storage backend."""
+    data = storage_format.encode(question_data)
+    record = question_data if isinstance(question_data, dict) else {}
+    keyvalues = pin_metadata("question", user=record.get("user_id"), subject=record.get("category"),
+                             difficulty=record.get("difficulty"))
+    try:
+        cid = STORAGE.put(data, "question" + storage_format.file_extension_for(data),
+                          storage_format.content_type_for(data), keyvalues)
+    except Exception as e:
+        raise RuntimeError(f"Failed to upload question: {e}")
+    return {"cid": cid}
 
-    payload = "test"
 
-    try:
-        response = requests.post(f'{URL}/files', headers=HEADERS, data=payload)
-        response.raise_for_status()  # Raise HTTPError for bad responses
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"Failed to upload JSON: {e}")
+def upload_questions(records, name="questions", kind="question"):
+    """
+    Upload many question or response records as one pack and its manifest.
+
+    See packs.upload_pack; readers find the pack through its manifest.
+
+    Returns:
+        dict: {"manifest_cid": ..., "data_cid": ..., "count": ...}
+    """
+    return packs.upload_pack(STORAGE, records, name, kind)
+
+
+def fetch_manifest(manifest_cid):
+    """Read a pack manifest from the storage backend."""
+    return packs.fetch_manifest(STORAGE, manifest_cid)
+
+
+def read_records(manifest, positions):
+    """Range-read selected records of a pack; see packs.read_records."""
+    return packs.read_records(STORAGE, manifest, positions)
 
 # def retrieve_question_set():
 #     HEADERS = {
@@ -67,7 +88,6 @@ if __name__ == "__main__":
 
     try:
         response = upload_question(sample_data)
-        print(retrieve_question_set())
         print("JSON uploaded successfully:")
         print(response)
     except Exception as e:
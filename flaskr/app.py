@@ -4,22 +4,36 @@ import openai
 import json
 import logging 
 import requests
-from typing import Dict, List
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
-from files import upload_question()
+from files import upload_question
+from pinata import iter_group_questions, recent_group_questions
+import question_model
+from question_model import validate_questions
+from log_config import setup_logging
 
 # Load environment variables
 load_dotenv()
 
 # Set up logging
-logging.basicConfig(level=logging.DEBUG)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Only the most recent answered questions are sent to the model
+HISTORY_LIMIT = int(os.getenv("HISTORY_LIMIT", "50"))
+
+# One question is generated per subject; the completion limit scales with them
+SUBJECTS = ("English", "Math", "Reading", "Science")
+# Completion tokens per question, sized for the compact output schema
+TOKENS_PER_QUESTION = 450
+
 # Initialize Flask app
 app = Flask(__name__)
 
 # Configure OpenAI client for SambaNova
-SAMBANOVA_API_KEY = os.getenv("SAMBANOVA_API_KEY", "cf134cde-f4d2-4e6d-90b4-500e269eb286")
+SAMBANOVA_API_KEY = os.getenv("SAMBANOVA_API_KEY")
+if not SAMBANOVA_API_KEY:
+    raise ValueError("Environment variable SAMBANOVA_API_KEY is not set. Please check your .env file.")
 client = openai.OpenAI(
     api_key=SAMBANOVA_API_KEY,
     base_url="https://api.sambanova.ai/v1"
@@ -176,27 +190,27 @@ HTML_TEMPLATE = """
 </html>
 """
 
-def get_pinata_questions(jwt_token: str, group_id: str) -> Dict:
+def get_pinata_questions(jwt_token: str, group_id: str, limit: Optional[int] = None) -> List[Dict]:
     
     """
-    Simply fetch all questions from a Pinata group.
+    Fetch the most recent questions from a Pinata group.
+    
+    The group is paged through lazily, so only `limit` questions are ever held
+    in memory; with no limit the whole group is returned.
     """
     try:
-        response = requests.get(
-            f"https://api.pinata.cloud/groups/{group_id}/questions",
-            headers={"Authorization": f"Bearer {jwt_token}"}
-        )
-        response.raise_for_status()
-        return response.json()
+        if limit is not None:
+            return recent_group_questions(jwt_token, group_id, limit)
+        return list(iter_group_questions(jwt_token, group_id))
         
     except Exception as e:
-        logger.error(f"Failed to fetch Pinata questions: {e}")
-        return {}
+        logger.error("Failed to fetch Pinata questions: %s", e)
+        return []
 
 def generate_questions(user_results: Dict, regional_results: Dict) -> List[Dict]:
     jwt_token = ""
     group_id = ""
-    questions_answered = get_pinata_questions(jwt_token, group_id)
+    questions_answered = get_pinata_questions(jwt_token, group_id, limit=HISTORY_LIMIT)
     """
     Generate and parse ACT practice questions based on test results using LLaMA API
     """
@@ -208,31 +222,20 @@ def generate_questions(user_results: Dict, regional_results: Dict) -> List[Dict]
 
     Questions Previously Asnwered: {questions_answered}
     
-    Generate 4 ACT-style multiple choice practice questions, one for each subject, focusing on areas needing improvement.
+    Generate {len(SUBJECTS)} ACT-style multiple choice practice questions, one for each subject, focusing on areas needing improvement.
     For each question:
     1. Include any necessary context (passages, equations, diagrams described in text, etc.) before the question
     2. Provide the actual question
     3. Include four multiple choice options (A, B, C, D)
     4. Indicate the correct answer
     5. Provide a detailed explanation
-    6. Specify the category (Reading/Math/Science/English)
-    7. Specify the difficulty level (Easy/Medium/Hard)
+    6. Specify the subject code: E (English), M (Math), R (Reading), S (Science)
+    7. Specify the difficulty code: E (Easy), M (Medium), H (Hard)
     
-    Format each question as JSON with the following structure:
-    {{
-        "context": "Any necessary passage, equation, or background information...",
-        "question": "question text",
-        "options": {{
-            "A": "first option",
-            "B": "second option",
-            "C": "third option",
-            "D": "fourth option"
-        }},
-        "correct_option": "A",
-        "explanation": "explanation text",
-        "category": "subject category",
-        "difficulty": "difficulty level"
-    }}
+    Format each question as compact JSON with these short keys, options listed in A-D order:
+    {{"c": "Any necessary passage, equation, or background information...", "q": "question text",
+     "o": ["option A", "option B", "option C", "option D"], "a": "A", "x": "explanation text",
+     "s": "subject code", "d": "difficulty code"}}
     
     For Reading and English questions, ALWAYS include a relevant passage in the context.
     For Math questions, include any necessary equations or diagrams described in text.
@@ -244,7 +247,7 @@ def generate_questions(user_results: Dict, regional_results: Dict) -> List[Dict]
     """
     
     try:
-        logger.debug(f"Sending request to API with user_results: {user_results}")
+        logger.debug("Sending request to API with user_results: %s", user_results)
         response = client.chat.completions.create(
             model='Meta-Llama-3.1-8B-Instruct',
             messages=[
@@ -255,7 +258,7 @@ def generate_questions(user_results: Dict, regional_results: Dict) -> List[Dict]
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=2000
+            max_tokens=TOKENS_PER_QUESTION * len(SUBJECTS)
         )
         
         # Extract and clean response content
@@ -271,34 +274,25 @@ def generate_questions(user_results: Dict, regional_results: Dict) -> List[Dict]
         # Parse and validate questions
         try:
             questions = json.loads(cleaned_content)
-            validated_questions = []
-            required_fields = {"context", "question", "options", "correct_option", "explanation", "category", "difficulty"}
-            
-            for q in questions:
-                if all(field in q for field in required_fields):
-                    if isinstance(q["options"], dict) and all(opt in q["options"] for opt in ["A", "B", "C", "D"]):
-                        # Ensure context is not empty for Reading/English questions
-                        if q["category"] in ["Reading", "English"] and not q["context"].strip():
-                            logger.warning(f"Skipping question with empty context: {q}")
-                            continue
-                        validated_questions.append(q)
-                    else:
-                        logger.warning(f"Invalid options format in question: {q}")
-                else:
-                    logger.warning(f"Skipping invalid question format: {q}")
+            if isinstance(questions, dict):
+                questions = [questions]
+            validated_questions = validate_questions(
+                question_model.expand_compact(questions),
+                on_invalid=lambda q, e: logger.warning("Skipping invalid question (%s): %s", e, q, extra={"payload": True})
+            )
             
             if not validated_questions:
                 logger.info("No valid questions found, attempting unstructured parsing")
                 return parse_unstructured_response(cleaned_content)
             
-            return validated_questions
+            return [q.to_dict() for q in validated_questions]
             
         except json.JSONDecodeError as e:
-            logger.warning(f"JSON parsing failed: {e}")
+            logger.warning("JSON parsing failed: %s", e)
             return parse_unstructured_response(cleaned_content)
             
     except Exception as e:
-        logger.error(f"Error generating questions: {e}")
+        logger.error("Error generating questions: %s", e)
         return [{"error": str(e), 
                 "context": "Error occurred",
                 "question": "Error generating question", 
@@ -311,7 +305,7 @@ def parse_unstructured_response(response_text: str) -> List[Dict]:
     """
     Enhanced fallback parser for unstructured text responses
     """
-    logger.debug(f"Parsing unstructured response: {response_text}")
+    logger.debug("Parsing unstructured response: %s", response_text, extra={"payload": True})
     questions = []
     current_question = {}
     current_options = {}
@@ -322,7 +316,7 @@ def parse_unstructured_response(response_text: str) -> List[Dict]:
         if not line:
             continue
             
-        logger.debug(f"Processing line: {line}")
+        logger.debug("Processing line: %s", line, extra={"payload": True})
         
         if any(line.lower().startswith(start) for start in ['q:', 'question:', 'problem:']):
             if current_question and current_question.get('question'):
@@ -361,7 +355,7 @@ def parse_unstructured_response(response_text: str) -> List[Dict]:
         current_question['options'] = current_options
         questions.append(current_question)
     
-    logger.debug(f"Parsed questions: {questions}")
+    logger.debug("Parsed questions: %s", questions, extra={"payload": True})
     return questions if questions else [{"question": "Failed to generate questions", 
                                       "options": {"A": "N/A", "B": "N/A", "C": "N/A", "D": "N/A"},
                                       "correct_option": "A",
@@ -378,15 +372,15 @@ def test_with_sample():
     try:
         logger.info("Generating questions with sample data")
         questions = generate_questions(SAMPLE_USER_RESULTS, SAMPLE_REGIONAL_RESULTS)
-        logger.debug(f"Generated questions: {questions}")
+        logger.debug("Generated questions: %s", questions, extra={"payload": True})
         # Properly format the result as JSON string
-        result = json.dumps(questions, indent=2)
+        result = question_model.dumps(questions, pretty=True)
         return render_template_string(HTML_TEMPLATE, result=result)
     except Exception as e:
-        logger.error(f"Error in test_with_sample: {e}")
+        logger.error("Error in test_with_sample: %s", e)
         error_response = [{"error": str(e), "question": "Error occurred", "answer": "N/A",
                           "explanation": str(e), "category": "Error", "difficulty": "N/A"}]
-        return render_template_string(HTML_TEMPLATE, result=json.dumps(error_response, indent=2))
+        return render_template_string(HTML_TEMPLATE, result=question_model.dumps(error_response, pretty=True))
 
 @app.route('/test-custom', methods=['POST'])
 def test_with_custom():
@@ -396,12 +390,12 @@ def test_with_custom():
         user_results = json.loads(request.form['user_results'])
         regional_results = json.loads(request.form['regional_results'])
         questions = generate_questions(user_results, regional_results)
-        return render_template_string(HTML_TEMPLATE, result=json.dumps(questions, indent=2))
+        return render_template_string(HTML_TEMPLATE, result=question_model.dumps(questions, pretty=True))
     except Exception as e:
-        logger.error(f"Error in test_with_custom: {e}")
+        logger.error("Error in test_with_custom: %s", e)
         error_response = [{"error": str(e), "question": "Error occurred", "answer": "N/A",
                           "explanation": str(e), "category": "Error", "difficulty": "N/A"}]
-        return render_template_string(HTML_TEMPLATE, result=json.dumps(error_response, indent=2))
+        return render_template_string(HTML_TEMPLATE, result=question_model.dumps(error_response, pretty=True))
 
 @app.route('/generate-questions', methods=['POST'])
 def create_questions():
@@ -424,7 +418,7 @@ def create_questions():
             'questions': questions
         })
     except Exception as e:
-        logger.error(f"Error in create_questions: {e}")
+        logger.error("Error in create_questions: %s", e)
         return jsonify({
             'status': 'error',
             'message': str(e)
@@ -0,0 +1,187 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, List, Optional, Tuple
+
+import requests
+
+from deadlines import DeadlineExceeded, expired, remaining, timeout_for
+
+logger = logging.getLogger(__name__)
+
+IPFS_GATEWAYS = [g.strip().rstrip("/") for g in os.getenv(
+    "IPFS_GATEWAYS",
+    "https://gateway.pinata.cloud/ipfs,https://ipfs.io/ipfs,https://dweb.link/ipfs"
+).split(",") if g.strip()]
+GATEWAY_TIMEOUT = float(os.getenv("GATEWAY_TIMEOUT", "10"))
+# Bounds on how long to wait for the primary before hedging to another gateway
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", "2.0"))
+# Circuit breaker: failures in a row before a gateway is ejected, and for how long
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+
+EWMA_ALPHA = 0.2
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="gateway-fetch")
+
+
+class GatewayStats:
+    """Latency and health bookkeeping for one gateway."""
+
+    def __init__(self, url: str, breaker_failures: int = BREAKER_FAILURES,
+                 breaker_cooldown: float = BREAKER_COOLDOWN):
+        self.url = url
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.ewma = None
+        self.samples = deque(maxlen=100)
+        self.failures = 0
+        self.open_until = 0.0
+        self._lock = threading.Lock()
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.ewma = latency if self.ewma is None else self.ewma + EWMA_ALPHA * (latency - self.ewma)
+            self.samples.append(latency)
+            self.failures = 0
+            self.open_until = 0.0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.breaker_failures:
+                self.open_until = time.monotonic() + self.breaker_cooldown
+                logger.warning("Ejecting %s for %.0fs after %d failures",
+                               self.url, self.breaker_cooldown, self.failures)
+
+    @property
+    def healthy(self) -> bool:
+        # Once the cooldown passes the gateway is tried again (half-open); one
+        # more failure re-opens the breaker immediately
+        return time.monotonic() >= self.open_until
+
+    def p95(self) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < 5:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class GatewayPool:
+    """
+    Fetch IPFS content from several gateways with hedged requests.
+
+    The request goes to the gateway with the lowest latency EWMA first. If it
+    has not answered within that gateway's p95 latency, the same request is sent
+    to the next healthy gateway and whichever valid response arrives first wins;
+    the other is abandoned and its connection closed.
+    """
+
+    def __init__(self, gateways: List[str] = None, timeout: float = GATEWAY_TIMEOUT):
+        self.stats = [GatewayStats(url) for url in (gateways or IPFS_GATEWAYS)]
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def ranked(self) -> List[GatewayStats]:
+        """Healthy gateways, fastest first. Unmeasured gateways go first so each gets tried."""
+        healthy = [g for g in self.stats if g.healthy] or list(self.stats)
+        return sorted(healthy, key=lambda g: g.ewma or 0.0)
+
+    def hedge_delay(self, gateway: GatewayStats) -> float:
+        p95 = gateway.p95()
+        if p95 is None:
+            # Too few samples for a percentile yet; fall back to twice the average
+            p95 = 2 * gateway.ewma if gateway.ewma is not None else HEDGE_MAX_DELAY
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, p95))
+
+    def _attempt(self, gateway: GatewayStats, cid: str, abandoned: threading.Event,
+                 parse: Optional[Callable[[bytes, str], Any]], byte_range: Optional[Tuple[int, int]]) -> Any:
+        started = time.monotonic()
+        headers = {"Range": "bytes=%d-%d" % byte_range} if byte_range else None
+        try:
+            response = self.session.get(f"{gateway.url}/{cid}", headers=headers, timeout=timeout_for(self.timeout),
+                                        stream=True)
+            try:
+                response.raise_for_status()
+                chunks = []
+                for chunk in response.iter_content(64 * 1024):
+                    if abandoned.is_set():
+                        raise RuntimeError("abandoned after another gateway answered")
+                    if expired():
+                        raise DeadlineExceeded(f"Deadline passed reading {cid}")
+                    chunks.append(chunk)
+                content = b"".join(chunks)
+            finally:
+                response.close()
+            if byte_range and response.status_code != 206:
+                # Gateway ignored the range and sent the whole object
+                content = content[byte_range[0]:byte_range[1] + 1]
+            content_type = response.headers.get("Content-Type", "")
+            result = parse(content, content_type) if parse is not None else (content, content_type)
+        except Exception:
+            # Running out of request time is not the gateway's fault
+            if not abandoned.is_set() and not expired():
+                gateway.record_failure()
+            raise
+        gateway.record_success(time.monotonic() - started)
+        return result
+
+    def fetch(self, cid: str, parse: Optional[Callable[[bytes, str], Any]] = None,
+              byte_range: Optional[Tuple[int, int]] = None) -> Any:
+        """
+        Fetch a CID, hedging across gateways.
+
+        Args:
+            cid (str): The IPFS CID
+            parse (callable, optional): Decodes (body, content_type); a response it
+                raises on counts as a failed attempt and does not win the race
+            byte_range (Tuple[int, int], optional): First and last byte to read, inclusive
+
+        Returns:
+            The parsed content, or a (body, content_type) tuple without `parse`
+
+        Raises:
+            RuntimeError: If every gateway tried failed
+            DeadlineExceeded: If the request deadline passed first
+        """
+        candidates = self.ranked()
+        abandoned = threading.Event()
+        pending = {}
+        errors = []
+
+        def launch(gateway: GatewayStats) -> None:
+            ctx = contextvars.copy_context()
+            future = _executor.submit(ctx.run, self._attempt, gateway, cid, abandoned, parse, byte_range)
+            pending[future] = gateway
+
+        launch(candidates.pop(0))
+        try:
+            while pending:
+                delay = self.hedge_delay(pending[next(iter(pending))]) if candidates else None
+                left = remaining()
+                if left is not None:
+                    delay = max(left, 0) if delay is None else min(delay, max(left, 0))
+                done, _ = wait(pending, timeout=delay, return_when=FIRST_COMPLETED)
+                if not done and expired():
+                    raise DeadlineExceeded(f"Deadline passed fetching {cid}")
+                for future in done:
+                    gateway = pending.pop(future)
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        errors.append(f"{gateway.url}: {e}")
+                if candidates and (not done or not pending):
+                    # Primary is slow (hedge) or every attempt so far failed (fail over)
+                    launch(candidates.pop(0))
+        finally:
+            abandoned.set()
+        raise RuntimeError(f"All gateways failed for {cid}: {'; '.join(errors)}")
+
+
+GATEWAY_POOL = GatewayPool()
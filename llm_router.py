@@ -0,0 +1,356 @@
+import os
+import json
+import time
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import openai
+
+from gateways import EWMA_ALPHA, GatewayStats
+from question_model import Category, Difficulty, normalize_category, normalize_difficulty
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Provider name -> OpenAI-compatible endpoint and the variable holding its key.
+# `stream_usage` asks for token usage on streamed completions with
+# stream_options; only set it for providers that accept the option, since the
+# rest reject the whole request
+DEFAULT_PROVIDERS = {
+    "sambanova": {"base_url": "https://api.sambanova.ai/v1", "api_key_env": "SAMBANOVA_API_KEY",
+                  "stream_usage": True},
+}
+# Models in preference order. `subjects` and `difficulties` restrict what a model
+# is routed for (omitted means anything); `prior_latency` is the seconds per
+# 1000 completion tokens assumed until the model has been measured.
+DEFAULT_MODELS = [
+    {"name": "llama-8b", "provider": "sambanova", "model": "Meta-Llama-3.1-8B-Instruct",
+     "difficulties": ["Easy", "Medium"], "prior_latency": 4.0},
+    {"name": "llama-70b", "provider": "sambanova", "model": "Meta-Llama-3.3-70B-Instruct",
+     "prior_latency": 12.0},
+]
+LLM_PROVIDERS = json.loads(os.getenv("LLM_PROVIDERS", "null")) or DEFAULT_PROVIDERS
+LLM_MODELS = json.loads(os.getenv("LLM_MODELS", "null")) or DEFAULT_MODELS
+
+# Race the two best models when the time left is under this many predicted latencies
+LLM_RACE_FACTOR = float(os.getenv("LLM_RACE_FACTOR", "1.5"))
+# How many models to try in turn before giving up
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "2"))
+# Seconds per 1000 tokens a model's error rate adds to its routing cost
+ERROR_PENALTY = 30.0
+# Model circuit breaker: failed calls in a row before a model is ejected, and for
+# how long. Separate from the gateway breaker, since a model call costs far more
+# than a gateway fetch and providers recover on their own schedule
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "60"))
+# Stream completions so time-to-first-token can be measured; set to 0 for
+# providers without streaming support
+LLM_STREAM = os.getenv("LLM_STREAM", "1") == "1"
+# Seconds past the deadline a raced call may take to hand back its partial content
+DEADLINE_GRACE = 1.0
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="llm-call")
+
+
+class CompletionRejected(RuntimeError):
+    """Every backend that was tried answered, but `parse` rejected each answer."""
+
+    def __init__(self, message: str, content: str):
+        super().__init__(message)
+        self.content = content
+
+
+class CompletionTimeout(TimeoutError):
+    """A completion was cut off at its deadline; `content` is what had arrived by then."""
+
+    def __init__(self, message: str, content: str = ""):
+        super().__init__(message)
+        self.content = content
+
+
+class ModelStats(GatewayStats):
+    """
+    Gateway-style latency and breaker state, plus a smoothed error rate,
+    time-to-first-token and how much of the prompt the provider served from
+    its prefix cache.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name, LLM_BREAKER_FAILURES, LLM_BREAKER_COOLDOWN)
+        self.error_rate = 0.0
+        self.ttft = None
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record_prompt(self, prompt_tokens: int, cached_tokens: int, ttft: Optional[float]) -> None:
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            if ttft is not None:
+                self.ttft = ttft if self.ttft is None else self.ttft + EWMA_ALPHA * (ttft - self.ttft)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "latency_per_1k": round(self.ewma, 3) if self.ewma is not None else None,
+                "ttft": round(self.ttft, 3) if self.ttft is not None else None,
+                "error_rate": round(self.error_rate, 3),
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "prompt_cache_hit_rate": (round(self.cached_tokens / self.prompt_tokens, 3)
+                                          if self.prompt_tokens else None),
+                "healthy": self.healthy,
+            }
+
+    def record_success(self, latency: float) -> None:
+        super().record_success(latency)
+        with self._lock:
+            self.error_rate *= 0.9
+
+    def record_failure(self) -> None:
+        super().record_failure()
+        with self._lock:
+            self.error_rate = 0.9 * self.error_rate + 0.1
+
+    def record_rejection(self) -> None:
+        """The model answered but the answer was unusable; counts against routing, not the breaker."""
+        with self._lock:
+            self.error_rate = 0.9 * self.error_rate + 0.1
+
+
+def _prompt_usage(usage) -> Tuple[int, int]:
+    """Prompt tokens and how many of them hit the provider's prefix cache."""
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    if cached is None:
+        # Some OpenAI-compatible providers report it at the top level instead
+        cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    return prompt_tokens, cached or 0
+
+
+class ModelBackend:
+    """One model on one provider, with its routing constraints and live statistics."""
+
+    def __init__(self, name: str, provider: str, model: str, client,
+                 subjects: Optional[Iterable[str]] = None, difficulties: Optional[Iterable[str]] = None,
+                 prior_latency: float = 10.0, stream_usage: bool = False):
+        self.name = name
+        self.provider = provider
+        self.model = model
+        self.client = client
+        self.subjects = frozenset(normalize_category(s) for s in subjects) if subjects else None
+        self.difficulties = frozenset(normalize_difficulty(d) for d in difficulties) if difficulties else None
+        self.prior_latency = prior_latency
+        self.stream_usage = stream_usage
+        # Latency samples are seconds per 1000 completion tokens
+        self.stats = ModelStats(name)
+
+    def suits(self, subjects: Iterable[Category], difficulty: Optional[Difficulty]) -> bool:
+        if self.subjects is not None and not set(subjects) <= self.subjects:
+            return False
+        if self.difficulties is not None and difficulty is not None and difficulty not in self.difficulties:
+            return False
+        return True
+
+    def predicted_latency(self, max_tokens: int) -> float:
+        per_1k = self.stats.ewma if self.stats.ewma is not None else self.prior_latency
+        return (per_1k + ERROR_PENALTY * self.stats.error_rate) * max_tokens / 1000
+
+    def complete(self, messages: List[Dict], max_tokens: int, temperature: float,
+                 timeout: Optional[float], prompt_id: Optional[str] = None) -> str:
+        started = time.monotonic()
+        ttft = None
+        try:
+            with span("llm_call", model=self.model, provider=self.provider, prompt=prompt_id) as s:
+                request = dict(model=self.model, messages=messages, temperature=temperature,
+                               max_tokens=max_tokens, timeout=timeout)
+                if LLM_STREAM:
+                    content, usage, ttft = self._stream(request, started, timeout)
+                else:
+                    response = self.client.chat.completions.create(**request)
+                    content, usage = response.choices[0].message.content or "", getattr(response, "usage", None)
+                prompt_tokens, cached_tokens = _prompt_usage(usage)
+                if s is not None:
+                    s.attributes.update(ttft=ttft, prompt_tokens=prompt_tokens, cached_tokens=cached_tokens)
+        except Exception:
+            # `timeout` is the time left before the request's deadline; a call
+            # cut off by it says nothing about the model, so as with gateways
+            # it does not count towards the breaker
+            if timeout is None or time.monotonic() - started < timeout:
+                self.stats.record_failure()
+            raise
+        tokens = getattr(usage, "completion_tokens", None) or max_tokens
+        self.stats.record_success((time.monotonic() - started) * 1000 / max(tokens, 1))
+        self.stats.record_prompt(prompt_tokens, cached_tokens, ttft)
+        return content
+
+    def _stream(self, request: Dict, started: float, timeout: Optional[float]):
+        """Run a streamed completion; returns its content, usage and time to first token."""
+        if self.stream_usage:
+            request = dict(request, stream_options={"include_usage": True})
+        stream = self.client.chat.completions.create(stream=True, **request)
+        parts, usage, ttft = [], None, None
+
+        def timed_out() -> bool:
+            return timeout is not None and time.monotonic() - started >= timeout
+
+        try:
+            for chunk in stream:
+                if getattr(chunk, "usage", None) is not None:
+                    usage = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if ttft is None:
+                        ttft = time.monotonic() - started
+                    parts.append(chunk.choices[0].delta.content)
+                # The client timeout applies per read, so the overall limit is enforced here
+                if timed_out():
+                    raise CompletionTimeout(f"{self.name} did not finish within {timeout:.1f}s", "".join(parts))
+        except CompletionTimeout:
+            raise
+        except Exception as e:
+            if timed_out():
+                raise CompletionTimeout(f"{self.name} timed out: {e}", "".join(parts))
+            raise
+        finally:
+            stream.close()
+        return "".join(parts), usage, ttft
+
+
+class ModelRouter:
+    """
+    Registry of model backends that picks one per request.
+
+    Backends that suit the request's subjects and difficulty come first, then
+    the rest as fallbacks; within each group the lowest predicted latency wins,
+    where the prediction is the live per-token latency EWMA inflated by the
+    recent error rate. Backends whose circuit breaker is open are skipped.
+    """
+
+    def __init__(self, backends: List[ModelBackend]):
+        if not backends:
+            raise ValueError("ModelRouter needs at least one backend")
+        self.backends = backends
+
+    @classmethod
+    def from_config(cls, models: List[Dict] = None, providers: Dict[str, Dict] = None,
+                    api_keys: Optional[Dict[str, str]] = None) -> "ModelRouter":
+        """
+        Build a router from LLM_MODELS / LLM_PROVIDERS style config.
+
+        Args:
+            models (List[Dict], optional): Model specs, defaults to LLM_MODELS
+            providers (Dict, optional): Provider specs, defaults to LLM_PROVIDERS
+            api_keys (Dict, optional): Keys to use when a provider's api_key_env is unset
+        """
+        providers = providers or LLM_PROVIDERS
+        clients = {}
+        backends = []
+        for spec in models or LLM_MODELS:
+            provider = spec["provider"]
+            if provider not in clients:
+                config = providers[provider]
+                api_key = os.getenv(config.get("api_key_env", ""), "") or (api_keys or {}).get(provider)
+                if not api_key:
+                    raise ValueError(f"No API key for provider {provider!r}. "
+                                     f"Set {config.get('api_key_env') or 'its api_key_env'} in the environment.")
+                clients[provider] = openai.OpenAI(api_key=api_key, base_url=config["base_url"])
+            backends.append(ModelBackend(
+                spec.get("name", spec["model"]), provider, spec["model"], clients[provider],
+                subjects=spec.get("subjects"), difficulties=spec.get("difficulties"),
+                prior_latency=spec.get("prior_latency", 10.0),
+                stream_usage=providers[provider].get("stream_usage", False)
+            ))
+        return cls(backends)
+
+    def route(self, subjects: Iterable = (), difficulty=None, max_tokens: int = 1000) -> List[ModelBackend]:
+        """Backends to try for a request, best first."""
+        subjects = [normalize_category(s) for s in subjects]
+        difficulty = normalize_difficulty(difficulty) if difficulty is not None else None
+        healthy = [b for b in self.backends if b.stats.healthy] or list(self.backends)
+        return sorted(healthy, key=lambda b: (not b.suits(subjects, difficulty), b.predicted_latency(max_tokens)))
+
+    def complete(self, messages: List[Dict], max_tokens: int, subjects: Iterable = (), difficulty=None,
+                 deadline: Optional[float] = None, parse: Optional[Callable[[str], Any]] = None,
+                 temperature: float = 0.7, prompt_id: Optional[str] = None) -> Any:
+        """
+        Run a chat completion on the best backend for the request.
+
+        A backend that errors, or whose answer `parse` raises on, is followed by
+        the next one, up to LLM_MAX_ATTEMPTS. When the time left before
+        `deadline` is under LLM_RACE_FACTOR times the best backend's predicted
+        latency, the two best backends are raced instead and the first answer
+        that parses wins; the other call is left to finish in the background.
+
+        Args:
+            messages (List[Dict]): Chat messages
+            max_tokens (int): Completion token limit
+            subjects (Iterable): Subjects the completion is for
+            difficulty: Target difficulty, if any
+            deadline (float, optional): time.monotonic() by which an answer is needed
+            parse (callable, optional): Turns the content into the return value; raising rejects it
+            temperature (float): Sampling temperature
+            prompt_id (str, optional): Template the messages were built from, recorded on the trace
+
+        Returns:
+            The parsed answer, or the raw content without `parse`
+
+        Raises:
+            CompletionRejected: If every answer was rejected by `parse`
+            CompletionTimeout: If the deadline cut the answer off; it carries the partial content
+            Exception: The last backend error if no backend answered
+        """
+        candidates = self.route(subjects, difficulty, max_tokens)[:max(LLM_MAX_ATTEMPTS, 1)]
+        remaining = deadline - time.monotonic() if deadline is not None else None
+        if remaining is not None and remaining <= 0:
+            raise CompletionTimeout("Deadline passed before the completion was requested")
+
+        def attempt(backend: ModelBackend):
+            timeout = deadline - time.monotonic() if deadline is not None else None
+            content = backend.complete(messages, max_tokens, temperature, timeout, prompt_id)
+            try:
+                return parse(content) if parse is not None else content
+            except Exception as e:
+                backend.stats.record_rejection()
+                raise CompletionRejected(f"{backend.name} answer rejected: {e}", content)
+
+        last_error = None
+        race = (remaining is not None and len(candidates) > 1
+                and remaining < LLM_RACE_FACTOR * candidates[0].predicted_latency(max_tokens))
+        if race:
+            logger.info("Racing %s and %s with %.1fs left", candidates[0].name, candidates[1].name, remaining)
+            pending = {_executor.submit(contextvars.copy_context().run, attempt, b): b for b in candidates[:2]}
+            candidates = candidates[2:]
+            while pending:
+                # The calls enforce the deadline themselves; the grace lets them report partial content
+                done, _ = wait(pending, timeout=max(deadline - time.monotonic(), 0) + DEADLINE_GRACE,
+                               return_when=FIRST_COMPLETED)
+                if not done:
+                    raise CompletionTimeout("No model answered before the deadline")
+                for future in done:
+                    backend = pending.pop(future)
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        logger.warning("Model %s lost the race: %s", backend.name, e)
+                        last_error = e
+            if not candidates:
+                raise last_error
+
+        for backend in candidates:
+            if deadline is not None and time.monotonic() >= deadline:
+                if isinstance(last_error, CompletionTimeout):
+                    raise last_error
+                raise CompletionTimeout("Deadline passed", getattr(last_error, "content", ""))
+            try:
+                return attempt(backend)
+            except Exception as e:
+                logger.warning("Model %s failed: %s", backend.name, e)
+                last_error = e
+        raise last_error
+
+    def metrics(self) -> Dict[str, Dict]:
+        """Latency, time-to-first-token and prompt cache counters per backend."""
+        return {b.name: b.stats.snapshot() for b in self.backends}
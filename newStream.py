@@ -3,11 +3,19 @@ import requests
 import json
 from typing import Dict, List, Optional
 from math import ceil
+from question_model import Question, coerce_question, group_by_context
+from question_display import display_passage
 from datetime import datetime
 import os
+import uuid
 
 
-from app import generate_questions
+from student_state import StudentStateStore
+from response_store import ResponseStore
+from storage_backend import create_backend, pin_metadata
+from transport import TransportError, GeneratorUnavailable, default_transport
+from prefetch import prefetch_key, invalidate_stale, start_prefetch, take_prefetched
+import storage_format
 
 # Initialize session state for questions and current page
 if 'questions' not in st.session_state:
@@ -16,20 +24,42 @@ if 'questions' not in st.session_state:
 if 'current_page' not in st.session_state:
     st.session_state.current_page = 'main'
 
+# Identify the student for per-user state until real accounts exist
+if 'user_id' not in st.session_state:
+    st.session_state.user_id = uuid.uuid4().hex
+
+PINATA_JWT = os.getenv("PINATA_JWT")
+
+
+@st.cache_resource
+def open_stores():
+    """
+    Stores shared by every session and rerun in this process.
+
+    Streamlit re-runs this script on every interaction, so they are opened,
+    and interrupted response writes recovered, only once per process.
+    """
+    response_store = ResponseStore()
+    response_store.recover()
+    return StudentStateStore(), response_store, create_backend(jwt_token=PINATA_JWT)
+
+
+STUDENT_STATE, RESPONSE_STORE, STORAGE = open_stores()
+
 
 from datetime import datetime
 import json
 import os
 import requests
 
-def save_response_to_json(category: str, difficulty: str, is_correct: bool) -> dict:
+def save_response_to_json(category: str, difficulty: str, is_correct: bool,
+                          question: Optional[Question] = None, user_id: Optional[str] = None) -> dict:
     """
-    Save question response data to a JSON file and upload to Pinata.
-    Returns the Pinata upload response.
+    Save question response data to the user's shard and store it in the storage backend.
+    The question text is stored too so answered questions can be recognised later,
+    and the student's ability state is updated when a user_id is given.
+    Returns {"cid": ...} on success or {"error": ...} on failure.
     """
-    # Your JWT token
-    JWT_TOKEN = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.eyJ1c2VySW5mb3JtYXRpb24iOnsiaWQiOiI4YmVmMTM1YS03NDY2LTQ1MjQtODhjMy00MGYzNzg2NmViZDciLCJlbWFpbCI6InNpbW9uZ2FnZTBAZ21haWwuY29tIiwiZW1haWxfdmVyaWZpZWQiOnRydWUsInBpbl9wb2xpY3kiOnsicmVnaW9ucyI6W3siZGVzaXJlZFJlcGxpY2F0aW9uQ291bnQiOjEsImlkIjoiRlJBMSJ9LHsiZGVzaXJlZFJlcGxpY2F0aW9uQ291bnQiOjEsImlkIjoiTllDMSJ9XSwidmVyc2lvbiI6MX0sIm1mYV9lbmFibGVkIjpmYWxzZSwic3RhdHVzIjoiQUNUSVZFIn0sImF1dGhlbnRpY2F0aW9uVHlwZSI6InNjb3BlZEtleSIsInNjb3BlZEtleUtleSI6ImZhNjUxNWZkOTRkMDMyZGQwN2QzIiwic2NvcGVkS2V5U2VjcmV0IjoiOWUyZTRiOTE4NDVjMDA4OWE3YzM0NDdhZDVhZDJkZTAyMTdkNGM5MjExOTI2ODEyZDZmMWRkMDlmYmU2ODA4NCIsImV4cCI6MTc2MzM1NzkxNH0.zpWQXD9YWbE6BKiBavUtGyZJJkrEiZ4x0j1zxzgpmJs"
-    
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     response_data = {
         "timestamp": timestamp,
@@ -37,81 +67,49 @@ def save_response_to_json(category: str, difficulty: str, is_correct: bool) -> d
         "difficulty": difficulty,
         "correct": is_correct
     }
+    if question is not None:
+        response_data["context"] = question.context
+        response_data["question"] = question.question
+    if user_id is not None:
+        response_data["user_id"] = user_id
+        STUDENT_STATE.record_answer(user_id, category, difficulty, is_correct)
 
-    # Create 'data' directory if it doesn't exist
-    if not os.path.exists('data'):
-        os.makedirs('data')
+    # Append to this user's shard of the response store
+    filename = RESPONSE_STORE.append(user_id or "anonymous", response_data)
 
-    filename = 'data/question_responses.json'
-
-    # Read existing data
-    try:
-        with open(filename, 'r') as f:
-            responses = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        responses = []
-
-    # Append new response
-    responses.append(response_data)
-
-    # Write updated data to file
-    with open(filename, 'w') as f:
-        json.dump(responses, f, indent=4)
-
-    # Prepare to upload to Pinata
-    url = "https://api.pinata.cloud/pinning/pinFileToIPFS"
-    
-    headers = {
-        "Authorization": f"Bearer {JWT_TOKEN}"
-    }
-
-    # Create the file payload
-    files = {
-        'file': ('question_responses.json', open(filename, 'rb'), 'application/json')
-    }
-
-    # Add metadata
-    payload = {
-        'pinataMetadata': {
-            'name': 'question_responses.json',
-            'keyvalues': {
-                'timestamp': timestamp
-            }
-        }
-    }
+    # The shard is already in the storage format, so it is stored byte for byte
+    with open(filename, 'rb') as f:
+        shard = f.read()
+    upload_name = 'question_responses' + storage_format.file_extension_for(shard)
 
     try:
-        response = requests.post(
-            url,
-            files=files,
-            headers=headers,
-            data={'pinataMetadata': json.dumps(payload['pinataMetadata'])}
-        )
-        response.raise_for_status()
-        
-        print(f"File uploaded successfully to Pinata. CID: {response.json().get('IpfsHash')}")
-        return response.json()
-        
+        cid = STORAGE.put(shard, upload_name, storage_format.content_type_for(shard),
+                          keyvalues=pin_metadata('responses', user=user_id or "anonymous", timestamp=timestamp))
+        print(f"File uploaded successfully. CID: {cid}")
     except Exception as e:
-        print(f"Error uploading to Pinata: {e}")
+        print(f"Error uploading response log: {e}")
         return {"error": str(e)}
-    finally:
-        files['file'][1].close()
 
+    # Each snapshot holds the whole log, so the older ones only slow down listings
+    try:
+        for entry in STORAGE.list(keyvalues={'kind': 'responses', 'user': user_id or "anonymous"}):
+            if entry['cid'] != cid:
+                STORAGE.unpin(entry['cid'])
+    except Exception as e:
+        print(f"Error unpinning old response logs: {e}")
+    return {"cid": cid}
 
-result = save_response_to_json("Math", "Easy", True)
-print(result)
 
 
-def display_question_card(question: Dict, index: int) -> None:
+def display_question_card(question: Question, index: int, show_context: bool = True) -> None:
     """Display an individual question card with interactive elements."""
     try:
         # Extract necessary details
-        category = question.get('category', 'Unknown')
-        difficulty = question.get('difficulty', 'Unknown')
-        context = question.get('context', '').strip()
-        question_text = question.get('question', '')
-        options = question.get('options', {})
+        category = question.category.value
+        difficulty = question.difficulty.value
+        context = question.context
+        question_text = question.question
+        options = question.options
 
         # Create a card layout for the question
         st.markdown(f"""
@@ -127,8 +125,8 @@ def display_question_card(question: Dict, index: int) -> None:
                 <strong>Difficulty:</strong> {difficulty}</p>
         """, unsafe_allow_html=True)
 
-        # Display context if available
-        if context:
+        # Display context if available and not already shown for its passage
+        if context and show_context:
             st.markdown("**Context:**")
             st.markdown(f"*{context}*")
 
@@ -143,7 +141,7 @@ def display_question_card(question: Dict, index: int) -> None:
 
             # Submit button
             if st.button("Submit Answer", key=f"submit_{index}"):
-                correct_answer = question.get('correct_option')
+                correct_answer = question.correct_option
                 selected_letter = choice.split(":")[0] if choice else None
                 is_correct = selected_letter == correct_answer
 
@@ -151,10 +149,10 @@ def display_question_card(question: Dict, index: int) -> None:
                     st.success("✅ Correct!")
                 else:
                     st.error(f"❌ Incorrect. The correct answer is {correct_answer}")
-                st.info(f"**Explanation:** {question.get('explanation', 'No explanation provided.')}")
+                st.info(f"**Explanation:** {question.explanation or 'No explanation provided.'}")
 
                 # Save response data to JSON
-                save_response_to_json(category, difficulty, is_correct)
+                save_response_to_json(category, difficulty, is_correct, question, st.session_state.user_id)
         else:
             st.error("Invalid question format")
 
@@ -166,51 +164,68 @@ def display_question_card(question: Dict, index: int) -> None:
         st.write("Raw question data:", question)
 
 
-def display_questions_grid(questions: List[Dict]) -> None:
-    """Display questions in a responsive grid layout."""
-    num_questions = len(questions)
-    num_rows = ceil(num_questions / 2)
+def display_questions_grid(questions: List[Question]) -> None:
+    """Display questions in a responsive grid layout, each shared passage once above its questions."""
+    offset = 0
+    for context_id, group in group_by_context(questions):
+        shared = context_id is not None and len(group) > 1
+        if shared:
+            display_passage(group[0])
 
-    for row in range(num_rows):
-        col1, col2 = st.columns(2)
+        num_questions = len(group)
+        num_rows = ceil(num_questions / 2)
 
-        first_idx = row * 2
-        if first_idx < num_questions:
-            with col1:
-                display_question_card(questions[first_idx], first_idx)
+        for row in range(num_rows):
+            col1, col2 = st.columns(2)
 
-        second_idx = row * 2 + 1
-        if second_idx < num_questions:
-            with col2:
-                display_question_card(questions[second_idx], second_idx)
+            first_idx = row * 2
+            if first_idx < num_questions:
+                with col1:
+                    display_question_card(group[first_idx], offset + first_idx, show_context=not shared)
 
+            second_idx = row * 2 + 1
+            if second_idx < num_questions:
+                with col2:
+                    display_question_card(group[second_idx], offset + second_idx, show_context=not shared)
+        offset += num_questions
+
+
+def fetch_questions(personal_data: Dict, regional_data: Dict, user_id: str) -> List[Question]:
+    """
+    Generate questions through the configured transport. Safe to run off the script thread.
+
+    Raises:
+        TransportError: If generation failed or the backend is unreachable
+    """
+    raw_questions = default_transport().generate(personal_data, regional_data, user_id)
+    return [q for q in map(coerce_question, raw_questions) if q is not None]
 
-def generate_questions(personal_data: Dict, regional_data: Dict) -> Optional[List[Dict]]:
-    """Make API call to generate questions."""
-    try:
-        response = requests.post(
-            "http://localhost:5000/generate-questions",
-            json={
-                "user_results": personal_data,
-                "regional_results": regional_data
-            },
-            headers={"Content-Type": "application/json"}
-        )
-
-        if response.status_code == 200:
-            return response.json().get('questions', [])
-        else:
-            st.error(f"API Error: {response.json().get('message', 'Unknown error')}")
-            return None
 
-    except requests.exceptions.ConnectionError:
+def generate_questions(personal_data: Dict, regional_data: Dict) -> Optional[List[Question]]:
+    """Make API call to generate questions, serving a prefetched set when one is ready."""
+    key = prefetch_key(personal_data, regional_data, st.session_state.user_id)
+    questions = take_prefetched(st.session_state, key)
+    if questions:
+        return questions
+    try:
+        return fetch_questions(personal_data, regional_data, st.session_state.user_id)
+    except GeneratorUnavailable:
         st.error("Could not connect to the backend server. Please make sure it's running.")
         return None
+    except TransportError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Error generating questions: {str(e)}")
         return None
 
 
+def prefetch_next_set(personal_data: Dict, regional_data: Dict) -> None:
+    """Start generating the next set for the current sliders while this one is answered."""
+    key = prefetch_key(personal_data, regional_data, st.session_state.user_id)
+    start_prefetch(st.session_state, key, fetch_questions, personal_data, regional_data,
+                   st.session_state.user_id)
+
 
 def main():
     """Main application logic."""
@@ -272,6 +287,10 @@ def main():
                 "English": st.slider("English", 0, 36, 13)
             }
 
+        # A prefetched set is only good for the sliders it was made with
+        invalidate_stale(st.session_state,
+                         prefetch_key(personal_data, regional_data, st.session_state.user_id))
+
         # Generate questions button
         if st.button("Generate Questions", type="primary"):
             with st.spinner("Generating questions..."):
@@ -284,6 +303,7 @@ def main():
         if st.session_state.questions:
             st.markdown("## Practice Questions")
             display_questions_grid(st.session_state.questions)
+            prefetch_next_set(personal_data, regional_data)
 
             if st.button("Reset All Answers"):
                 with st.spinner("Generating questions..."):
@@ -294,14 +314,16 @@ def main():
 
     # Backend status in sidebar
     try:
-        health_response = requests.get("http://localhost:5000/health")
-        if health_response.status_code == 200:
+        if default_transport().health():
             st.sidebar.success("Backend: Connected")
         else:
             st.sidebar.error("Backend: Error")
-    except Exception as e:
+    except GeneratorUnavailable as e:
         print(e)
         st.sidebar.error("Backend: Not Connected")
+    except (TransportError, requests.exceptions.RequestException, ValueError) as e:
+        print(e)
+        st.sidebar.error("Backend: Error")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+"""
+Packed uploads: many question or response records in one stored object.
+
+A pack is the records back to back, NDJSON or individually compressed with
+the compact storage format, uploaded from disk as a single pin. Its manifest,
+a second small pin, holds the pack's CID and the byte offset and length of
+every record, so readers fetch the manifest and then range-read only the
+records they need.
+"""
+import os
+import json
+import tempfile
+from typing import Dict, Iterable, List
+
+import storage_format
+from shared_cache import SharedCache
+from storage_backend import StorageBackend, pin_metadata
+
+MANIFEST_VERSION = 1
+
+# Manifests are content-addressed, so cached copies never go stale
+MANIFEST_CACHE = SharedCache("manifest")
+
+
+def pack_records(records: Iterable, path: str, compact: bool = None) -> Dict:
+    """
+    Write records to a pack file and return the offset index for the file.
+
+    Records are written one at a time, so the input can be any iterable. Packs
+    are NDJSON, or with the compact storage format a concatenation of
+    individually compressed records so each one can still be range-read.
+
+    Returns:
+        dict: Manifest with the byte offset and length of every record
+    """
+    if compact is None:
+        compact = storage_format.STORAGE_FORMAT == "compact"
+    index = []
+    offset = 0
+    with open(path, "wb") as f:
+        for record in records:
+            if compact:
+                line = storage_format.encode(record, "compact")
+            else:
+                line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+            f.write(line)
+            index.append([offset, len(line)])
+            offset += len(line)
+    return {"version": MANIFEST_VERSION, "format": "compact" if compact else "ndjson",
+            "count": len(index), "size": offset, "index": index}
+
+
+def upload_pack(backend: StorageBackend, records: Iterable, name: str = "questions",
+                kind: str = "question") -> Dict:
+    """
+    Store many records as one pack plus its manifest.
+
+    The pack is written to disk and streamed to the backend from there. The
+    manifest is tagged "<kind>-manifest", which is what history readers list.
+
+    Returns:
+        dict: {"manifest_cid": ..., "data_cid": ..., "count": ...}
+    """
+    fd, data_path = tempfile.mkstemp(suffix=".pack")
+    os.close(fd)
+    try:
+        manifest = pack_records(records, data_path)
+        if manifest["format"] == "compact":
+            data_name, data_type = f"{name}.pack", storage_format.COMPACT_CONTENT_TYPE
+        else:
+            data_name, data_type = f"{name}.ndjson", "application/x-ndjson"
+        data_cid = backend.put_file(data_path, data_name, data_type, pin_metadata(f"{kind}-pack"))
+    finally:
+        os.remove(data_path)
+
+    manifest.update({"kind": kind, "data_cid": data_cid})
+    manifest_cid = backend.put(json.dumps(manifest, separators=(",", ":")).encode("utf-8"),
+                               f"{name}.manifest.json", "application/json", pin_metadata(f"{kind}-manifest"))
+    return {"manifest_cid": manifest_cid, "data_cid": data_cid, "count": manifest["count"]}
+
+
+def fetch_manifest(backend: StorageBackend, manifest_cid: str) -> Dict:
+    """Read a pack manifest, or take it from the cache shared by all workers."""
+    cached = MANIFEST_CACHE.get(manifest_cid)
+    if cached is not None:
+        return json.loads(cached)
+    data = backend.get(manifest_cid)
+    manifest = json.loads(data)
+    MANIFEST_CACHE.set(manifest_cid, data)
+    return manifest
+
+
+def read_records(backend: StorageBackend, manifest: Dict, positions: Iterable[int]) -> List:
+    """
+    Range-read selected records of a pack.
+
+    Adjacent records are coalesced into a single range read.
+
+    Args:
+        backend (StorageBackend): Backend holding the pack
+        manifest (dict): Manifest returned by fetch_manifest
+        positions (Iterable[int]): Record numbers to read; negative numbers count from the end
+
+    Returns:
+        list: The requested records, in the order of `positions`
+
+    Raises:
+        IndexError: If a position is outside the pack
+    """
+    index = manifest["index"]
+    positions = list(positions)
+    for p in positions:
+        if not -len(index) <= p < len(index):
+            raise IndexError(f"Record {p} is out of range for a pack of {len(index)} records")
+    positions = [p % len(index) for p in positions]
+    spans = []
+    for p in sorted(set(positions)):
+        if spans and spans[-1][1] == p - 1:
+            spans[-1][1] = p
+        else:
+            spans.append([p, p])
+
+    found = {}
+    for first, last in spans:
+        start = index[first][0]
+        end = index[last][0] + index[last][1] - 1
+        try:
+            content = backend.get_range(manifest["data_cid"], start, end)
+        except Exception as e:
+            raise RuntimeError(f"Failed to read records {first}-{last}: {e}")
+        for p in range(first, last + 1):
+            offset = index[p][0] - start
+            found[p] = storage_format.decode(content[offset:offset + index[p][1]])
+    return [found[p] for p in positions]
@@ -0,0 +1,106 @@
+import os
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+PINATA_API_URL = os.getenv("PINATA_API_URL", "https://api.pinata.cloud")
+PINATA_PAGE_SIZE = int(os.getenv("PINATA_PAGE_SIZE", "100"))
+PINATA_TIMEOUT = float(os.getenv("PINATA_TIMEOUT", "10"))
+
+# Keys under which list endpoints return their items and next-page cursor
+_ITEM_KEYS = ("questions", "files", "rows", "items")
+_CURSOR_KEYS = ("next_page_token", "nextPageToken", "pageToken")
+
+
+def _parse_page(body) -> Tuple[List[Dict], Optional[str]]:
+    """Pull the items and the next cursor, if any, out of a list response."""
+    if isinstance(body, list):
+        return body, None
+    data = body.get("data", body) if isinstance(body, dict) else {}
+    if isinstance(data, list):
+        return data, None
+    items = next((data[k] for k in _ITEM_KEYS if isinstance(data.get(k), list)), [])
+    cursor = next((data[k] for k in _CURSOR_KEYS if data.get(k)), None)
+    return items, cursor
+
+
+def iter_group_questions(jwt_token: str, group_id: str, page_size: int = PINATA_PAGE_SIZE,
+                         order: str = "DESC", prefetch: bool = True,
+                         session: Optional[requests.Session] = None) -> Iterator[Dict]:
+    """
+    Lazily iterate over the questions in a Pinata group, newest first.
+
+    Pages are requested with a cursor when the API returns one and with an
+    offset otherwise. While the caller consumes one page the next one is
+    already being fetched on a background thread. Closing the generator early
+    (e.g. through itertools.islice) stops paging and drops any prefetched page.
+
+    Args:
+        jwt_token (str): Pinata JWT token
+        group_id (str): Group to list
+        page_size (int): Items per request
+        order (str): "DESC" for newest first, "ASC" for oldest first
+        prefetch (bool): Fetch the next page while the current one is consumed
+        session (requests.Session, optional): Session to reuse connections
+
+    Yields:
+        Dict: One question per item in the group
+    """
+    http = session or requests.Session()
+    url = f"{PINATA_API_URL}/groups/{group_id}/questions"
+    headers = {"Authorization": f"Bearer {jwt_token}"}
+
+    def fetch(cursor: Optional[str], offset: int) -> Tuple[List[Dict], Optional[str]]:
+        params = {"limit": page_size, "order": order}
+        if cursor:
+            params["pageToken"] = cursor
+        elif offset:
+            params["offset"] = offset
+        response = http.get(url, headers=headers, params=params, timeout=PINATA_TIMEOUT)
+        response.raise_for_status()
+        return _parse_page(response.json())
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pinata-prefetch") if prefetch else None
+    pending = None
+    try:
+        items, cursor = fetch(None, 0)
+        uses_cursor = bool(cursor)
+        offset = 0
+        while True:
+            offset += len(items)
+            # A cursor API signals the end by omitting the cursor; an offset API
+            # by returning a short page
+            has_more = bool(cursor) if uses_cursor else len(items) >= page_size
+            if has_more and executor is not None:
+                pending = executor.submit(fetch, cursor, offset)
+            yield from items
+            if not has_more:
+                return
+            items, cursor = pending.result() if pending is not None else fetch(cursor, offset)
+            pending = None
+            if not items:
+                return
+    finally:
+        if pending is not None:
+            pending.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+        if session is None:
+            http.close()
+
+
+def recent_group_questions(jwt_token: str, group_id: str, k: int) -> List[Dict]:
+    """Return only the K most recent questions of a group."""
+    return list(islice(iter_group_questions(jwt_token, group_id, page_size=min(k, PINATA_PAGE_SIZE) or 1), k))
+
+
+def count_group_questions_by(jwt_token: str, group_id: str, field: str = "category") -> Counter:
+    """Aggregate a group's questions by a field without holding the group in memory."""
+    return Counter(q.get(field, "Unknown") for q in iter_group_questions(jwt_token, group_id)
+                   if isinstance(q, dict))
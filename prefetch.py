@@ -0,0 +1,76 @@
+import os
+import json
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, MutableMapping, Optional
+
+logger = logging.getLogger(__name__)
+
+# Background generations shared by every session of the front end
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+# Prefetches allowed to wait or run at once; beyond this new ones are skipped
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", "4"))
+# Session state key holding the (inputs key, future) of the session's prefetch
+STATE_KEY = "prefetched_questions"
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="question-prefetch")
+_slots = threading.BoundedSemaphore(PREFETCH_MAX_PENDING)
+
+
+def prefetch_key(*inputs) -> str:
+    """Key identifying the inputs a question set was generated for."""
+    return json.dumps(inputs, sort_keys=True)
+
+
+def invalidate_stale(state: MutableMapping, key: str) -> None:
+    """Drop the session's prefetched set if it was made for other inputs."""
+    entry = state.get(STATE_KEY)
+    if entry is not None and entry[0] != key:
+        entry[1].cancel()
+        del state[STATE_KEY]
+
+
+def start_prefetch(state: MutableMapping, key: str, fetch: Callable[..., Any], *args) -> Optional[Future]:
+    """
+    Start generating the next question set in the background.
+
+    `fetch` runs on a worker thread, so it must not call Streamlit. Nothing is
+    started when the session already has a prefetch for these inputs or the
+    shared workers are saturated.
+
+    Returns:
+        Future: The prefetch in flight, or None if none was started
+    """
+    entry = state.get(STATE_KEY)
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    if not _slots.acquire(blocking=False):
+        logger.info("Prefetch workers busy, not prefetching")
+        return None
+    future = _executor.submit(fetch, *args)
+    future.add_done_callback(lambda _: _slots.release())
+    state[STATE_KEY] = (key, future)
+    return future
+
+
+def take_prefetched(state: MutableMapping, key: str, timeout: Optional[float] = None) -> Optional[Any]:
+    """
+    Hand over the session's prefetched set for these inputs, if there is one.
+
+    A prefetch still running is waited on (up to `timeout`), since it is
+    further along than a new request would be. The set is removed from session
+    state so it is served only once.
+
+    Returns:
+        The prefetched result, or None if there is none or it failed
+    """
+    entry = state.get(STATE_KEY)
+    if entry is None or entry[0] != key:
+        return None
+    del state[STATE_KEY]
+    try:
+        return entry[1].result(timeout=timeout)
+    except Exception as e:
+        logger.warning("Prefetched question set unavailable: %s", e)
+        return None
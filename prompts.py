@@ -0,0 +1,42 @@
+import hashlib
+from typing import Dict, List
+
+
+class PromptTemplate:
+    """
+    A chat prompt split into a static prefix and a per-request tail.
+
+    The system message, instructions and any reference data are joined once,
+    when the template is built, into a prefix that is byte-identical on every
+    call. Per-request data only ever goes into the final user message, after
+    the prefix, so providers that cache prompt prefixes can reuse the prefill
+    for it across requests.
+
+    `version` is bumped by hand when the wording changes; `hash` identifies the
+    exact prefix that is sent, so traces and metrics can tell templates apart
+    even when a version bump was forgotten.
+    """
+
+    def __init__(self, name: str, version: str, system: str, *blocks: str):
+        self.name = name
+        self.version = version
+        content = "\n\n".join(part.strip() for part in (system,) + blocks if part and part.strip())
+        self._prefix = {"role": "system", "content": content}
+        self.hash = hashlib.sha256(content.encode("utf-8")).hexdigest()[:12]
+
+    @property
+    def id(self) -> str:
+        """Name, version and prefix hash, e.g. "questions-v3-1a2b3c4d5e6f"."""
+        return f"{self.name}-v{self.version}-{self.hash}"
+
+    @property
+    def prefix(self) -> str:
+        return self._prefix["content"]
+
+    def render(self, request: str) -> List[Dict]:
+        """
+        Chat messages for one request: the shared prefix, then `request`.
+
+        The prefix message is shared between calls and must not be modified.
+        """
+        return [self._prefix, {"role": "user", "content": request.strip()}]
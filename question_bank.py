@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from question_model import Question, Category, Difficulty, normalize_category
+from dedup import DuplicateIndex, question_text
+
+logger = logging.getLogger(__name__)
+
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", "data/question_bank.db")
+
+# ACT scores run 1-36; questions are banked per six-point band
+SCORE_BAND_WIDTH = 6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id TEXT PRIMARY KEY,
+    category TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    score_band INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    served_count INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS questions_lookup ON questions (category, score_band, difficulty);
+CREATE TABLE IF NOT EXISTS seen (
+    user_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, question_id)
+);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5 (id UNINDEXED, question, context);
+"""
+
+
+def score_band(score) -> int:
+    """Map an ACT subject score to its band."""
+    try:
+        return max(0, min(36, int(score))) // SCORE_BAND_WIDTH
+    except (TypeError, ValueError):
+        return 0
+
+
+def target_difficulty(score) -> Difficulty:
+    """Difficulty that best stretches a student with this score."""
+    band = score_band(score)
+    if band <= 2:
+        return Difficulty.EASY
+    if band <= 3:
+        return Difficulty.MEDIUM
+    return Difficulty.HARD
+
+
+def subject_score(results: Dict, category: Category):
+    """Find the score for a category in a results dict keyed by subject name."""
+    for subject, score in results.items():
+        if normalize_category(subject) == category:
+            return score
+    return None
+
+
+class QuestionBank:
+    """
+    Persistent store of every question that passed validation.
+
+    Questions are indexed by category, difficulty and the score band of the
+    student they were generated for. Lexical search over question and context
+    text uses SQLite FTS5 when the interpreter's SQLite has it.
+    """
+
+    def __init__(self, path: str = QUESTION_BANK_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            try:
+                self._conn.executescript(_FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                logger.info("SQLite FTS5 unavailable, question bank search disabled")
+                self.has_fts = False
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+
+    @staticmethod
+    def question_id(question: Question) -> str:
+        return DuplicateIndex.key_for(question_text(question))
+
+    def add(self, questions: Iterable[Question], user_results: Dict) -> List[str]:
+        """
+        Bank questions generated for a student with the given results.
+
+        Returns:
+            List[str]: Ids of the questions, whether new or already banked
+        """
+        ids, rows = [], []
+        now = time.time()
+        for q in questions:
+            qid = self.question_id(q)
+            ids.append(qid)
+            band = score_band(subject_score(user_results, q.category))
+            rows.append((qid, q.category.value, q.difficulty.value, band, json.dumps(q.to_dict()), now,
+                         q.question, q.context))
+        with self._lock, self._conn:
+            for row in rows:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO questions (id, category, difficulty, score_band, body, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", row[:6])
+                if cursor.rowcount and self.has_fts:
+                    self._conn.execute("INSERT INTO questions_fts (id, question, context) VALUES (?, ?, ?)",
+                                       (row[0], row[6], row[7]))
+        return ids
+
+    def draw(self, category: Category, score, user_id: str) -> Optional[Tuple[str, Question]]:
+        """
+        Pick an unseen question for a subject, preferring the student's score band
+        and target difficulty and the least-served questions.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, body FROM questions WHERE category = ? AND score_band = ? "
+                "AND id NOT IN (SELECT question_id FROM seen WHERE user_id = ?) "
+                "ORDER BY difficulty = ? DESC, served_count, RANDOM() LIMIT 1",
+                (category.value, score_band(score), user_id, target_difficulty(score).value)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], Question.from_dict(json.loads(row[1]), strict=False)
+
+    def mark_served(self, question_ids: Iterable[str], user_id: str) -> None:
+        question_ids = list(question_ids)
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE questions SET served_count = served_count + 1 WHERE id = ?",
+                                   [(qid,) for qid in question_ids])
+            self._conn.executemany("INSERT OR IGNORE INTO seen (user_id, question_id) VALUES (?, ?)",
+                                   [(user_id, qid) for qid in question_ids])
+
+    def search(self, text: str, category: Optional[Category] = None, limit: int = 10) -> List[Question]:
+        """Full-text search over banked question and context text."""
+        if not self.has_fts:
+            return []
+        terms = " ".join(f'"{word}"' for word in text.replace('"', " ").split())
+        if not terms:
+            return []
+        query = ("SELECT q.body FROM questions_fts f JOIN questions q ON q.id = f.id "
+                 "WHERE questions_fts MATCH ?")
+        params = [terms]
+        if category is not None:
+            query += " AND q.category = ?"
+            params.append(category.value)
+        query += " ORDER BY bm25(questions_fts) LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [Question.from_dict(json.loads(body), strict=False) for (body,) in rows]
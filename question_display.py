@@ -0,0 +1,9 @@
+import streamlit as st
+
+from question_model import Question
+
+
+def display_passage(question: Question) -> None:
+    """Display a passage shared by several questions, once above them."""
+    st.markdown(f"**{question.category.value} Passage:**")
+    st.markdown(f"*{question.context}*")
@@ -0,0 +1,299 @@
+import json
+import hashlib
+from enum import Enum
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+OPTION_KEYS = ("A", "B", "C", "D")
+
+
+class Category(str, Enum):
+    ENGLISH = "English"
+    MATH = "Math"
+    READING = "Reading"
+    SCIENCE = "Science"
+    UNKNOWN = "Unknown"
+    ERROR = "Error"
+
+
+class Difficulty(str, Enum):
+    EASY = "Easy"
+    MEDIUM = "Medium"
+    HARD = "Hard"
+    UNKNOWN = "N/A"
+
+
+# Lookup tables built once so normalization is a single dict hit
+_CATEGORY_ALIASES = {c.value.lower(): c for c in Category}
+_CATEGORY_ALIASES.update({"mathematics": Category.MATH, "maths": Category.MATH})
+_DIFFICULTY_ALIASES = {d.value.lower(): d for d in Difficulty}
+_DIFFICULTY_ALIASES.update({"unknown": Difficulty.UNKNOWN, "moderate": Difficulty.MEDIUM})
+
+# Categories whose questions must carry a passage
+PASSAGE_CATEGORIES = frozenset((Category.READING, Category.ENGLISH))
+
+# Compact wire schema the model writes to save decode tokens: short keys, the
+# options as a list in A-D order and one-letter subject and difficulty codes
+COMPACT_KEYS = {"c": "context", "q": "question", "o": "options", "a": "correct_option",
+                "x": "explanation", "s": "category", "d": "difficulty", "qs": "questions"}
+CATEGORY_CODES = {"E": Category.ENGLISH, "M": Category.MATH, "R": Category.READING, "S": Category.SCIENCE}
+DIFFICULTY_CODES = {"E": Difficulty.EASY, "M": Difficulty.MEDIUM, "H": Difficulty.HARD}
+
+# Fields every question must have; context_id is only set on passage clusters
+REQUIRED_FIELDS = ("context", "question", "options", "correct_option",
+                   "explanation", "category", "difficulty")
+
+
+class QuestionValidationError(ValueError):
+    """Raised when a raw question dict does not match the expected shape."""
+
+
+def normalize_category(value) -> Category:
+    if isinstance(value, Category):
+        return value
+    return _CATEGORY_ALIASES.get(str(value).strip().lower(), Category.UNKNOWN)
+
+
+def normalize_difficulty(value) -> Difficulty:
+    if isinstance(value, Difficulty):
+        return value
+    return _DIFFICULTY_ALIASES.get(str(value).strip().lower(), Difficulty.UNKNOWN)
+
+
+class Question:
+    """
+    A single ACT practice question.
+
+    Uses __slots__ so the many questions kept in session state and history
+    do not each carry a per-instance __dict__.
+    """
+
+    __slots__ = REQUIRED_FIELDS + ("context_id",)
+
+    def __init__(self, question: str, options: Dict[str, str], correct_option: str = "A",
+                 explanation: str = "", category: Category = Category.UNKNOWN,
+                 difficulty: Difficulty = Difficulty.MEDIUM, context: str = "",
+                 context_id: Optional[str] = None):
+        self.context = context
+        self.context_id = context_id
+        self.question = question
+        self.options = options
+        self.correct_option = correct_option
+        self.explanation = explanation
+        self.category = category
+        self.difficulty = difficulty
+
+    @classmethod
+    def from_dict(cls, raw: Dict, strict: bool = True) -> "Question":
+        """
+        Build a Question from a raw dict in one validation pass.
+
+        Args:
+            raw (Dict): Question as produced by the model or read from storage
+            strict (bool): Reject malformed questions instead of filling defaults
+
+        Returns:
+            Question: The validated question
+
+        Raises:
+            QuestionValidationError: If strict and the question is malformed
+        """
+        if not isinstance(raw, dict):
+            raise QuestionValidationError(f"Expected a question object, got {type(raw).__name__}")
+
+        get = raw.get
+        options = get("options")
+        context = get("context")
+        if strict:
+            missing = [f for f in REQUIRED_FIELDS if f not in raw]
+            if missing:
+                raise QuestionValidationError(f"Missing fields: {', '.join(missing)}")
+            if not isinstance(options, dict) or any(k not in options for k in OPTION_KEYS):
+                raise QuestionValidationError("Options must be an object with keys A, B, C and D")
+        elif not isinstance(options, dict):
+            options = {}
+
+        category = normalize_category(get("category", Category.UNKNOWN))
+        context = context.strip() if isinstance(context, str) else ""
+        if strict and category in PASSAGE_CATEGORIES and not context:
+            raise QuestionValidationError(f"{category.value} question has an empty context")
+
+        correct_option = str(get("correct_option", "A")).strip().upper()[:1] or "A"
+        if strict and correct_option not in options:
+            raise QuestionValidationError(f"Correct option {correct_option!r} is not one of the options")
+
+        return cls(
+            question=str(get("question", "")),
+            options={k: str(v) for k, v in options.items()},
+            correct_option=correct_option,
+            explanation=str(get("explanation", "")),
+            category=category,
+            difficulty=normalize_difficulty(get("difficulty", Difficulty.UNKNOWN)),
+            context=context,
+            context_id=str(get("context_id")) if get("context_id") else None,
+        )
+
+    def to_dict(self) -> Dict:
+        data = {
+            "context": self.context,
+            "question": self.question,
+            "options": dict(self.options),
+            "correct_option": self.correct_option,
+            "explanation": self.explanation,
+            "category": self.category.value,
+            "difficulty": self.difficulty.value,
+        }
+        if self.context_id:
+            data["context_id"] = self.context_id
+        return data
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Question):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+
+    # Questions are mutable, so equal questions must not be usable as set members or dict keys
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Question({self.category.value}, {self.difficulty.value}, {self.question[:40]!r})"
+
+
+def _as_dicts(questions: Iterable[Union[Question, Dict]]) -> List[Dict]:
+    return [q.to_dict() if isinstance(q, Question) else q for q in questions]
+
+
+def dumps(questions: Iterable[Union[Question, Dict]], pretty: bool = False) -> str:
+    """Serialize questions (or plain dicts) to a JSON string, using orjson when available."""
+    data = _as_dicts(questions)
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 if pretty else 0).decode()
+    if pretty:
+        return json.dumps(data, indent=2)
+    return json.dumps(data, separators=(",", ":"))
+
+
+def loads(text: Union[str, bytes], strict: bool = False) -> List[Question]:
+    """Parse a JSON array of questions."""
+    data = orjson.loads(text) if orjson is not None else json.loads(text)
+    if isinstance(data, dict):
+        data = [data]
+    return [Question.from_dict(q, strict=strict) for q in data]
+
+
+def _expand_item(item):
+    if not isinstance(item, dict):
+        return item
+    expanded = {COMPACT_KEYS.get(k, k): v for k, v in item.items()}
+    if isinstance(expanded.get("options"), list):
+        expanded["options"] = dict(zip(OPTION_KEYS, expanded["options"]))
+    category = expanded.get("category")
+    if isinstance(category, str) and category.upper() in CATEGORY_CODES:
+        expanded["category"] = CATEGORY_CODES[category.upper()].value
+    difficulty = expanded.get("difficulty")
+    if isinstance(difficulty, str) and difficulty.upper() in DIFFICULTY_CODES:
+        expanded["difficulty"] = DIFFICULTY_CODES[difficulty.upper()].value
+    if isinstance(expanded.get("questions"), list):
+        expanded["questions"] = [_expand_item(q) for q in expanded["questions"]]
+    return expanded
+
+
+def expand_compact(raw_items: Iterable[Dict]) -> List[Dict]:
+    """
+    Expand questions written in the compact wire schema into the full shape.
+
+    Short keys are renamed, an options list becomes the A-D mapping and
+    subject and difficulty codes become their names, including inside passage
+    clusters. Items already in the full shape pass through unchanged.
+    """
+    return [_expand_item(item) for item in raw_items]
+
+
+def passage_id(context: str) -> str:
+    """Stable id for a shared passage, derived from its text."""
+    return hashlib.sha1(context.strip().encode("utf-8")).hexdigest()[:12]
+
+
+def expand_passages(raw_items: Iterable[Dict]) -> List[Dict]:
+    """
+    Flatten passage clusters into plain question dicts.
+
+    A cluster is an object with a "context" and a "questions" list; each of its
+    questions gets the passage as its context, the cluster's category unless
+    it has its own, and a context_id shared by the whole cluster. Other items
+    pass through unchanged.
+    """
+    expanded = []
+    for item in raw_items:
+        if not (isinstance(item, dict) and isinstance(item.get("questions"), list)):
+            expanded.append(item)
+            continue
+        context = item.get("context") if isinstance(item.get("context"), str) else ""
+        context_id = passage_id(context) if context.strip() else None
+        for sub in item["questions"]:
+            if not isinstance(sub, dict):
+                expanded.append(sub)
+                continue
+            question = dict(sub)
+            question["context"] = context
+            question.setdefault("category", item.get("category", Category.UNKNOWN.value))
+            question.setdefault("difficulty", item.get("difficulty", Difficulty.UNKNOWN.value))
+            if context_id:
+                question["context_id"] = context_id
+            expanded.append(question)
+    return expanded
+
+
+def group_by_context(questions: Iterable[Question]) -> List[Tuple[Optional[str], List[Question]]]:
+    """
+    Group questions for display: each passage cluster becomes one group, and
+    consecutive questions without a shared passage are grouped under None.
+    """
+    groups: List[Tuple[Optional[str], List[Question]]] = []
+    clusters: Dict[str, List[Question]] = {}
+    for q in questions:
+        if q.context_id:
+            if q.context_id not in clusters:
+                clusters[q.context_id] = []
+                groups.append((q.context_id, clusters[q.context_id]))
+            clusters[q.context_id].append(q)
+        elif groups and groups[-1][0] is None:
+            groups[-1][1].append(q)
+        else:
+            groups.append((None, [q]))
+    return groups
+
+
+def validate_questions(raw_questions: Iterable[Dict], on_invalid=None) -> List[Question]:
+    """
+    Validate a batch of raw question dicts, dropping the invalid ones.
+
+    Args:
+        raw_questions (Iterable[Dict]): Questions decoded from the model output
+        on_invalid (callable, optional): Called with (raw, error) for each rejected question
+
+    Returns:
+        List[Question]: The questions that passed validation
+    """
+    valid = []
+    for raw in expand_passages(raw_questions):
+        try:
+            valid.append(Question.from_dict(raw))
+        except QuestionValidationError as e:
+            if on_invalid is not None:
+                on_invalid(raw, e)
+    return valid
+
+
+def coerce_question(raw: Union[Question, Dict]) -> Optional[Question]:
+    """Leniently turn whatever the backend returned into a Question for display."""
+    if isinstance(raw, Question):
+        return raw
+    try:
+        return Question.from_dict(raw, strict=False)
+    except QuestionValidationError:
+        return None
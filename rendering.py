@@ -0,0 +1,118 @@
+import os
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from flask import Response, request, stream_with_context
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Pages whose payload is larger than this are streamed in chunks
+STREAM_THRESHOLD = int(os.getenv("STREAM_THRESHOLD", str(64 * 1024)))
+# Bodies smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = int(os.getenv("MIN_COMPRESS_SIZE", "1024"))
+CHUNK_SIZE = 16 * 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Pick a content encoding from an Accept-Encoding header.
+
+    Args:
+        accept_encoding (str): The raw Accept-Encoding header value
+
+    Returns:
+        Optional[str]: "br", "gzip" or None for identity
+    """
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """Incremental gzip/brotli compressor with a common interface."""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress, self._finish = self._c.process, self._c.finish
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self._compress, self._finish = self._c.compress, self._c.flush
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compress(data)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def _chunked(parts: Iterable[str]) -> Iterator[bytes]:
+    """Coalesce the many small strings Jinja yields into CHUNK_SIZE byte chunks."""
+    buffer, size = [], 0
+    for part in parts:
+        data = part.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def _compressed(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    compressor = _Compressor(encoding)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def render_page(template, payload_size: int = 0, **context) -> Response:
+    """
+    Render a precompiled template into a response.
+
+    Large payloads are streamed as a chunked response; the body is compressed
+    with the best encoding the client accepts.
+
+    Args:
+        template: A template compiled once with app.jinja_env.from_string
+        payload_size (int): Rough size of the dynamic content, used to pick streaming
+        **context: Template variables
+
+    Returns:
+        Response: The HTML response
+    """
+    encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+
+    if payload_size >= STREAM_THRESHOLD:
+        body = _chunked(template.generate(**context))
+        if encoding:
+            body = _compressed(body, encoding)
+        response = Response(stream_with_context(body), mimetype="text/html")
+    else:
+        body = template.render(**context).encode("utf-8")
+        if encoding and len(body) >= MIN_COMPRESS_SIZE:
+            body = b"".join(_compressed([body], encoding))
+        else:
+            encoding = None
+        response = Response(body, mimetype="text/html")
+
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
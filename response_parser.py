@@ -0,0 +1,126 @@
+import re
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# One anchored pattern recognises every line that opens a field. Lines that
+# do not match are continuation text for the field opened before them, so
+# multi-line passages and explanations survive.
+_MARKER_RE = re.compile(
+    r"[>#*-]*[ \t]*(?:"
+    r"(?P<field>q|question|problem|context|passage|correct(?:[ _]option)?|correct[ _]answer|answer"
+    r"|explanation|category|subject|difficulty)(?:[ \t]*\d+)?[ \t]*\**[ \t]*:\**"
+    r"|\((?P<paren>(?-i:[A-D]))\)|(?P<option>(?-i:[A-D]))[.)]"
+    r")[ \t]*(?P<rest>.*)",
+    re.IGNORECASE,
+)
+# First characters a marker line can start with; every other line skips the regex
+_MARKER_STARTS = frozenset(">#*-(ABCDEPQSabcdepqs")
+_ANSWER_RE = re.compile(r"^\(?([A-D])\b", re.IGNORECASE)
+
+_FIELD_NAMES = {
+    "q": "question", "question": "question", "problem": "question",
+    "context": "context", "passage": "context",
+    "answer": "correct_option", "correct": "correct_option",
+    "correct option": "correct_option", "correct_option": "correct_option",
+    "correct answer": "correct_option", "correct_answer": "correct_option",
+    "explanation": "explanation",
+    "category": "category", "subject": "category",
+    "difficulty": "difficulty",
+}
+
+# Fields whose value may run over several lines
+_MULTILINE_FIELDS = frozenset(("question", "context", "explanation", "A", "B", "C", "D"))
+
+FAILED_PARSE = {"question": "Failed to generate questions",
+                "options": {"A": "N/A", "B": "N/A", "C": "N/A", "D": "N/A"},
+                "correct_option": "A",
+                "explanation": "The API response format was unexpected",
+                "category": "Error", "difficulty": "N/A"}
+
+
+def _new_question() -> Dict:
+    return {
+        "context": "",
+        "question": "",
+        "options": {},
+        "correct_option": "A",
+        "explanation": "",
+        "category": "Unknown",
+        "difficulty": "Medium",
+    }
+
+
+def parse_unstructured_response(response_text: str) -> List[Dict]:
+    """
+    Fallback parser for model output that is not valid JSON.
+
+    Understands `Question:`/`Q:`/`Problem:`, `Context:`/`Passage:` blocks,
+    options written as `A)`, `A.` or `(A)`, `Answer:`/`Correct:`, `Explanation:`,
+    `Category:` and `Difficulty:` fields. Field values may span several lines.
+
+    Args:
+        response_text (str): Raw model output
+
+    Returns:
+        List[Dict]: Parsed questions, or a single error placeholder
+    """
+    questions = []
+    current = None
+    field: Optional[str] = None
+    parts: List[str] = []
+
+    def close_field() -> None:
+        # Store the text collected for the open field on the current question
+        if current is None or field is None:
+            return
+        value = "\n".join(parts)
+        if field in ("A", "B", "C", "D"):
+            current["options"][field] = value
+        elif field == "correct_option":
+            match = _ANSWER_RE.match(value)
+            if match:
+                current["correct_option"] = match.group(1).upper()
+        else:
+            current[field] = value
+
+    def flush() -> None:
+        if current is not None and current["question"]:
+            questions.append(current)
+
+    for line in response_text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = _MARKER_RE.match(line) if line[0] in _MARKER_STARTS else None
+        if match is None:
+            if field in _MULTILINE_FIELDS:
+                parts.append(line)
+            continue
+
+        close_field()
+        name, paren, option, rest = match.groups()
+        parts = [rest.strip()] if rest else []
+        if name is None:
+            field = option or paren
+            if current is None:
+                current = _new_question()
+            continue
+
+        field = _FIELD_NAMES[name.lower()]
+        if field in ("question", "context"):
+            # A question or passage opens a new question unless the current
+            # one is still waiting for its question text
+            if current is None or current["question"] or (field == "context" and current["context"]):
+                flush()
+                current = _new_question()
+        elif current is None:
+            current = _new_question()
+
+    close_field()
+    flush()
+
+    logger.debug("Parsed questions: %s", questions, extra={"payload": True})
+    return questions if questions else [dict(FAILED_PARSE, options=dict(FAILED_PARSE["options"]))]
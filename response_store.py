@@ -0,0 +1,142 @@
+import os
+import re
+import zlib
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+
+import storage_format
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows; fall back to in-process locking only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_STORE_DIR = os.getenv("RESPONSE_STORE_DIR", "data/responses")
+
+_SAFE_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class ResponseStore:
+    """
+    Answer history sharded into one file per user, written in the compact
+    storage format (plain JSON shards are still read).
+
+    Writes take an advisory lock on the user's shard, write the new contents to
+    a temporary file, fsync it and rename it over the shard, so a reader never
+    sees a half-written file and concurrent sessions cannot drop each other's
+    records. Each write only touches one user's data.
+    """
+
+    def __init__(self, root: str = RESPONSE_STORE_DIR):
+        self.root = root
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def shard_path(self, user_id: str) -> str:
+        name = user_id if _SAFE_ID_RE.match(user_id) else hashlib.sha256(user_id.encode("utf-8")).hexdigest()
+        # Two-character fan-out keeps directories small with many users
+        return os.path.join(self.root, hashlib.sha1(name.encode("utf-8")).hexdigest()[:2], f"{name}.json")
+
+    def _thread_lock(self, path: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(path, threading.Lock())
+
+    @contextmanager
+    def _locked(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._thread_lock(path):
+            if fcntl is None:
+                yield
+                return
+            with open(path + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read(self, path: str) -> List[Dict]:
+        try:
+            with open(path, "rb") as f:
+                records = storage_format.decode(f.read())
+            return records if isinstance(records, list) else [records]
+        except FileNotFoundError:
+            return []
+        except (ValueError, zlib.error) as e:
+            # Only possible for files written before atomic writes; keep the
+            # damaged copy for inspection and start the shard over
+            quarantine = f"{path}.corrupt-{int(time.time())}"
+            os.replace(path, quarantine)
+            logger.error("Corrupt response shard %s moved to %s: %s", path, quarantine, e)
+            return []
+
+    def _write(self, path: str, records: List[Dict]) -> None:
+        directory = os.path.dirname(path)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(storage_format.encode(records))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if hasattr(os, "O_DIRECTORY"):
+            # Persist the rename itself
+            dir_fd = os.open(directory, os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def append(self, user_id: str, record: Dict) -> str:
+        """
+        Append a response record to a user's shard.
+
+        Returns:
+            str: Path of the shard that was written
+        """
+        path = self.shard_path(user_id)
+        with self._locked(path):
+            records = self._read(path)
+            records.append(record)
+            self._write(path, records)
+        return path
+
+    def read(self, user_id: str) -> List[Dict]:
+        """Return all of a user's response records."""
+        path = self.shard_path(user_id)
+        with self._locked(path):
+            return self._read(path)
+
+    def recover(self, max_age: float = 300.0) -> int:
+        """
+        Remove temporary files left behind by writers that crashed before renaming.
+
+        The shard itself is always either the previous or the new complete
+        version, so leftovers can simply be discarded. Files younger than
+        `max_age` seconds may belong to a write in progress and are kept.
+
+        Returns:
+            int: Number of leftover files removed
+        """
+        removed = 0
+        cutoff = time.time() - max_age
+        for directory, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(directory, name)
+                if name.startswith(".tmp-") and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+        if removed:
+            logger.warning("Removed %d incomplete response writes", removed)
+        return removed
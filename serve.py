@@ -0,0 +1,86 @@
+"""
+Production entrypoint for the question API.
+
+    python serve.py
+
+Runs the Flask app under gunicorn with preforked, threaded workers. The app is
+imported once in the parent so every worker starts with it loaded; caches
+live in the SQLite file shared by all workers (see shared_cache). Without
+gunicorn installed it falls back to a single threaded Werkzeug server.
+"""
+import os
+import logging
+
+from admission import ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # gunicorn is optional; only needed for multi-process serving
+    BaseApplication = None
+
+logger = logging.getLogger(__name__)
+
+SERVE_BIND = os.getenv("SERVE_BIND", "0.0.0.0:5000")
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", str(os.cpu_count() or 1)))
+# Threads per worker. Admission control queues and sheds requests only once a
+# thread is running them; with fewer threads than ADMISSION_MAX_IN_FLIGHT +
+# ADMISSION_MAX_QUEUE, extra requests wait unseen in gunicorn's backlog and
+# never get a 429. The default covers both, plus a few threads for /health and
+# /metrics while every generation slot is taken.
+SERVE_SPARE_THREADS = 2
+SERVE_THREADS = int(os.getenv("SERVE_THREADS", str(ADMISSION_MAX_IN_FLIGHT + ADMISSION_MAX_QUEUE
+                                                    + SERVE_SPARE_THREADS)))
+# Generation calls the model and may repair, so allow well past the request deadline
+SERVE_TIMEOUT = int(os.getenv("SERVE_TIMEOUT", "120"))
+
+
+def _post_fork(server, worker) -> None:
+    import app
+    app.open_stores()
+
+
+if BaseApplication is not None:
+    class QuestionServer(BaseApplication):
+        """gunicorn application that preloads app.py in the parent process."""
+
+        def __init__(self, options: dict):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            import app
+            # Workers reopen these after the fork
+            app.close_stores()
+            return app.app
+
+
+def main() -> None:
+    if BaseApplication is None:
+        from werkzeug.serving import run_simple
+        import app
+        host, _, port = SERVE_BIND.rpartition(":")
+        logger.warning("gunicorn is not installed; serving from a single process")
+        run_simple(host or "0.0.0.0", int(port), app.app, threaded=True)
+        return
+
+    if SERVE_THREADS < ADMISSION_MAX_IN_FLIGHT + ADMISSION_MAX_QUEUE:
+        logger.warning("SERVE_THREADS=%d is below ADMISSION_MAX_IN_FLIGHT + ADMISSION_MAX_QUEUE=%d; "
+                       "requests beyond it queue in gunicorn and are never shed",
+                       SERVE_THREADS, ADMISSION_MAX_IN_FLIGHT + ADMISSION_MAX_QUEUE)
+    QuestionServer({
+        "bind": SERVE_BIND,
+        "workers": SERVE_WORKERS,
+        "worker_class": "gthread",
+        "threads": SERVE_THREADS,
+        "timeout": SERVE_TIMEOUT,
+        "preload_app": True,
+        "post_fork": _post_fork,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
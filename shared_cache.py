@@ -0,0 +1,141 @@
+import os
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import storage_format
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "data/shared_cache.db")
+# Entries kept per namespace; the oldest are dropped beyond this
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "20000"))
+# Expired entries are swept and namespaces trimmed once per this many writes
+_PRUNE_EVERY = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS cache_created ON cache (namespace, created_at);
+"""
+
+# One connection per database per process, with the lock every cache using it
+# holds around each use. Connections must not cross a fork, so they are keyed
+# by pid and a forked worker opens its own.
+_connections: Dict[str, Tuple[sqlite3.Connection, threading.Lock]] = {}
+_connections_pid = None
+_connections_lock = threading.Lock()
+
+
+def _connection(path: str) -> Tuple[sqlite3.Connection, threading.Lock]:
+    global _connections_pid
+    with _connections_lock:
+        if _connections_pid != os.getpid():
+            _connections.clear()
+            _connections_pid = os.getpid()
+        shared = _connections.get(path)
+        if shared is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            shared = _connections[path] = (conn, threading.Lock())
+        return shared
+
+
+class SharedCache:
+    """
+    Key-value cache in a SQLite file that every worker process reads and writes.
+
+    A warm entry written by one worker is a hit for all of them, so hit rates
+    do not drop as workers are added. Cache failures are logged and treated as
+    misses; the cache never fails a request.
+
+    A TTL of None keeps entries until they are trimmed; a TTL of 0 disables
+    caching, so nothing is stored.
+    """
+
+    def __init__(self, namespace: str, ttl: Optional[float] = None, path: str = SHARED_CACHE_PATH,
+                 max_entries: int = SHARED_CACHE_MAX_ENTRIES):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached bytes for a key, or None on a miss or expiry."""
+        try:
+            conn, lock = _connection(self.path)
+            with lock:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Shared cache read failed for %s/%s: %s", self.namespace, key, e)
+            row = None
+        if row is None or (row[1] is not None and row[1] < time.time()):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store bytes under a key, with the cache's TTL unless one is given."""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            return
+        now = time.time()
+        try:
+            conn, lock = _connection(self.path)
+            with lock:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace, key, value, now, None if ttl is None else now + ttl)
+                )
+                self._writes += 1
+                if self._writes % _PRUNE_EVERY == 0:
+                    self._prune(conn, now)
+        except sqlite3.Error as e:
+            logger.warning("Shared cache write failed for %s/%s: %s", self.namespace, key, e)
+
+    def _prune(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM cache WHERE namespace = ? AND expires_at < ?", (self.namespace, now))
+        conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN ("
+            "SELECT key FROM cache WHERE namespace = ? ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.namespace, self.namespace, self.max_entries)
+        )
+
+    def get_object(self, key: str) -> Optional[Any]:
+        """Like get, for values stored with set_object."""
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return storage_format.decode(data)
+        except (ValueError, zlib.error):
+            return None
+
+    def set_object(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a JSON-serializable value."""
+        self.set(key, storage_format.encode(value), ttl)
+
+    def stats(self) -> Dict:
+        """Hit and miss counts of this process."""
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hits / total, 3) if total else None}
@@ -0,0 +1,644 @@
+import os
+import json
+import time
+import base64
+import sqlite3
+import io
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+import storage_format
+from gateways import GATEWAY_POOL
+from pinata import PINATA_API_URL, PINATA_TIMEOUT
+from deadlines import timeout_for
+
+logger = logging.getLogger(__name__)
+
+# "pinata", "local", "memory" or "tiered" (local disk in front of Pinata)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "pinata")
+STORAGE_LOCAL_DIR = os.getenv("STORAGE_LOCAL_DIR", "data/ipfs")
+# In tiered mode, also upload every write to Pinata before returning
+STORAGE_WRITE_THROUGH = os.getenv("STORAGE_WRITE_THROUGH", "1") == "1"
+
+# Version of the keyvalues layout uploads are tagged with
+PIN_METADATA_VERSION = "1"
+# Most rows Pinata returns per pinList page
+PINATA_PAGE_LIMIT = 1000
+
+# CIDv1 prefix: version 1, raw codec, sha2-256 multihash of 32 bytes
+_CID_PREFIX = bytes((0x01, 0x55, 0x12, 0x20))
+
+
+def content_id(data: bytes) -> str:
+    """
+    CIDv1 (raw, sha2-256, base32) of a payload, the same CID `ipfs add
+    --cid-version=1 --raw-leaves` gives a single-block file.
+    """
+    return _cid_for_digest(hashlib.sha256(data).digest())
+
+
+def _cid_for_digest(digest: bytes) -> str:
+    return "b" + base64.b32encode(_CID_PREFIX + digest).decode("ascii").lower().rstrip("=")
+
+
+def _entry(cid: str, name: str, keyvalues: Optional[Dict], created_at) -> Dict:
+    return {"cid": cid, "name": name, "keyvalues": keyvalues or {}, "created_at": pin_timestamp(created_at)}
+
+
+def pin_timestamp(value) -> float:
+    """Seconds since the epoch from a number or an ISO 8601 string such as Pinata's date_pinned."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value:
+        return 0.0
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        logger.warning("Unparseable pin date %r", value)
+        return 0.0
+
+
+def _matches(entry: Dict, keyvalues: Optional[Dict]) -> bool:
+    tags = entry["keyvalues"]
+    return all(k in tags and str(tags[k]) == str(v) for k, v in (keyvalues or {}).items())
+
+
+def pin_metadata(kind: str, **fields) -> Dict[str, str]:
+    """
+    Keyvalues to tag an upload with, so reads can select it by metadata.
+
+    Args:
+        kind (str): What the pin holds, e.g. "question" or "responses"
+        **fields: Further tags such as user, subject and difficulty; None values are left out
+
+    Returns:
+        Dict[str, str]: The tags, including the metadata schema version
+    """
+    keyvalues = {"kind": kind, "schema": PIN_METADATA_VERSION}
+    keyvalues.update((k, str(v)) for k, v in fields.items() if v is not None)
+    return keyvalues
+
+
+class StorageBackend(ABC):
+    """
+    Where question sets and response logs are listed, read and written.
+
+    Entries returned by `list` are dicts with "cid", "name", "keyvalues" and
+    "created_at" (seconds since the epoch), newest first. Payloads are raw bytes; callers encode and
+    decode them with storage_format.
+    """
+
+    @abstractmethod
+    def list(self, limit: Optional[int] = None, keyvalues: Optional[Dict] = None) -> List[Dict]:
+        """
+        List stored entries, newest first.
+
+        Args:
+            limit (int, optional): Most entries to return
+            keyvalues (Dict, optional): Only entries tagged with all of these values
+        """
+
+    @abstractmethod
+    def get(self, cid: str, parse: Optional[Callable[[bytes], Any]] = None) -> Any:
+        """
+        Read a payload by CID.
+
+        Args:
+            cid (str): Content identifier
+            parse (callable, optional): Applied to the payload before returning it;
+                backends with several sources reject sources whose payload it raises on
+
+        Raises:
+            KeyError: If the backend does not have the CID
+        """
+
+    @abstractmethod
+    def put(self, data: bytes, name: str, content_type: str = "application/json",
+            keyvalues: Optional[Dict] = None) -> str:
+        """Store and pin a payload, returning its CID."""
+
+    @abstractmethod
+    def pin(self, cid: str) -> None:
+        """Make sure an already stored CID is kept."""
+
+    @abstractmethod
+    def unpin(self, cid: str) -> None:
+        """Stop keeping a CID, e.g. a snapshot a newer one supersedes."""
+
+    @abstractmethod
+    def tag(self, cid: str, keyvalues: Dict) -> None:
+        """
+        Add keyvalues to a stored CID, replacing any it already has under the same keys.
+
+        Raises:
+            KeyError: If the backend does not have the CID
+        """
+
+    def entry(self, cid: str) -> Optional[Dict]:
+        """
+        The listing entry of a CID, or None if the backend does not have it.
+
+        The default scans `list`; backends that can look a CID up override this.
+        """
+        return next((e for e in self.list() if e["cid"] == cid), None)
+
+    def get_range(self, cid: str, start: int, end: int) -> bytes:
+        """
+        Read bytes `start` to `end`, inclusive, of a payload.
+
+        Backends that can read part of a payload override this; the default
+        reads all of it.
+
+        Raises:
+            KeyError: If the backend does not have the CID
+        """
+        return self.get(cid)[start:end + 1]
+
+    def put_file(self, path: str, name: str, content_type: str = "application/json",
+                 keyvalues: Optional[Dict] = None) -> str:
+        """
+        Store and pin a file from disk, returning its CID.
+
+        Backends that can stream the file override this; the default reads it
+        into memory and calls `put`.
+        """
+        with open(path, "rb") as f:
+            return self.put(f.read(), name, content_type, keyvalues)
+
+    def close(self) -> None:
+        """Release files and connections; the backend must not be used afterwards."""
+
+
+class MemoryBackend(StorageBackend):
+    """Process-local store, for tests and throwaway runs."""
+
+    def __init__(self):
+        self._blobs: Dict[str, bytes] = {}
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def list(self, limit: Optional[int] = None, keyvalues: Optional[Dict] = None) -> List[Dict]:
+        with self._lock:
+            entries = [e for e in reversed(self._entries.values()) if _matches(e, keyvalues)]
+        return entries[:limit] if limit else entries
+
+    def entry(self, cid: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(cid)
+        return dict(entry, keyvalues=dict(entry["keyvalues"])) if entry is not None else None
+
+    def get(self, cid: str, parse: Optional[Callable[[bytes], Any]] = None) -> Any:
+        with self._lock:
+            data = self._blobs[cid]
+        return parse(data) if parse is not None else data
+
+    def put(self, data: bytes, name: str, content_type: str = "application/json",
+            keyvalues: Optional[Dict] = None, cid: Optional[str] = None) -> str:
+        cid = cid or content_id(data)
+        with self._lock:
+            self._blobs[cid] = data
+            self._entries.pop(cid, None)
+            self._entries[cid] = _entry(cid, name, keyvalues, time.time())
+        return cid
+
+    def pin(self, cid: str) -> None:
+        with self._lock:
+            if cid not in self._blobs:
+                raise KeyError(cid)
+
+    def unpin(self, cid: str) -> None:
+        with self._lock:
+            self._blobs.pop(cid, None)
+            self._entries.pop(cid, None)
+
+    def tag(self, cid: str, keyvalues: Dict) -> None:
+        with self._lock:
+            self._entries[cid]["keyvalues"].update(keyvalues)
+
+
+_LOCAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pins (
+    cid TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    name TEXT NOT NULL,
+    content_type TEXT NOT NULL,
+    keyvalues TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pins_created ON pins (created_at);
+"""
+
+
+class LocalBackend(StorageBackend):
+    """
+    Content-addressed store on local disk.
+
+    Payloads live once under blobs/<aa>/<sha256>, written atomically, and a
+    SQLite index maps CIDs and their metadata onto them. A payload cached
+    under a remote CID shares its blob with the same payload stored locally.
+    """
+
+    def __init__(self, root: str = STORAGE_LOCAL_DIR):
+        self.root = root
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_LOCAL_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.root, "blobs", digest[:2], digest)
+
+    def list(self, limit: Optional[int] = None, keyvalues: Optional[Dict] = None) -> List[Dict]:
+        sql = "SELECT cid, name, keyvalues, created_at FROM pins"
+        params = []
+        for key, value in (keyvalues or {}).items():
+            sql += " AND" if params else " WHERE"
+            sql += " json_extract(keyvalues, ?) = ?"
+            params.extend((f'$."{key}"', str(value)))
+        sql += " ORDER BY created_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_entry(cid, name, json.loads(keyvalues), created_at) for cid, name, keyvalues, created_at in rows]
+
+    def entry(self, cid: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT name, keyvalues, created_at FROM pins WHERE cid = ?",
+                                     (cid,)).fetchone()
+        return _entry(cid, row[0], json.loads(row[1]), row[2]) if row is not None else None
+
+    def get(self, cid: str, parse: Optional[Callable[[bytes], Any]] = None) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM pins WHERE cid = ?", (cid,)).fetchone()
+        if row is None:
+            raise KeyError(cid)
+        try:
+            with open(self._blob_path(row[0]), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise KeyError(cid)
+        return parse(data) if parse is not None else data
+
+    def get_range(self, cid: str, start: int, end: int) -> bytes:
+        with self._lock:
+            row = self._conn.execute("SELECT digest FROM pins WHERE cid = ?", (cid,)).fetchone()
+        if row is None:
+            raise KeyError(cid)
+        try:
+            with open(self._blob_path(row[0]), "rb") as f:
+                f.seek(start)
+                return f.read(end + 1 - start)
+        except FileNotFoundError:
+            raise KeyError(cid)
+
+    def put(self, data: bytes, name: str, content_type: str = "application/json",
+            keyvalues: Optional[Dict] = None, cid: Optional[str] = None,
+            created_at: Optional[float] = None) -> str:
+        return self._store(io.BytesIO(data), name, content_type, keyvalues, cid, created_at)
+
+    def put_file(self, path: str, name: str, content_type: str = "application/json",
+                 keyvalues: Optional[Dict] = None, cid: Optional[str] = None,
+                 created_at: Optional[float] = None) -> str:
+        with open(path, "rb") as f:
+            return self._store(f, name, content_type, keyvalues, cid, created_at)
+
+    def _store(self, source, name: str, content_type: str, keyvalues: Optional[Dict],
+               cid: Optional[str], created_at: Optional[float]) -> str:
+        """Copy `source` into a blob, hashing it on the way, and index it."""
+        blobs = os.path.join(self.root, "blobs")
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=blobs)
+        try:
+            hasher = hashlib.sha256()
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter(lambda: source.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            digest = hasher.hexdigest()
+            path = self._blob_path(digest)
+            if os.path.exists(path):
+                # Blobs are immutable, so the existing one holds the same bytes
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        cid = cid or _cid_for_digest(hasher.digest())
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pins (cid, digest, name, content_type, keyvalues, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cid, digest, name, content_type, json.dumps(keyvalues or {}),
+                 time.time() if created_at is None else created_at)
+            )
+        return cid
+
+    def pin(self, cid: str) -> None:
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM pins WHERE cid = ?", (cid,)).fetchone() is None:
+                raise KeyError(cid)
+
+    def unpin(self, cid: str) -> None:
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT digest FROM pins WHERE cid = ?", (cid,)).fetchone()
+            if row is None:
+                return
+            self._conn.execute("DELETE FROM pins WHERE cid = ?", (cid,))
+            # The blob may still be shared with the same payload under another CID
+            shared = self._conn.execute("SELECT 1 FROM pins WHERE digest = ?", (row[0],)).fetchone()
+        if shared is None and os.path.exists(self._blob_path(row[0])):
+            os.remove(self._blob_path(row[0]))
+
+    def tag(self, cid: str, keyvalues: Dict) -> None:
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT keyvalues FROM pins WHERE cid = ?", (cid,)).fetchone()
+            if row is None:
+                raise KeyError(cid)
+            merged = dict(json.loads(row[0]), **keyvalues)
+            self._conn.execute("UPDATE pins SET keyvalues = ? WHERE cid = ?", (json.dumps(merged), cid))
+
+
+class _MultipartFile:
+    """
+    File-like multipart/form-data body that reads the file part from disk as it
+    is sent, so an upload never holds the whole file in memory.
+    """
+
+    def __init__(self, path: str, name: str, content_type: str, fields: Optional[Dict[str, str]] = None):
+        self.boundary = uuid.uuid4().hex
+        head = b""
+        for key, value in (fields or {}).items():
+            head += (f"--{self.boundary}\r\nContent-Disposition: form-data; name=\"{key}\"\r\n\r\n"
+                     f"{value}\r\n").encode("utf-8")
+        head += (f"--{self.boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{name}\"\r\n"
+                 f"Content-Type: {content_type}\r\n\r\n").encode("utf-8")
+        tail = f"\r\n--{self.boundary}--\r\n".encode("utf-8")
+        self._parts = [io.BytesIO(head), open(path, "rb"), io.BytesIO(tail)]
+        self._len = len(head) + os.path.getsize(path) + len(tail)
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return self._len
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            chunk = self._parts[0].read(size)
+            if not chunk:
+                self._parts.pop(0).close()
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b"".join(chunks)
+
+    def close(self) -> None:
+        for part in self._parts:
+            part.close()
+        self._parts = []
+
+
+class PinataBackend(StorageBackend):
+    """Pinata pinning API for writes and listing, IPFS gateways for reads."""
+
+    def __init__(self, jwt_token: str):
+        self.headers = {"Authorization": f"Bearer {jwt_token}"}
+        self.session = requests.Session()
+
+    def list(self, limit: Optional[int] = None, keyvalues: Optional[Dict] = None) -> List[Dict]:
+        page_limit = min(limit or PINATA_PAGE_LIMIT, PINATA_PAGE_LIMIT)
+        params = {"status": "pinned", "pageLimit": page_limit}
+        if keyvalues:
+            # Filtered by Pinata, so pins that do not match are never listed
+            params["metadata[keyvalues]"] = json.dumps(
+                {k: {"value": str(v), "op": "eq"} for k, v in keyvalues.items()}
+            )
+        entries = []
+        while True:
+            params["pageOffset"] = len(entries)
+            rows = self._pin_list(params)
+            entries.extend(rows)
+            if len(rows) < page_limit or (limit and len(entries) >= limit):
+                break
+        return entries[:limit] if limit else entries
+
+    def entry(self, cid: str) -> Optional[Dict]:
+        rows = self._pin_list({"status": "pinned", "hashContains": cid, "pageLimit": 1})
+        return rows[0] if rows and rows[0]["cid"] == cid else None
+
+    def _pin_list(self, params: Dict) -> List[Dict]:
+        """One page of pinList, as entries."""
+        response = self.session.get(f"{PINATA_API_URL}/data/pinList", headers=self.headers,
+                                    params=params, timeout=timeout_for(PINATA_TIMEOUT))
+        response.raise_for_status()
+        entries = []
+        for row in response.json().get("rows", []):
+            metadata = row.get("metadata") or {}
+            entries.append(_entry(row.get("ipfs_pin_hash"), metadata.get("name") or "",
+                                  metadata.get("keyvalues"), row.get("date_pinned")))
+        return entries
+
+    def get(self, cid: str, parse: Optional[Callable[[bytes], Any]] = None) -> Any:
+        # Hedged across IPFS_GATEWAYS; a response `parse` rejects loses the race
+        if parse is None:
+            return GATEWAY_POOL.fetch(cid)[0]
+        return GATEWAY_POOL.fetch(cid, parse=lambda body, content_type: parse(body))
+
+    def get_range(self, cid: str, start: int, end: int) -> bytes:
+        return GATEWAY_POOL.fetch(cid, byte_range=(start, end))[0]
+
+    def put(self, data: bytes, name: str, content_type: str = "application/json",
+            keyvalues: Optional[Dict] = None) -> str:
+        metadata = {"name": name, "keyvalues": keyvalues or {}}
+        response = self.session.post(
+            f"{PINATA_API_URL}/pinning/pinFileToIPFS", headers=self.headers,
+            files={"file": (name, data, content_type)},
+            data={"pinataMetadata": json.dumps(metadata)},
+            timeout=timeout_for(PINATA_TIMEOUT)
+        )
+        response.raise_for_status()
+        return response.json()["IpfsHash"]
+
+    def put_file(self, path: str, name: str, content_type: str = "application/json",
+                 keyvalues: Optional[Dict] = None) -> str:
+        metadata = {"name": name, "keyvalues": keyvalues or {}}
+        body = _MultipartFile(path, name, content_type, {"pinataMetadata": json.dumps(metadata)})
+        try:
+            response = self.session.post(
+                f"{PINATA_API_URL}/pinning/pinFileToIPFS",
+                headers=dict(self.headers, **{"Content-Type": body.content_type}),
+                data=body, timeout=timeout_for(PINATA_TIMEOUT)
+            )
+        finally:
+            body.close()
+        response.raise_for_status()
+        return response.json()["IpfsHash"]
+
+    def pin(self, cid: str) -> None:
+        response = self.session.post(f"{PINATA_API_URL}/pinning/pinByHash", headers=self.headers,
+                                     json={"hashToPin": cid}, timeout=timeout_for(PINATA_TIMEOUT))
+        response.raise_for_status()
+
+    def unpin(self, cid: str) -> None:
+        response = self.session.delete(f"{PINATA_API_URL}/pinning/unpin/{cid}", headers=self.headers,
+                                       timeout=timeout_for(PINATA_TIMEOUT))
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    def tag(self, cid: str, keyvalues: Dict) -> None:
+        # Pinata merges the given keyvalues into the pin's existing ones
+        response = self.session.put(f"{PINATA_API_URL}/pinning/hashMetadata", headers=self.headers,
+                                    json={"ipfsPinHash": cid, "keyvalues": keyvalues},
+                                    timeout=timeout_for(PINATA_TIMEOUT))
+        if response.status_code == 404:
+            raise KeyError(cid)
+        response.raise_for_status()
+
+
+class TieredBackend(StorageBackend):
+    """
+    Local store in front of a remote one.
+
+    Reads are served from the local tier and fall back to the remote tier,
+    caching what they fetch. With `write_through` every write is uploaded
+    before it returns and cached locally under the remote CID; without it
+    writes stay local and the remote tier is only read from.
+    """
+
+    def __init__(self, local: LocalBackend, remote: StorageBackend, write_through: bool = True):
+        self.local = local
+        self.remote = remote
+        self.write_through = write_through
+
+    def list(self, limit: Optional[int] = None, keyvalues: Optional[Dict] = None) -> List[Dict]:
+        entries = self.local.list(limit, keyvalues)
+        try:
+            remote_entries = self.remote.list(limit, keyvalues)
+        except Exception as e:
+            logger.warning("Remote listing failed, serving local entries only: %s", e)
+            return entries
+        seen = {e["cid"] for e in entries}
+        entries.extend(e for e in remote_entries if e["cid"] not in seen)
+        # Both tiers list newest first, but the merge has to be re-sorted
+        entries.sort(key=lambda e: e["created_at"], reverse=True)
+        return entries[:limit] if limit else entries
+
+    def entry(self, cid: str) -> Optional[Dict]:
+        return self.local.entry(cid) or self.remote.entry(cid)
+
+    def get(self, cid: str, parse: Optional[Callable[[bytes], Any]] = None) -> Any:
+        try:
+            return self.local.get(cid, parse)
+        except KeyError:
+            pass
+        value, data = self.remote.get(cid, lambda body: (parse(body) if parse is not None else body, body))
+        # Cached with the remote pin's name, tags and date, so filtered listings
+        # and the tag backfill see the local copy like the remote one
+        try:
+            remote_entry = self.remote.entry(cid)
+        except Exception as e:
+            logger.warning("Could not read the metadata of %s, caching it untagged: %s", cid, e)
+            remote_entry = None
+        if remote_entry is None:
+            self.local.put(data, cid, storage_format.content_type_for(data), cid=cid)
+        else:
+            self.local.put(data, remote_entry["name"] or cid, storage_format.content_type_for(data),
+                           remote_entry["keyvalues"], cid=cid, created_at=remote_entry["created_at"])
+        return value
+
+    def get_range(self, cid: str, start: int, end: int) -> bytes:
+        try:
+            return self.local.get_range(cid, start, end)
+        except KeyError:
+            return self.remote.get_range(cid, start, end)
+
+    def put(self, data: bytes, name: str, content_type: str = "application/json",
+            keyvalues: Optional[Dict] = None) -> str:
+        cid = None
+        if self.write_through:
+            cid = self.remote.put(data, name, content_type, keyvalues)
+        return self.local.put(data, name, content_type, keyvalues, cid=cid)
+
+    def put_file(self, path: str, name: str, content_type: str = "application/json",
+                 keyvalues: Optional[Dict] = None) -> str:
+        cid = None
+        if self.write_through:
+            cid = self.remote.put_file(path, name, content_type, keyvalues)
+        return self.local.put_file(path, name, content_type, keyvalues, cid=cid)
+
+    def pin(self, cid: str) -> None:
+        if self.write_through:
+            self.remote.pin(cid)
+        else:
+            self.local.pin(cid)
+
+    def unpin(self, cid: str) -> None:
+        if self.write_through:
+            self.remote.unpin(cid)
+        self.local.unpin(cid)
+
+    def tag(self, cid: str, keyvalues: Dict) -> None:
+        # The pin may live in either tier, e.g. remote pins never read through here
+        tagged = False
+        if self.write_through:
+            try:
+                self.remote.tag(cid, keyvalues)
+                tagged = True
+            except KeyError:
+                pass
+        try:
+            self.local.tag(cid, keyvalues)
+        except KeyError:
+            if not tagged:
+                raise
+
+    def close(self) -> None:
+        self.local.close()
+
+
+def create_backend(name: Optional[str] = None, jwt_token: Optional[str] = None) -> StorageBackend:
+    """
+    Build the storage backend selected by STORAGE_BACKEND.
+
+    Args:
+        name (str, optional): Overrides STORAGE_BACKEND
+        jwt_token (str, optional): Pinata JWT, needed by "pinata" and "tiered"
+
+    Returns:
+        StorageBackend: The configured backend
+    """
+    name = name or STORAGE_BACKEND
+    if name == "memory":
+        return MemoryBackend()
+    if name == "local":
+        return LocalBackend()
+    if name not in ("pinata", "tiered"):
+        raise ValueError(f"Unknown storage backend {name!r}")
+    if not jwt_token:
+        raise ValueError(f"Storage backend {name!r} needs a Pinata JWT. Set PINATA_JWT in the environment "
+                         "or .env file, or pick another STORAGE_BACKEND.")
+    if name == "pinata":
+        return PinataBackend(jwt_token)
+    return TieredBackend(LocalBackend(), PinataBackend(jwt_token), write_through=STORAGE_WRITE_THROUGH)
@@ -0,0 +1,134 @@
+import os
+import json
+import gzip
+import zlib
+import logging
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, zlib is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# "compact" writes the framed compressed format, "json" plain minified JSON
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "compact")
+# Codec compact payloads are written with: "zlib", which every reader can
+# decode, or "zstd", which only readers with the zstandard package can. Only
+# opt into zstd once every front end and worker has it installed.
+STORAGE_CODEC = os.getenv("STORAGE_CODEC", "zlib")
+
+COMPACT_CONTENT_TYPE = "application/vnd.edu.compact"
+JSON_CONTENT_TYPE = "application/json"
+
+# Framed payload: MAGIC, codec byte, dictionary id byte, compressed body
+MAGIC = b"\x93EDU"
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Shared dictionary of the keys and values that repeat in every question and
+# response record. Both codecs prime their window with it, which is what makes
+# single small records compress well. Never edit a published dictionary; add a
+# new id instead so existing pins stay readable.
+DICTIONARIES = {
+    1: (
+        b'{"timestamp":"","subject":"Mathematics","difficulty":"Medium","correct":false,"user_id":"'
+        b'{"timestamp":"","subject":"Reading","difficulty":"Hard","correct":true,"question":"'
+        b'{"timestamp":"","subject":"Science","difficulty":"Easy","correct":true,"context":"'
+        b'"category":"English","difficulty":"N/A","explanation":"The correct answer is '
+        b'"options":{"A":"","B":"","C":"","D":""},"correct_option":"B","explanation":"'
+        b'{"context":"Read the following passage","question":"Which of the following best '
+        b'"category":"Math","category":"Reading","category":"Science","category":"English",'
+        b'"options":{"A":"","B":"","C":"","D":""},"correct_option":"A","explanation":"Because the passage '
+        b'{"context":"","question":"What is the value of ","options":{"A":"","B":"","C":"","D":""},'
+    ),
+}
+DEFAULT_DICTIONARY_ID = 1
+
+
+if STORAGE_CODEC == "zstd" and zstandard is None:
+    logger.warning("STORAGE_CODEC=zstd but the zstandard package is not installed; writing zlib")
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode(obj: Any, storage_format: Optional[str] = None) -> bytes:
+    """
+    Serialize an object for storage or pinning.
+
+    Args:
+        obj: JSON-serializable value
+        storage_format (str): "compact" or "json", defaults to STORAGE_FORMAT
+
+    Returns:
+        bytes: The encoded payload
+    """
+    raw = _dumps(obj)
+    if (storage_format or STORAGE_FORMAT) != "compact":
+        return raw
+    dict_id = DEFAULT_DICTIONARY_ID
+    dictionary = DICTIONARIES[dict_id]
+    if STORAGE_CODEC == "zstd" and zstandard is not None:
+        compressor = zstandard.ZstdCompressor(
+            level=9, dict_data=zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT))
+        return MAGIC + CODEC_ZSTD + bytes((dict_id,)) + compressor.compress(raw)
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=dictionary)
+    return MAGIC + CODEC_ZLIB + bytes((dict_id,)) + compressor.compress(raw) + compressor.flush()
+
+
+def decode(data: bytes, content_type: Optional[str] = None) -> Any:
+    """
+    Decode a payload written by encode, or a legacy plain/gzip/zstd JSON payload.
+
+    The format is detected from the payload itself; `content_type` is only
+    consulted for gzip payloads served with a Content-Encoding the client
+    did not undo.
+    """
+    if data.startswith(MAGIC):
+        codec, dict_id, body = data[4:5], data[5], data[6:]
+        dictionary = DICTIONARIES.get(dict_id)
+        if dictionary is None:
+            raise ValueError(f"Unknown storage dictionary id {dict_id}")
+        if codec == CODEC_ZLIB:
+            decompressor = zlib.decompressobj(-15, zdict=dictionary)
+            return _loads(decompressor.decompress(body) + decompressor.flush())
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise ValueError("Payload is zstd-compressed but the zstandard package is not installed")
+            decompressor = zstandard.ZstdDecompressor(
+                dict_data=zstandard.ZstdCompressionDict(dictionary, dict_type=zstandard.DICT_TYPE_RAWCONTENT))
+            return _loads(decompressor.decompress(body, max_output_size=64 * len(body) + (1 << 20)))
+        raise ValueError(f"Unknown storage codec {codec!r}")
+    if data.startswith(_GZIP_MAGIC) or (content_type or "").endswith("gzip"):
+        return _loads(gzip.decompress(data))
+    if data.startswith(_ZSTD_MAGIC) and zstandard is not None:
+        return _loads(zstandard.ZstdDecompressor().decompress(data, max_output_size=1 << 28))
+    return _loads(data)
+
+
+def content_type_for(data: bytes) -> str:
+    """Content type to upload an encoded payload with."""
+    return COMPACT_CONTENT_TYPE if data.startswith(MAGIC) else JSON_CONTENT_TYPE
+
+
+def file_extension_for(data: bytes) -> str:
+    return ".edu" if data.startswith(MAGIC) else ".json"
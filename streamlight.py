@@ -1,8 +1,12 @@
 import streamlit as st
-import requests
 import json
+import requests
 from typing import Dict, List, Optional
 from math import ceil
+from question_model import Question, coerce_question, group_by_context
+from question_display import display_passage
+from transport import TransportError, GeneratorUnavailable, default_transport
+from prefetch import prefetch_key, invalidate_stale, start_prefetch, take_prefetched
 
 # Initialize session state for questions and current page
 if 'questions' not in st.session_state:
@@ -12,15 +16,15 @@ if 'current_page' not in st.session_state:
     st.session_state.current_page = 'main'  # Default to main page
 
 
-def display_question_card(question: Dict, index: int, container) -> None:
+def display_question_card(question: Question, index: int, container, show_context: bool = True) -> None:
     """Display an individual question card with interactive elements."""
     try:
         # Extract necessary details
-        category = question.get('category', 'Unknown')
-        difficulty = question.get('difficulty', 'Unknown')
-        context = question.get('context', '').strip()
-        question_text = question.get('question', '')
-        options = question.get('options', {})
+        category = question.category.value
+        difficulty = question.difficulty.value
+        context = question.context
+        question_text = question.question
+        options = question.options
 
         # Start container
         with container:
@@ -36,8 +40,8 @@ def display_question_card(question: Dict, index: int, container) -> None:
                     <strong>Difficulty:</strong> {difficulty}</p>
             """, unsafe_allow_html=True)
 
-            # Display context if available
-            if context:
+            # Display context if available and not already shown for its passage
+            if context and show_context:
                 st.markdown("**Context:**")
                 st.markdown(f"*{context}*")
 
@@ -53,12 +57,12 @@ def display_question_card(question: Dict, index: int, container) -> None:
 
                 # Submit button
                 if st.button("Submit Answer", key=f"submit_{index}"):
-                    correct_answer = question.get('correct_option')
+                    correct_answer = question.correct_option
                     if selected_letter == correct_answer:
                         st.success("✅ Correct!")
                     else:
                         st.error(f"❌ Incorrect. The correct answer is {correct_answer}")
-                    st.info(f"**Explanation:** {question.get('explanation', 'No explanation provided.')}")
+                    st.info(f"**Explanation:** {question.explanation or 'No explanation provided.'}")
             else:
                 st.error("Invalid question format")
 
@@ -70,8 +74,8 @@ def display_question_card(question: Dict, index: int, container) -> None:
         st.write("Raw question data:", question)
 
 
-def display_questions_grid(questions: List[Dict]) -> None:
-    """Display questions in a 2-column grid layout"""
+def display_questions_grid(questions: List[Question]) -> None:
+    """Display questions in a 2-column grid layout, each shared passage once above its questions"""
     # Add CSS for better spacing
     st.markdown("""
         <style>
@@ -84,44 +88,55 @@ def display_questions_grid(questions: List[Dict]) -> None:
         </style>
     """, unsafe_allow_html=True)
 
-    num_questions = len(questions)
-    num_rows = ceil(num_questions / 2)
+    offset = 0
+    for context_id, group in group_by_context(questions):
+        # A passage shared by several questions is shown once, above them
+        shared = context_id is not None and len(group) > 1
+        if shared:
+            display_passage(group[0])
 
-    for row in range(num_rows):
-        col1, col2 = st.columns(2)
+        num_questions = len(group)
+        num_rows = ceil(num_questions / 2)
 
-        first_idx = row * 2
-        if first_idx < num_questions:
-            with col1:
-                display_question_card(questions[first_idx], first_idx, col1)
+        for row in range(num_rows):
+            col1, col2 = st.columns(2)
 
-        second_idx = row * 2 + 1
-        if second_idx < num_questions:
-            with col2:
-                display_question_card(questions[second_idx], second_idx, col2)
+            first_idx = row * 2
+            if first_idx < num_questions:
+                with col1:
+                    display_question_card(group[first_idx], offset + first_idx, col1, show_context=not shared)
 
+            second_idx = row * 2 + 1
+            if second_idx < num_questions:
+                with col2:
+                    display_question_card(group[second_idx], offset + second_idx, col2, show_context=not shared)
+        offset += num_questions
 
-def generate_questions(personal_data: Dict, regional_data: Dict) -> Optional[List[Dict]]:
-    """Make API call to generate questions"""
-    try:
-        response = requests.post(
-            "http://localhost:5000/generate-questions",
-            json={
-                "user_results": personal_data,
-                "regional_results": regional_data
-            },
-            headers={"Content-Type": "application/json"}
-        )
-
-        if response.status_code == 200:
-            return response.json().get('questions', [])
-        else:
-            st.error(f"API Error: {response.json().get('message', 'Unknown error')}")
-            return None
 
-    except requests.exceptions.ConnectionError:
+def fetch_questions(personal_data: Dict, regional_data: Dict) -> List[Question]:
+    """
+    Generate questions through the configured transport. Safe to run off the script thread.
+
+    Raises:
+        TransportError: If generation failed or the backend is unreachable
+    """
+    raw_questions = default_transport().generate(personal_data, regional_data)
+    return [q for q in map(coerce_question, raw_questions) if q is not None]
+
+
+def generate_questions(personal_data: Dict, regional_data: Dict) -> Optional[List[Question]]:
+    """Make API call to generate questions, serving a prefetched set when one is ready"""
+    questions = take_prefetched(st.session_state, prefetch_key(personal_data, regional_data))
+    if questions:
+        return questions
+    try:
+        return fetch_questions(personal_data, regional_data)
+    except GeneratorUnavailable:
         st.error("Could not connect to the backend server. Please make sure it's running.")
         return None
+    except TransportError as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Error generating questions: {str(e)}")
         return None
@@ -184,6 +199,9 @@ def main():
                 "English": st.slider("English", 0, 36, 13, key="p_english")
             }
 
+        # A prefetched set is only good for the sliders it was made with
+        invalidate_stale(st.session_state, prefetch_key(personal_data, regional_data))
+
         # Generate questions button
         st.markdown("---")
         if st.button("Generate Questions", type="primary", use_container_width=True):
@@ -197,6 +215,9 @@ def main():
         if st.session_state.questions:
             st.markdown("## Practice Questions")
             display_questions_grid(st.session_state.questions)
+            # Generate the next set while this one is being answered
+            start_prefetch(st.session_state, prefetch_key(personal_data, regional_data),
+                           fetch_questions, personal_data, regional_data)
 
             if st.button("Reset All Answers", use_container_width=True):
                 # Clear answers from session state
@@ -211,14 +232,16 @@ def main():
 
         # Backend status in sidebar
     try:
-        health_response = requests.get("http://localhost:5000/health")
-        if health_response.status_code == 200:
+        if default_transport().health():
             st.sidebar.success("Backend: Connected")
         else:
             st.sidebar.error("Backend: Error")
-    except Exception as e:
+    except GeneratorUnavailable as e:
         print(e)
         st.sidebar.error("Backend: Not Connected")
+    except (TransportError, requests.exceptions.RequestException, ValueError) as e:
+        print(e)
+        st.sidebar.error("Backend: Error")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+import os
+import math
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from question_model import Category, Difficulty, normalize_category, normalize_difficulty
+
+STUDENT_STATE_PATH = os.getenv("STUDENT_STATE_PATH", "data/student_state.db")
+
+SUBJECTS = (Category.ENGLISH, Category.MATH, Category.READING, Category.SCIENCE)
+
+# Item difficulty on the ability (logit) scale
+DIFFICULTY_LOGITS = {
+    Difficulty.EASY: -1.0,
+    Difficulty.MEDIUM: 0.0,
+    Difficulty.HARD: 1.0,
+    Difficulty.UNKNOWN: 0.0,
+}
+# Learning rate shrinks with attempts but never below the floor
+K_INITIAL = 0.6
+K_FLOOR = 0.15
+# Weight of the newest answer in the recent-accuracy average
+RECENT_ALPHA = 0.2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ability (
+    user_id TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    ability REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0,
+    recent_accuracy REAL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, subject)
+);
+"""
+
+
+def expected_score(ability: float, difficulty: Difficulty) -> float:
+    """Probability of a correct answer under a one-parameter logistic (Rasch) model."""
+    return 1.0 / (1.0 + math.exp(DIFFICULTY_LOGITS[difficulty] - ability))
+
+
+class StudentStateStore:
+    """
+    Compact per-student, per-subject ability state.
+
+    Each answer updates one row in constant time with an Elo-style step on a
+    Rasch ability estimate, so reading a student's state never requires their
+    answer history.
+    """
+
+    def __init__(self, path: str = STUDENT_STATE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def record_answer(self, user_id: str, subject, difficulty, is_correct: bool) -> Dict:
+        """
+        Fold one answer into the student's state for that subject.
+
+        Args:
+            user_id (str): Student identifier
+            subject: Subject name or Category
+            difficulty: Difficulty name or Difficulty
+            is_correct (bool): Whether the answer was correct
+
+        Returns:
+            Dict: The updated record
+        """
+        subject = normalize_category(subject)
+        difficulty = normalize_difficulty(difficulty)
+        outcome = 1.0 if is_correct else 0.0
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT ability, attempts, correct, recent_accuracy FROM ability WHERE user_id = ? AND subject = ?",
+                (user_id, subject.value)
+            ).fetchone()
+            ability, attempts, correct, recent = row if row else (0.0, 0, 0, None)
+
+            k = max(K_FLOOR, K_INITIAL / math.sqrt(1 + attempts))
+            ability += k * (outcome - expected_score(ability, difficulty))
+            attempts += 1
+            correct += int(is_correct)
+            recent = outcome if recent is None else recent + RECENT_ALPHA * (outcome - recent)
+
+            self._conn.execute(
+                "INSERT INTO ability (user_id, subject, ability, attempts, correct, recent_accuracy, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, subject) DO UPDATE SET ability = excluded.ability, "
+                "attempts = excluded.attempts, correct = excluded.correct, "
+                "recent_accuracy = excluded.recent_accuracy, updated_at = excluded.updated_at",
+                (user_id, subject.value, ability, attempts, correct, recent, time.time())
+            )
+        return {"ability": ability, "attempts": attempts, "correct": correct, "recent_accuracy": recent}
+
+    def state_vector(self, user_id: str) -> Dict[str, Dict]:
+        """
+        Return the fixed-size state for every subject, with defaults for
+        subjects the student has not practised yet.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT subject, ability, attempts, recent_accuracy FROM ability WHERE user_id = ?",
+                (user_id,)
+            ).fetchall()
+        found = {subject: (ability, attempts, recent) for subject, ability, attempts, recent in rows}
+        state = {}
+        for subject in SUBJECTS:
+            ability, attempts, recent = found.get(subject.value, (0.0, 0, None))
+            state[subject.value] = {
+                "ability": round(ability, 2),
+                "attempts": attempts,
+                "recent_accuracy": None if recent is None else round(recent, 2),
+            }
+        return state
+
+    def weakest_subjects(self, user_id: str, count: Optional[int] = None):
+        """Subjects ordered from lowest to highest ability estimate."""
+        state = self.state_vector(user_id)
+        ranked = sorted(state, key=lambda s: state[s]["ability"])
+        return ranked[:count] if count else ranked
@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+# Everything the app writes goes to a scratch directory, and nothing reaches
+# Pinata or a model provider; set before any repo module reads its config
+_SCRATCH = tempfile.mkdtemp(prefix="act-tests-")
+for key, value in {
+    "STORAGE_BACKEND": "memory",
+    "STORAGE_LOCAL_DIR": os.path.join(_SCRATCH, "ipfs"),
+    "SHARED_CACHE_PATH": os.path.join(_SCRATCH, "shared_cache.db"),
+    "QUESTION_BANK_ENABLED": "0",
+    "QUESTION_BANK_PATH": os.path.join(_SCRATCH, "question_bank.db"),
+    "STUDENT_STATE_PATH": os.path.join(_SCRATCH, "student_state.db"),
+    "RESPONSE_STORE_DIR": os.path.join(_SCRATCH, "responses"),
+    "SAMBANOVA_API_KEY": "test-key",
+    "PINATA_JWT": "test-jwt",
+    "LOG_FORMAT": "text",
+    "LOG_LEVEL": "WARNING",
+}.items():
+    os.environ.setdefault(key, value)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+import app
+from admission import AdmissionController, Overloaded
+
+SCORES = {"English": 20, "Mathematics": 20, "Reading": 20, "Science": 20}
+
+
+def test_a_full_queue_is_shed_with_retry_after(monkeypatch):
+    monkeypatch.setattr(app, "ADMISSION", AdmissionController(max_in_flight=0, max_queue=0, queue_timeout=7))
+
+    response = app.app.test_client().post("/generate-questions",
+                                          json={"user_results": SCORES, "regional_results": SCORES})
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
+    assert response.get_json()["status"] == "error"
+
+
+def test_one_client_cannot_fill_the_queue():
+    admission = AdmissionController(max_in_flight=1, max_queue=8, max_queue_per_client=1, queue_timeout=5)
+    admitted = []
+
+    def wait_for_slot(client):
+        with admission.admit(client):
+            admitted.append(client)
+
+    with admission.admit("a"):
+        waiter = threading.Thread(target=wait_for_slot, args=("a",))
+        waiter.start()
+        while admission.metrics()["queued"] < 1:
+            time.sleep(0.01)
+        with pytest.raises(Overloaded, match="client queue full"):
+            with admission.admit("a"):
+                pass
+        other = threading.Thread(target=wait_for_slot, args=("b",))
+        other.start()
+        while admission.metrics()["queued"] < 2:
+            time.sleep(0.01)
+    waiter.join(5)
+    other.join(5)
+
+    assert admitted == ["a", "b"]
+    assert admission.metrics()["shed"] == 1
+
+
+def test_waiting_past_the_timeout_is_shed():
+    admission = AdmissionController(max_in_flight=1, queue_timeout=0.05)
+    with admission.admit("a"):
+        with pytest.raises(Overloaded, match="queue timeout") as shed:
+            with admission.admit("b"):
+                pass
+    assert shed.value.retry_after >= 1
+    assert admission.metrics()["queued"] == 0
+
+
+def client_id(headers, data=None):
+    with app.app.test_request_context("/", headers=headers, environ_base={"REMOTE_ADDR": "10.0.0.9"}):
+        return app.client_id(data)
+
+
+def test_client_id_is_only_trusted_with_the_secret(monkeypatch):
+    monkeypatch.setattr(app, "CLIENT_ID_SECRET", "s3cret")
+
+    assert client_id({"X-Client-Secret": "s3cret"}, {"user_id": "u1"}) == "user:u1"
+    assert client_id({"X-Client-Secret": "s3cret", "X-Client-Id": "ui-1"}) == "client:ui-1"
+    assert client_id({"X-Client-Secret": "guess", "X-Client-Id": "ui-1"}, {"user_id": "u1"}) == "10.0.0.9"
+    assert client_id({}, {"user_id": "u1"}) == "10.0.0.9"
+
+
+def test_client_id_without_a_secret_uses_the_address(monkeypatch):
+    monkeypatch.setattr(app, "CLIENT_ID_SECRET", "")
+
+    assert client_id({"X-Client-Secret": "", "X-Client-Id": "ui-1"}, {"user_id": "u1"}) == "10.0.0.9"
@@ -0,0 +1,105 @@
+import json
+import time
+
+import pytest
+
+import app
+from dedup import DuplicateIndex
+from llm_router import CompletionTimeout
+from question_model import Question
+from shared_cache import SharedCache
+from storage_backend import MemoryBackend, pin_metadata
+
+
+def make_question(category, n=0):
+    return {"context": f"A passage about topic {n} for {category}." if category in ("Reading", "English") else "",
+            "question": f"What is the answer to {category} question number {n}?",
+            "options": {"A": "one", "B": "two", "C": "three", "D": "four"},
+            "correct_option": "B", "explanation": "Because.", "category": category, "difficulty": "Medium"}
+
+
+FULL_SET = [make_question(c) for c in ("English", "Math", "Reading", "Science")]
+
+
+class SlowBackend(MemoryBackend):
+    """Memory backend whose reads take `delay` seconds each."""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.reads = 0
+
+    def get(self, cid, parse=None):
+        time.sleep(self.delay)
+        self.reads += 1
+        return super().get(cid, parse)
+
+
+class FakeRouter:
+    """Stands in for MODEL_ROUTER; records how much time the call was given."""
+
+    def __init__(self, content=None, error=None):
+        self.content = json.dumps(FULL_SET) if content is None else content
+        self.error = error
+        self.time_left = []
+
+    def complete(self, messages, max_tokens, subjects=(), difficulty=None, deadline=None, parse=None,
+                 temperature=0.7, prompt_id=None):
+        self.time_left.append(deadline - time.monotonic() if deadline is not None else None)
+        if self.error is not None:
+            raise self.error
+        return parse(self.content) if parse is not None else self.content
+
+
+@pytest.fixture
+def history(monkeypatch):
+    backend = SlowBackend(delay=0.1)
+    for i in range(50):
+        backend.put(json.dumps(make_question("Math", 1000 + i)).encode("utf-8"), f"q{i}.json",
+                    keyvalues=pin_metadata("question"))
+    monkeypatch.setattr(app, "STORAGE", backend)
+    monkeypatch.setattr(app, "PIN_LIST_CACHE", SharedCache(f"pin_list-{id(backend)}"))
+    monkeypatch.setattr(app, "DEDUP_INDEX", DuplicateIndex(threshold=app.DEDUP_THRESHOLD))
+    monkeypatch.setattr(app, "_history_loaded_at", None)
+    monkeypatch.setattr(app, "_history_cids", set())
+    return backend
+
+
+def test_history_load_leaves_most_of_the_deadline_for_generation(history, monkeypatch):
+    router = FakeRouter()
+    monkeypatch.setattr(app, "MODEL_ROUTER", router)
+
+    payload, status = app.generate_response({"user_results": {}, "regional_results": {}, "deadline_seconds": 1})
+
+    assert status == 200
+    assert 0 < history.reads < 50
+    assert router.time_left[0] > 0.5
+    assert sorted(q["category"] for q in payload["questions"]) == ["English", "Math", "Reading", "Science"]
+    assert "partial" not in payload
+    assert app._history_loaded_at is None
+
+
+def test_deadline_during_generation_serves_banked_and_received_questions(history, monkeypatch):
+    banked = Question.from_dict(make_question("Science", 7))
+    monkeypatch.setattr(app, "draw_from_bank", lambda user_results, user_id: [banked])
+    cut = json.dumps([make_question("Math", 8), make_question("Reading", 8)])[:-1]
+    monkeypatch.setattr(app, "MODEL_ROUTER", FakeRouter(error=CompletionTimeout("Deadline passed", cut)))
+    monkeypatch.setattr(app, "repair_questions", lambda questions, *args: questions)
+
+    payload, status = app.generate_response({"user_results": {}, "regional_results": {}, "deadline_seconds": 1})
+
+    assert status == 200
+    assert payload["partial"] is True
+    assert sorted(q["category"] for q in payload["questions"]) == ["Math", "Reading", "Science"]
+    assert not any("error" in q for q in payload["questions"])
+
+
+def test_router_timeout_without_content_is_partial_not_an_error_card(history, monkeypatch):
+    monkeypatch.setattr(app, "MODEL_ROUTER", FakeRouter(error=CompletionTimeout("No model answered before the deadline")))
+    monkeypatch.setattr(app, "repair_questions", lambda questions, *args: questions)
+
+    payload, status = app.generate_response({"user_results": {}, "regional_results": {}, "deadline_seconds": 1})
+
+    assert status == 200
+    assert payload["partial"] is True
+    assert payload["questions"] == []
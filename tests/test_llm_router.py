@@ -0,0 +1,104 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import llm_router
+from llm_router import CompletionRejected, CompletionTimeout, ModelBackend, ModelRouter
+
+
+class FakeClient:
+    """OpenAI-style client whose completions answer `content` after `delay` seconds, or raise `error`."""
+
+    def __init__(self, content="ok", delay=0.0, error=None):
+        self.content = content
+        self.delay = delay
+        self.error = error
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        self.calls = 0
+
+    def create(self, **request):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        message = SimpleNamespace(content=self.content)
+        usage = SimpleNamespace(completion_tokens=100, prompt_tokens=10)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def backend(name, client, prior_latency=1.0):
+    return ModelBackend(name, "fake", name, client, prior_latency=prior_latency)
+
+
+@pytest.fixture(autouse=True)
+def no_streaming(monkeypatch):
+    monkeypatch.setattr(llm_router, "LLM_STREAM", False)
+
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def test_breaker_opens_after_repeated_failures():
+    broken = backend("broken", FakeClient(error=RuntimeError("502")), prior_latency=0.1)
+    spare = backend("spare", FakeClient(), prior_latency=5.0)
+    router = ModelRouter([broken, spare])
+
+    for _ in range(llm_router.LLM_BREAKER_FAILURES):
+        with pytest.raises(RuntimeError):
+            broken.complete(MESSAGES, 100, 0.7, timeout=None)
+
+    assert not broken.stats.healthy
+    assert router.route(max_tokens=100) == [spare]
+    assert router.complete(MESSAGES, 100) == "ok"
+    assert broken.client.calls == llm_router.LLM_BREAKER_FAILURES
+
+
+def test_deadline_timeouts_do_not_trip_the_breaker():
+    slow = backend("slow", FakeClient(delay=0.05, error=RuntimeError("read timeout")))
+
+    for _ in range(llm_router.LLM_BREAKER_FAILURES):
+        with pytest.raises(RuntimeError):
+            slow.complete(MESSAGES, 100, 0.7, timeout=0.01)
+
+    assert slow.stats.healthy
+    assert slow.stats.failures == 0
+
+
+def test_race_returns_the_first_answer():
+    slow = backend("slow", FakeClient(content="slow", delay=1.0), prior_latency=1.0)
+    fast = backend("fast", FakeClient(content="fast"), prior_latency=2.0)
+    router = ModelRouter([slow, fast])
+
+    started = time.monotonic()
+    # The time left is under LLM_RACE_FACTOR predicted latencies, so both are called
+    answer = router.complete(MESSAGES, 1000, deadline=started + 1.2)
+
+    assert answer == "fast"
+    assert time.monotonic() - started < 1.0
+    assert slow.client.calls == 1
+
+
+def test_rejected_answers_fall_through_to_the_next_model():
+    garbled = backend("garbled", FakeClient(content="not json"), prior_latency=0.1)
+    good = backend("good", FakeClient(content="42"), prior_latency=5.0)
+    router = ModelRouter([garbled, good])
+
+    assert router.complete(MESSAGES, 100, parse=int) == 42
+
+    with pytest.raises(CompletionRejected) as rejected:
+        ModelRouter([garbled]).complete(MESSAGES, 100, parse=int)
+    assert rejected.value.content == "not json"
+
+
+def test_a_passed_deadline_raises_completion_timeout():
+    stalled = backend("stalled", FakeClient(delay=0.2, error=RuntimeError("read timeout")), prior_latency=0.01)
+    spare = backend("spare", FakeClient(), prior_latency=0.02)
+    router = ModelRouter([stalled, spare])
+
+    with pytest.raises(CompletionTimeout):
+        router.complete(MESSAGES, 100, deadline=time.monotonic() + 0.1)
+    assert spare.client.calls == 0
+
+    with pytest.raises(CompletionTimeout):
+        router.complete(MESSAGES, 100, deadline=time.monotonic() - 1)
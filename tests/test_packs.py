@@ -0,0 +1,47 @@
+import pytest
+
+import app
+import packs
+from shared_cache import SharedCache
+from storage_backend import LocalBackend, MemoryBackend
+
+
+RECORDS = [{"question": f"Question {i}?", "category": "Math"} for i in range(10)]
+
+
+@pytest.fixture(params=["memory", "local"])
+def backend(request, tmp_path):
+    backend = MemoryBackend() if request.param == "memory" else LocalBackend(str(tmp_path))
+    yield backend
+    backend.close()
+
+
+def test_pack_round_trip_reads_only_the_requested_records(backend):
+    uploaded = packs.upload_pack(backend, iter(RECORDS), name="set")
+    manifest = packs.fetch_manifest(backend, uploaded["manifest_cid"])
+
+    assert uploaded["count"] == manifest["count"] == 10
+    assert manifest["data_cid"] == uploaded["data_cid"]
+    assert packs.read_records(backend, manifest, [3, 4, -1, 0]) == [RECORDS[3], RECORDS[4], RECORDS[9], RECORDS[0]]
+    with pytest.raises(IndexError):
+        packs.read_records(backend, manifest, [10])
+
+
+def test_local_backend_range_reads_from_disk(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    path = tmp_path / "payload.bin"
+    path.write_bytes(b"0123456789")
+
+    cid = backend.put_file(str(path), "payload.bin", "application/octet-stream")
+
+    assert backend.get(cid) == b"0123456789"
+    assert backend.get_range(cid, 2, 5) == b"2345"
+    assert cid == backend.put(b"0123456789", "again.bin")
+
+
+def test_history_reads_packed_records(monkeypatch):
+    backend = MemoryBackend()
+    packs.upload_pack(backend, RECORDS, name="history")
+    monkeypatch.setattr(app, "PIN_LIST_CACHE", SharedCache(f"pin_list-{id(backend)}"))
+
+    assert app.get_stored_questions(backend) == RECORDS
@@ -0,0 +1,20 @@
+import pytest
+
+from question_model import Question
+
+RAW = {"context": "", "question": "What is 2 + 2?", "options": {"A": "3", "B": "4", "C": "5", "D": "6"},
+       "correct_option": "B", "explanation": "Addition.", "category": "Math", "difficulty": "Easy"}
+
+
+def test_to_dict_does_not_expose_the_options():
+    question = Question.from_dict(RAW)
+
+    question.to_dict()["options"]["B"] = "5"
+
+    assert question.options["B"] == "4"
+
+
+def test_questions_compare_by_value_but_are_unhashable():
+    assert Question.from_dict(RAW) == Question.from_dict(dict(RAW))
+    with pytest.raises(TypeError):
+        hash(Question.from_dict(RAW))
@@ -0,0 +1,38 @@
+import pytest
+
+import app
+from student_state import StudentStateStore
+
+
+@pytest.fixture
+def client(monkeypatch):
+    store = StudentStateStore(":memory:")
+    monkeypatch.setattr(app, "STUDENT_STATE", store)
+    yield app.app.test_client()
+    store.close()
+
+
+def answer(**fields):
+    body = {"user_id": "u1", "subject": "Math", "difficulty": "Medium", "correct": True}
+    body.update(fields)
+    return body
+
+
+@pytest.mark.parametrize("body", [
+    answer(correct="false"),
+    answer(correct=1),
+    answer(subject="Chemistry"),
+    answer(difficulty="Impossible"),
+    {"user_id": "u1"},
+])
+def test_invalid_answers_are_rejected(client, body):
+    assert client.post("/record-answer", json=body).status_code == 400
+    assert app.STUDENT_STATE.state_vector("u1")["Math"]["attempts"] == 0
+
+
+def test_answers_update_the_state_and_weakest_subjects(client):
+    response = client.post("/record-answer", json=answer(subject="science", correct=False))
+
+    assert response.status_code == 200
+    assert response.get_json()["state"]["attempts"] == 1
+    assert app.STUDENT_STATE.weakest_subjects("u1", 1) == ["Science"]
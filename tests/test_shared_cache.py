@@ -0,0 +1,24 @@
+import shared_cache
+from shared_cache import SharedCache
+
+
+def test_zero_ttl_disables_caching_and_none_keeps_entries(tmp_path):
+    path = str(tmp_path / "cache.db")
+    disabled = SharedCache("disabled", ttl=0, path=path)
+    forever = SharedCache("forever", path=path)
+
+    disabled.set("k", b"v")
+    forever.set("k", b"v")
+
+    assert disabled.get("k") is None
+    assert forever.get("k") == b"v"
+
+
+def test_namespaces_share_one_connection_and_its_lock(tmp_path):
+    path = str(tmp_path / "cache.db")
+    SharedCache("a", path=path).set("k", b"a")
+    SharedCache("b", path=path).set("k", b"b")
+
+    assert shared_cache._connection(path) is shared_cache._connection(path)
+    assert SharedCache("a", path=path).get("k") == b"a"
+    assert SharedCache("b", path=path).get("k") == b"b"
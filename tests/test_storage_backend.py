@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from storage_backend import LocalBackend, MemoryBackend, PinataBackend, TieredBackend, pin_metadata
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture
+def tiered(tmp_path):
+    backend = TieredBackend(LocalBackend(str(tmp_path)), MemoryBackend(), write_through=False)
+    yield backend
+    backend.close()
+
+
+def put_at(backend, payload, created_at, keyvalues=None):
+    """Store a payload and backdate its entry."""
+    cid = backend.put(payload, "payload.json", keyvalues=keyvalues)
+    backend._entries[cid]["created_at"] = created_at
+    return cid
+
+
+def test_pinata_dates_are_epoch_seconds():
+    backend = PinataBackend("jwt")
+    rows = [{"ipfs_pin_hash": "bafy1", "date_pinned": "2024-05-01T10:00:00.000Z",
+             "metadata": {"name": "a.json", "keyvalues": {"kind": "question"}}}]
+    backend.session.get = lambda url, **kwargs: FakeResponse({"rows": rows})
+
+    entry, = backend.list()
+
+    assert entry["created_at"] == datetime(2024, 5, 1, 10, tzinfo=timezone.utc).timestamp()
+    assert entry["keyvalues"] == {"kind": "question"}
+
+
+def test_tiered_list_merges_both_tiers_newest_first(tiered):
+    old_remote = put_at(tiered.remote, b'["old"]', 100.0)
+    new_remote = put_at(tiered.remote, b'["new"]', 300.0)
+    local = tiered.local.put(b'["local"]', "local.json", created_at=200.0)
+
+    assert [e["cid"] for e in tiered.list()] == [new_remote, local, old_remote]
+    assert [e["cid"] for e in tiered.list(limit=2)] == [new_remote, local]
+
+
+def test_tiered_get_caches_remote_name_tags_and_date(tiered):
+    keyvalues = pin_metadata("responses", user="u1")
+    cid = put_at(tiered.remote, b'["log"]', 123.0, keyvalues)
+
+    assert tiered.get(cid) == b'["log"]'
+
+    cached, = tiered.local.list(keyvalues={"kind": "responses", "user": "u1"})
+    assert cached["cid"] == cid
+    assert cached["name"] == "payload.json"
+    assert cached["created_at"] == 123.0
+
+
+def test_history_keeps_the_newest_snapshot_across_tiers(tiered, monkeypatch):
+    import app
+    from shared_cache import SharedCache
+
+    monkeypatch.setattr(app, "PIN_LIST_CACHE", SharedCache(f"pin_list-{id(tiered)}"))
+    tiered.local.put(b'[{"log": "u1 old"}]', "r.json", keyvalues=pin_metadata("responses", user="u1"),
+                     created_at=100.0)
+    put_at(tiered.remote, b'[{"log": "u1 new"}]', 300.0, pin_metadata("responses", user="u1"))
+    tiered.local.put(b'[{"log": "u2 new"}]', "r.json", keyvalues=pin_metadata("responses", user="u2"),
+                     created_at=250.0)
+    put_at(tiered.remote, b'[{"log": "u2 old"}]', 50.0, pin_metadata("responses", user="u2"))
+    put_at(tiered.remote, b'[{"question": "q"}]', 400.0, pin_metadata("question"))
+
+    history = app.get_stored_questions(tiered)
+
+    assert sorted(item.get("log", item.get("question")) for item in history) == ["q", "u1 new", "u2 new"]
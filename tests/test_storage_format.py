@@ -0,0 +1,17 @@
+import storage_format
+
+RECORD = {"question": "What is 2 + 2?", "options": {"A": "3", "B": "4", "C": "5", "D": "6"}, "category": "Math"}
+
+
+def test_compact_payloads_default_to_zlib_even_with_zstandard_installed(monkeypatch):
+    # Any use of the package would fail on this stand-in
+    monkeypatch.setattr(storage_format, "zstandard", object())
+
+    data = storage_format.encode(RECORD, "compact")
+
+    assert data[len(storage_format.MAGIC):len(storage_format.MAGIC) + 1] == storage_format.CODEC_ZLIB
+    assert storage_format.decode(data) == RECORD
+
+
+def test_plain_json_stays_readable():
+    assert storage_format.decode(storage_format.encode(RECORD, "json")) == RECORD
@@ -0,0 +1,37 @@
+import app
+import tracing
+
+
+def profiled_view():
+    return "ok"
+
+
+def call_profiled(headers):
+    view = app.traced_request(profiled_view)
+    with app.app.test_request_context("/", headers=headers):
+        return view()
+
+
+def test_profiling_needs_the_secret(monkeypatch):
+    monkeypatch.setattr(tracing, "PROFILE_SECRET", "")
+    assert not tracing.profiling_requested({"X-Profile": "1", "X-Profile-Secret": ""}, {})
+
+    monkeypatch.setattr(tracing, "PROFILE_SECRET", "s3cret")
+    assert not tracing.profiling_requested({"X-Profile": "1"}, {})
+    assert not tracing.profiling_requested({"X-Profile": "1", "X-Profile-Secret": "guess"}, {})
+    assert tracing.profiling_requested({"X-Profile-Secret": "s3cret"}, {"profile": "1"})
+
+
+def test_failed_profile_and_trace_writes_keep_the_response(monkeypatch):
+    def disk_full(*args, **kwargs):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(tracing, "PROFILE_SECRET", "s3cret")
+    monkeypatch.setattr(tracing.SamplingProfiler, "save", disk_full)
+    monkeypatch.setattr(tracing.Trace, "export", disk_full)
+
+    response = call_profiled({"X-Profile": "1", "X-Profile-Secret": "s3cret"})
+
+    assert response.status_code == 200
+    assert response.headers["X-Trace-Id"]
+    assert not any(name.endswith("-Path") for name in response.headers.keys())
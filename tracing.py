@@ -0,0 +1,232 @@
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Where finished traces and profiles are written. Trace export is disabled
+# unless TRACE_EXPORT_DIR is set; profiles are always stored when requested.
+TRACE_EXPORT_DIR = os.getenv("TRACE_EXPORT_DIR", "")
+TRACE_EXPORT_FORMAT = os.getenv("TRACE_EXPORT_FORMAT", "chrome")  # "chrome" or "otlp"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+# Secret a request must send as X-Profile-Secret to be profiled; profiling on
+# request is off while it is unset
+PROFILE_SECRET = os.getenv("PROFILE_SECRET", "")
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """A single timed step inside a trace."""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes)
+        self.thread_id = threading.get_ident()
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+
+class Trace:
+    """
+    Collects the spans recorded while handling one request.
+
+    Spans may be recorded from worker threads, so appends are guarded by a lock.
+    """
+
+    def __init__(self, name: str, attributes: Optional[Dict] = None):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.attributes = dict(attributes or {})
+        self.spans: List[Span] = []
+        self.profile_path: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def to_chrome(self) -> Dict:
+        """Render the trace in Chrome trace-event format (chrome://tracing, Perfetto)."""
+        events = []
+        for s in self.spans:
+            events.append({
+                "name": s.name,
+                "ph": "X",
+                "ts": s.start_ns / 1e3,
+                "dur": (s.end_ns - s.start_ns) / 1e3 if s.end_ns else 0,
+                "pid": os.getpid(),
+                "tid": s.thread_id,
+                "args": dict(s.attributes, span_id=s.span_id, parent_id=s.parent_id,
+                             **({"error": s.error} if s.error else {})),
+            })
+        return {"traceEvents": events, "otherData": {"trace_id": self.trace_id, "name": self.name}}
+
+    def to_otlp(self) -> Dict:
+        """Render the trace as an OTLP-JSON ExportTraceServiceRequest."""
+        def attrs(d: Dict) -> List[Dict]:
+            return [{"key": k, "value": {"stringValue": str(v)}} for k, v in d.items()]
+
+        spans = []
+        for s in self.spans:
+            spans.append({
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id or "",
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": attrs(s.attributes),
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": attrs({"service.name": "act-question-generator"})},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+        }]}
+
+    def export(self, directory: Optional[str] = None, fmt: Optional[str] = None) -> str:
+        """
+        Write the trace to a local file.
+
+        Args:
+            directory (str): Target directory, defaults to TRACE_EXPORT_DIR
+            fmt (str): "chrome" or "otlp", defaults to TRACE_EXPORT_FORMAT
+
+        Returns:
+            str: Path of the written file
+        """
+        directory = directory or TRACE_EXPORT_DIR or "traces"
+        fmt = fmt or TRACE_EXPORT_FORMAT
+        os.makedirs(directory, exist_ok=True)
+        body = self.to_otlp() if fmt == "otlp" else self.to_chrome()
+        path = os.path.join(directory, f"{self.trace_id}.{fmt}.json")
+        with open(path, 'w') as f:
+            json.dump(body, f)
+        return path
+
+
+def current_trace() -> Optional[Trace]:
+    """Return the trace active in this context, if any."""
+    return _current_trace.get()
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """
+    Open a trace for one request. Spans opened inside it are attached to it.
+    """
+    trace = Trace(name, attributes)
+    trace_token = _current_trace.set(trace)
+    try:
+        with span(name, **attributes):
+            yield trace
+    finally:
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a pipeline step. Outside of a trace this is a no-op.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get()
+    s = Span(name, trace.trace_id, parent.span_id if parent else None, attributes)
+    span_token = _current_span.set(s)
+    try:
+        yield s
+    except Exception as e:
+        s.error = str(e)
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(span_token)
+        trace.add(s)
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a single thread.
+
+    A daemon thread samples the target thread's stack every `interval` seconds and
+    aggregates the samples as folded stacks, the input format of flamegraph.pl and
+    speedscope.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = PROFILE_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def folded(self) -> str:
+        """Return the collected samples as folded stack lines."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+    def save(self, name: str, directory: Optional[str] = None) -> str:
+        directory = directory or PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}.folded")
+        with open(path, 'w') as f:
+            f.write(self.folded())
+        return path
+
+
+def profiling_requested(headers, args) -> bool:
+    """
+    Check the X-Profile header or the ?profile= query flag of a request, and
+    that it carries PROFILE_SECRET.
+    """
+    flag = headers.get("X-Profile") or args.get("profile") or ""
+    if flag.lower() not in ("1", "true", "yes", "on") or not PROFILE_SECRET:
+        return False
+    secret = headers.get("X-Profile-Secret") or ""
+    return hmac.compare_digest(secret.encode("utf-8"), PROFILE_SECRET.encode("utf-8"))
@@ -0,0 +1,203 @@
+import os
+import uuid
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# How the front ends reach the generator: "inprocess", "local-http" or "remote-http"
+GENERATOR_TRANSPORT = os.getenv("GENERATOR_TRANSPORT", "local-http")
+GENERATOR_LOCAL_URL = os.getenv("GENERATOR_LOCAL_URL", "http://localhost:5000")
+GENERATOR_REMOTE_URL = os.getenv("GENERATOR_REMOTE_URL", "")
+GENERATOR_TIMEOUT = float(os.getenv("GENERATOR_TIMEOUT", "120"))
+# Generations running in-process at once, shared by every front-end session
+GENERATOR_WORKERS = int(os.getenv("GENERATOR_WORKERS", "4"))
+# Times a request whose connection dropped is sent again. The retry carries the
+# same request_id, so one the generator already answered is served from its
+# result cache instead of being generated twice
+GENERATOR_RETRIES = int(os.getenv("GENERATOR_RETRIES", "1"))
+# Sent as X-Client-Secret so the generator queues each student separately
+# instead of the whole front end under one address (see app.client_id)
+CLIENT_ID_SECRET = os.getenv("CLIENT_ID_SECRET", "")
+
+_default = None
+_default_lock = threading.Lock()
+
+
+class TransportError(RuntimeError):
+    """The generator answered with an error."""
+
+    def __init__(self, message: str, status: int = 500):
+        super().__init__(message)
+        self.status = status
+
+
+class GeneratorUnavailable(TransportError):
+    """The generator could not be reached at all."""
+
+    def __init__(self, message: str):
+        super().__init__(message, status=503)
+
+
+def _unwrap(payload: Dict, status: int) -> List[Dict]:
+    """Turn a /generate-questions response into its questions, or raise its error."""
+    if status != 200:
+        raise TransportError(f"API Error: {payload.get('message') or payload.get('error') or 'Unknown error'}", status)
+    return payload.get('questions', [])
+
+
+class GeneratorTransport(ABC):
+    """How a front end asks the generator for questions and checks its health."""
+
+    @abstractmethod
+    def generate(self, user_results: Dict, regional_results: Dict, user_id: Optional[str] = None) -> List[Dict]:
+        """
+        Generate a question set.
+
+        Each call is one request with its own request_id; retries of it reuse
+        the id so the generator can answer them from its result cache.
+
+        Returns:
+            List[Dict]: The questions, as /generate-questions returns them
+
+        Raises:
+            GeneratorUnavailable: If the generator cannot be reached
+            TransportError: If the generator answered with an error
+        """
+
+    @abstractmethod
+    def health(self) -> bool:
+        """
+        Whether the generator reports itself healthy.
+
+        Raises:
+            GeneratorUnavailable: If the generator cannot be reached
+        """
+
+    @staticmethod
+    def request_body(user_results: Dict, regional_results: Dict, user_id: Optional[str]) -> Dict:
+        body = {"user_results": user_results, "regional_results": regional_results,
+                "request_id": uuid.uuid4().hex}
+        if user_id is not None:
+            body["user_id"] = user_id
+        return body
+
+
+class HttpTransport(GeneratorTransport):
+    """The Flask API, on this machine or another one."""
+
+    def __init__(self, base_url: str, timeout: float = GENERATOR_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        if CLIENT_ID_SECRET:
+            self.session.headers["X-Client-Secret"] = CLIENT_ID_SECRET
+
+    def generate(self, user_results: Dict, regional_results: Dict, user_id: Optional[str] = None) -> List[Dict]:
+        body = self.request_body(user_results, regional_results, user_id)
+        for attempt in range(GENERATOR_RETRIES + 1):
+            try:
+                response = self.session.post(f"{self.base_url}/generate-questions", json=body, timeout=self.timeout)
+                break
+            except requests.exceptions.ConnectionError as e:
+                if attempt < GENERATOR_RETRIES:
+                    logger.warning("Retrying request %s after a dropped connection: %s", body["request_id"], e)
+                    continue
+                raise GeneratorUnavailable(f"Could not reach the generator at {self.base_url}: {e}")
+            except requests.exceptions.Timeout as e:
+                raise GeneratorUnavailable(f"Could not reach the generator at {self.base_url}: {e}")
+            except requests.exceptions.RequestException as e:
+                raise TransportError(f"Request to the generator failed: {e}")
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        return _unwrap(payload, response.status_code)
+
+    def health(self) -> bool:
+        try:
+            response = self.session.get(f"{self.base_url}/health", timeout=self.timeout)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            raise GeneratorUnavailable(f"Could not reach the generator at {self.base_url}: {e}")
+        except requests.exceptions.RequestException as e:
+            raise TransportError(f"Health check failed: {e}")
+        return response.status_code == 200
+
+
+class InProcessTransport(GeneratorTransport):
+    """
+    The generation pipeline called directly, skipping the HTTP hop and the
+    JSON round trip. Requests run on a thread pool shared by all sessions and
+    go through the same request handling as the API endpoint.
+    """
+
+    def __init__(self, workers: int = GENERATOR_WORKERS, timeout: float = GENERATOR_TIMEOUT):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="generator")
+        self._app = None
+
+    def _load(self):
+        # Imported on first use: loading app sets up the model router, storage and stores
+        if self._app is None:
+            try:
+                import app
+            except Exception as e:
+                raise GeneratorUnavailable(f"Could not load the generator: {e}")
+            self._app = app
+        return self._app
+
+    def _call(self, body: Dict) -> Tuple[Dict, int]:
+        return self._load().generate_response(body)
+
+    def generate(self, user_results: Dict, regional_results: Dict, user_id: Optional[str] = None) -> List[Dict]:
+        future = self._executor.submit(self._call, self.request_body(user_results, regional_results, user_id))
+        try:
+            payload, status = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise TransportError("API Error: Generation timed out", 504)
+        return _unwrap(payload, status)
+
+    def health(self) -> bool:
+        return self._load().health_status().get("status") == "healthy"
+
+
+def create_transport(name: Optional[str] = None) -> GeneratorTransport:
+    """
+    Build the transport selected by GENERATOR_TRANSPORT.
+
+    Args:
+        name (str, optional): Overrides GENERATOR_TRANSPORT
+
+    Returns:
+        GeneratorTransport: The configured transport
+    """
+    name = name or GENERATOR_TRANSPORT
+    if name == "inprocess":
+        return InProcessTransport()
+    if name == "local-http":
+        return HttpTransport(GENERATOR_LOCAL_URL)
+    if name == "remote-http":
+        if not GENERATOR_REMOTE_URL:
+            raise ValueError("GENERATOR_REMOTE_URL must be set for the remote-http transport")
+        return HttpTransport(GENERATOR_REMOTE_URL)
+    raise ValueError(f"Unknown generator transport {name!r}")
+
+
+def default_transport() -> GeneratorTransport:
+    """
+    The process-wide transport, built on first use.
+
+    Streamlit re-runs the page script on every interaction, so the front ends
+    share this one instead of building their own, which keeps a single worker
+    pool and connection pool per process.
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = create_transport()
+        return _default